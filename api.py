@@ -0,0 +1,215 @@
+import os
+import json
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from collaborative_recommend import get_recommender as get_collaborative_recommender
+from collaborative_recommend import recommend_products as recommend_collaborative
+from collaborative_recommend import recommend_many_customers
+from content_based_recommendation import get_content_index, recommend_many_products
+from content_based_recommendation import recommend_products as recommend_content_based
+from hybrid_recommendation import recommend_products as recommend_hybrid
+from recommendation_pipeline import recommend_products as recommend_pipeline
+import metrics
+import warmup
+
+# Đường dẫn tệp (ghi đè được bằng biến môi trường)
+CONTENT_BASED_DATA_FILE = os.environ.get("CONTENT_BASED_DATA_FILE", "data/content_based_preprocessed.csv")
+COLLABORATIVE_DATA_FILES = os.environ.get(
+    "COLLABORATIVE_DATA_FILES",
+    "data/collaborative_full_data_part1.csv,data/collaborative_full_data_part2.csv"
+).split(",")
+COLLABORATIVE_MODEL_FILE = os.environ.get("COLLABORATIVE_MODEL_FILE", "model/collaborative_model.pkl.gz")
+
+def get_products():
+    # Bảng sản phẩm của content-based, nạp một lần cho mỗi tiến trình (dùng chung với app.py)
+    return warmup.get_products(CONTENT_BASED_DATA_FILE)
+
+
+def warm_up():
+    """
+    Nạp sẵn dữ liệu, chỉ mục nội dung và mô hình collaborative để request đầu tiên không phải chờ.
+    """
+    with metrics.span('api.warm_up'):
+        get_content_index(get_products())
+        get_collaborative_recommender(COLLABORATIVE_DATA_FILES, COLLABORATIVE_MODEL_FILE)
+
+
+def to_records(df):
+    # Qua to_json để NaN thành null và kiểu NumPy thành kiểu JSON
+    return json.loads(df.to_json(orient='records', force_ascii=False))
+
+
+def content_recommendations(product_id, top_n, weight_content, weight_rating):
+    df_products = get_products()
+    # Lấy dư một sản phẩm để loại chính sản phẩm đang xem
+    recommendations = recommend_content_based(
+        product_id, df_products, weight_content=weight_content, weight_rating=weight_rating, top_n=top_n + 1
+    )
+    recommendations = recommendations[recommendations['ma_san_pham'] != product_id]
+    return recommendations.head(top_n)
+
+
+def user_recommendations(customer_id, top_n):
+    return recommend_collaborative(COLLABORATIVE_DATA_FILES, COLLABORATIVE_MODEL_FILE, customer_id, top_n=top_n)
+
+
+def hybrid_recommendations(customer_id, product_id, top_n, **weights):
+    args = (get_products(), COLLABORATIVE_DATA_FILES, COLLABORATIVE_MODEL_FILE, customer_id)
+    try:
+        return recommend_pipeline(*args, product_id=product_id, top_n=top_n, **weights)
+    except FileNotFoundError:
+        # Chưa chạy job offline tạo bảng láng giềng / chỉ mục ANN: chấm điểm toàn bộ catalog
+        metrics.increment('api_hybrid_fallback_total')
+        return recommend_hybrid(*args, product_id=product_id, top_n=top_n, **weights)
+
+
+def group_by_query(recommendations, query_column):
+    # Gom bảng dài (mã truy vấn, rank, ...) thành {mã truy vấn: [gợi ý, ...]}
+    grouped = {}
+    for record in to_records(recommendations.drop(columns='rank')):
+        grouped.setdefault(record.pop(query_column), []).append(record)
+    return grouped
+
+
+def content_batch_recommendations(product_ids, top_n, weight_content, weight_rating):
+    # recommend_many_products đã loại chính sản phẩm truy vấn khỏi gợi ý của nó
+    recommendations = recommend_many_products(
+        product_ids, get_products(), weight_content=weight_content, weight_rating=weight_rating, top_n=top_n
+    )
+    return group_by_query(recommendations, 'query_ma_san_pham')
+
+
+def user_batch_recommendations(customer_ids, top_n):
+    recommendations = recommend_many_customers(COLLABORATIVE_DATA_FILES, COLLABORATIVE_MODEL_FILE,
+                                               customer_ids, top_n=top_n)
+    return group_by_query(recommendations, 'query_ma_khach_hang')
+
+
+class BatchRequest(BaseModel):
+    ids: list[str] = Field(..., min_length=1, max_length=10000)
+    top_n: int = Field(6, ge=1, le=100)
+
+
+class ContentBatchRequest(BatchRequest):
+    weight_content: float = Field(0.7, ge=0)
+    weight_rating: float = Field(0.3, ge=0)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if os.environ.get("API_WARM_UP", "1") == "1":
+        await run_in_threadpool(warm_up)
+    yield
+
+
+app = FastAPI(title="Hasaki Recommendation API", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Nhãn theo mẫu đường dẫn (ví dụ /recommend/user/{ma_khach_hang}) để số chuỗi metrics không tăng theo mã
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    metrics.observe('api.request', time.perf_counter() - start, path=path)
+    metrics.increment('api_requests_total', path=path, status=response.status_code)
+    return response
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics_endpoint(format: str = Query("prometheus", pattern="^(prometheus|json)$")):
+    # Số liệu của tiến trình (worker) đang phục vụ request
+    if format == "json":
+        return metrics.registry.snapshot()
+    return PlainTextResponse(metrics.registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/recommend/content/batch")
+async def recommend_content_batch(request: ContentBatchRequest):
+    product_ids = [pid.strip() for pid in request.ids]
+    grouped = await run_in_threadpool(
+        content_batch_recommendations, product_ids, request.top_n, request.weight_content, request.weight_rating
+    )
+    # Mã không tồn tại trả về danh sách rỗng
+    return {"results": [{"ma_san_pham": pid, "recommendations": grouped.get(pid, [])} for pid in product_ids]}
+
+
+@app.post("/recommend/user/batch")
+async def recommend_user_batch(request: BatchRequest):
+    customer_ids = [cid.strip() for cid in request.ids]
+    grouped = await run_in_threadpool(user_batch_recommendations, customer_ids, request.top_n)
+    return {"results": [{"ma_khach_hang": cid, "recommendations": grouped.get(cid, [])} for cid in customer_ids]}
+
+
+@app.get("/recommend/content/{ma_san_pham}")
+async def recommend_content(
+    ma_san_pham: str,
+    top_n: int = Query(6, ge=1, le=100),
+    weight_content: float = Query(0.7, ge=0),
+    weight_rating: float = Query(0.3, ge=0),
+):
+    ma_san_pham = ma_san_pham.strip()
+    try:
+        recommendations = await run_in_threadpool(
+            content_recommendations, ma_san_pham, top_n, weight_content, weight_rating
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"ma_san_pham": ma_san_pham, "recommendations": to_records(recommendations)}
+
+
+@app.get("/recommend/user/{ma_khach_hang}")
+async def recommend_user(ma_khach_hang: str, top_n: int = Query(6, ge=1, le=100)):
+    ma_khach_hang = ma_khach_hang.strip()
+    recommendations = await run_in_threadpool(user_recommendations, ma_khach_hang, top_n)
+    return {"ma_khach_hang": ma_khach_hang, "recommendations": to_records(recommendations)}
+
+
+@app.get("/recommend/hybrid/{ma_khach_hang}")
+async def recommend_hybrid_endpoint(
+    ma_khach_hang: str,
+    product: str | None = Query(None, description="Sản phẩm đang xem (tùy chọn)"),
+    top_n: int = Query(6, ge=1, le=100),
+    weight_collaborative: float = Query(0.5, ge=0),
+    weight_content: float = Query(0.3, ge=0),
+    weight_rating: float = Query(0.2, ge=0),
+):
+    ma_khach_hang = ma_khach_hang.strip()
+    product = product.strip() if product else None
+    recommendations = await run_in_threadpool(
+        hybrid_recommendations, ma_khach_hang, product, top_n,
+        weight_collaborative=weight_collaborative, weight_content=weight_content, weight_rating=weight_rating,
+    )
+    return {"ma_khach_hang": ma_khach_hang, "ma_san_pham": product, "recommendations": to_records(recommendations)}
+
+
+if __name__ == "__main__":
+    # python api.py --port 8000 --workers 4 (hoặc đặt API_WORKERS)
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Hasaki recommendation HTTP API")
+    parser.add_argument("--host", default=os.environ.get("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", 1)))
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Nhiều worker: nạp dữ liệu một lần rồi fork, các worker dùng chung bộ nhớ (xem serving.py)
+        from serving import serve
+
+        serve(args.host, args.port, args.workers)
+    else:
+        uvicorn.run("api:app", host=args.host, port=args.port)
@@ -1,7 +1,10 @@
 import streamlit as st
 import pandas as pd
-from collaborative_recommend import recommend_products as recommend_collaborative
-from content_based_recommendation import recommend_products as recommend_content_based
+from metrics import span
+from warmup import get_products, start_warm_up
+
+# Các module gợi ý (gensim, mô hình Surprise) chỉ được import khi vào trang gợi ý
+# hoặc trong luồng nạp nền, trang giới thiệu hiển thị ngay khi khởi động.
 
 # Function chuyển đổi điểm đánh giá thành ngôi sao màu vàng.
 def render_stars(rating):
@@ -17,6 +20,37 @@ COLLABORATIVE_FULL_DATA_PART1 = "data/collaborative_full_data_part1.csv"
 COLLABORATIVE_FULL_DATA_PART2 = "data/collaborative_full_data_part2.csv"
 COLLABORATIVE_MODEL_FILE = "model/collaborative_model.pkl.gz"
 
+# Nạp nền bảng sản phẩm, chỉ mục nội dung và mô hình collaborative một lần cho cả tiến trình
+@st.cache_resource(show_spinner=False)
+def get_warm_up():
+    return start_warm_up(CONTENT_BASED_DATA_FILE, [COLLABORATIVE_FULL_DATA_PART1, COLLABORATIVE_FULL_DATA_PART2],
+                         COLLABORATIVE_MODEL_FILE)
+
+
+# Dữ liệu xem trước của trang quy trình: chỉ đọc vài dòng đầu, cache giữa các lần chạy lại
+@st.cache_data
+def load_preview(path, rows=5):
+    from ingestion import iter_chunks
+
+    preview = next(iter_chunks([path], chunksize=rows))
+    for col in ('id', 'ma_khach_hang', 'ma_san_pham'):
+        if col in preview:
+            preview[col] = preview[col].astype(str)
+    return preview
+
+
+# Ô tìm kiếm + danh sách chọn chỉ gồm các kết quả khớp nhất (tìm phía máy chủ, xem search_index.py)
+# thay cho selectbox chứa toàn bộ tên sản phẩm / mã khách hàng
+def search_select(label, search, key, format_func, default=""):
+    query = st.text_input(f"{label} (gõ để tìm)", key=f"{key}_query")
+    options = search.search_labels(query)
+    if default and default not in options:
+        options = [default] + options
+    options = [""] + options
+    return st.selectbox(label, options=options, format_func=format_func,
+                        index=options.index(default) if default else 0, key=key)
+
+
 # Set page configuration
 st.set_page_config(
     page_title="Hasaki Recommendation System",
@@ -25,6 +59,9 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Bắt đầu nạp nền ngay khi tiến trình khởi động (trang hiện tại không phải chờ)
+warm_up = get_warm_up()
+
 # Custom CSS for Hasaki-themed design
 st.markdown("""
     <style>
@@ -265,6 +302,7 @@ elif page == "Quy trình xây dựng hệ thống":
                 3. **Loại bỏ trùng lặp:** Sản phẩm được lọc dựa trên `ma_san_pham`.
                 4. **Đầu ra:** Lưu dữ liệu đã xử lý vào file **`San_pham_new.csv`** để merge chung với file gốc là **`San_pham.csv`** dựa trên cột `ma_san_pham`.
                 5. **Thời gian nghỉ (sleep):** Giữa mỗi lần cào một trang, chương trình nghỉ 2 giây để tránh bị chặn.
+                6. **Phiên bản hiện tại:** `crawler.py` tải các trang song song (giới hạn số request đồng thời và tốc độ, tự thử lại khi lỗi) và chỉ cập nhật sản phẩm mới hoặc đổi giá trong `San_pham_new.csv`.
         """)
 
         st.write("### Dữ liệu mẫu cào được:")
@@ -310,10 +348,9 @@ elif page == "Quy trình xây dựng hệ thống":
         # Load dữ liệu
         san_pham_path = "data/san_pham_updated.csv"
         san_pham_preprocessed_path = "data/content_based_preprocessed.csv"
-        san_pham_df = pd.read_csv(san_pham_path)
-        san_pham_df['ma_san_pham'] = san_pham_df['ma_san_pham'].astype(str)
-        san_pham_preprocessed_df = pd.read_csv(san_pham_preprocessed_path)
-        san_pham_preprocessed_df['ma_san_pham'] = san_pham_preprocessed_df['ma_san_pham'].astype(str)
+        with span('app.load_overview_data'):
+            san_pham_df = load_preview(san_pham_path)
+            san_pham_preprocessed_df = load_preview(san_pham_preprocessed_path)
 
         # Display raw data
         st.write("### Dữ liệu gốc:")
@@ -418,14 +455,9 @@ elif page == "Quy trình xây dựng hệ thống":
                 - Dựa trên mô hình đã huấn luyện, dự đoán điểm số và đề xuất các sản phẩm phù hợp.
             """)
 
-            # Đọc dữ liệu
-            raw_data = pd.read_csv("data/Danh_gia.csv")
-            raw_data['ma_khach_hang'] = raw_data['ma_khach_hang'].astype(str)
-            raw_data['ma_san_pham'] = raw_data['ma_san_pham'].astype(str)
-            processed_data = pd.read_csv("data/collaborative_full_data_part1.csv")
-            processed_data['id'] = processed_data['id'].astype(str)
-            processed_data['ma_khach_hang'] = processed_data['ma_khach_hang'].astype(str)
-            processed_data['ma_san_pham'] = processed_data['ma_san_pham'].astype(str)
+            # Đọc dữ liệu (chỉ khối đầu tiên của log đánh giá, đủ để xem trước)
+            raw_data = load_preview("data/Danh_gia.csv")
+            processed_data = load_preview("data/collaborative_full_data_part1.csv")
 
             # Hiển thị dữ liệu trước xử lý
             st.write("#### Dữ liệu gốc:")
@@ -506,24 +538,46 @@ elif page == "Hệ thống gợi ý sản phẩm":
     # Hiển thị tiêu đề chính
     st.title("Hasaki gợi ý sản phẩm cho bạn")
 
+    # Chờ luồng nạp nền (thường đã xong nếu người dùng mở trang khác trước)
+    if not warm_up.is_ready:
+        try:
+            with st.spinner("Đang nạp dữ liệu và mô hình gợi ý..."):
+                warm_up.wait()
+        except Exception as e:
+            # Bỏ lần nạp lỗi khỏi cache để lần chạy lại sau nạp lại từ đầu thay vì ném lại cùng lỗi
+            get_warm_up.clear()
+            st.error(f"Lỗi khi nạp dữ liệu và mô hình gợi ý ({', '.join(warm_up.errors)}): {e}")
+            st.stop()
+
+    from collaborative_recommend import recommend_products as recommend_collaborative
+    from collaborative_recommend import get_recommender as get_collaborative_recommender
+    from content_based_recommendation import recommend_products as recommend_content_based
+    from content_based_recommendation import get_content_index
+    from hybrid_recommendation import recommend_products as recommend_hybrid
+    from recommendation_pipeline import recommend_products as recommend_pipeline
+    from search_index import get_customer_search, get_product_search
+
     # Tabs để chọn giữa hai phương pháp gợi ý
-    tab1, tab2 = st.tabs(["Content-Based Filtering", "Collaborative Filtering"])
+    tab1, tab2, tab3 = st.tabs(["Content-Based Filtering", "Collaborative Filtering", "Hybrid"])
 
     # Tab 1: Content-Based Filtering
     with tab1:
         # Đọc dữ liệu sản phẩm
-        df_products = pd.read_csv(CONTENT_BASED_DATA_FILE)
-        df_products['ten_san_pham'] = df_products['ten_san_pham'].astype(str).fillna('')
-        df_products['ma_san_pham'] = df_products['ma_san_pham'].astype(str).fillna('')
-        df_products['hinh_anh'] = df_products['hinh_anh'].astype(str).fillna("https://via.placeholder.com/150")
+        # Bảng sản phẩm dùng chung với luồng nạp nền (không đọc lại mỗi lần chạy lại trang)
+        with span('app.load_products'):
+            df_products = get_products(CONTENT_BASED_DATA_FILE)
+
+        # Chỉ mục TF-IDF được cache trong tiến trình bởi get_content_index (tự đồng bộ khi bảng sản phẩm đổi)
+        with span('app.load_content_index'):
+            content_index = get_content_index(df_products)
 
         # Chọn tên sản phẩm
-        product_names = df_products['ten_san_pham'].unique()
-        selected_product_name = st.selectbox(
+        product_search = get_product_search(df_products)
+        selected_product_name = search_select(
             "Nhập hoặc chọn tên sản phẩm yêu thích:",
-            options=[""] + list(product_names),
-            format_func=lambda x: x if x else "Chọn sản phẩm",
-            key="product_name"
+            product_search,
+            key="product_name",
+            format_func=lambda x: x if x else "Chọn sản phẩm"
         )
 
         # Lọc sản phẩm dựa trên lựa chọn
@@ -565,7 +619,8 @@ elif page == "Hệ thống gợi ý sản phẩm":
                 df=df_products,
                 weight_content=0.7,
                 weight_rating=0.3,
-                top_n=7
+                top_n=7,
+                index=content_index
             )
             # Loại bỏ sản phẩm đã chọn khỏi danh sách gợi ý
             recommendations = recommendations[recommendations['ma_san_pham'] != selected_product_data['ma_san_pham']]
@@ -609,13 +664,17 @@ elif page == "Hệ thống gợi ý sản phẩm":
 
     # Tab 2: Collaborative Filtering
     with tab2:
-        @st.cache_data
-        def load_customer_data(data_files):
-            full_data = pd.concat([pd.read_csv(file) for file in data_files])
-            full_data['ma_khach_hang'] = full_data['ma_khach_hang'].astype(str).str.strip()
-            return full_data['ma_khach_hang'].unique()
+        # Mô hình và dữ liệu đánh giá chỉ nạp một lần cho cả tiến trình (nạp lại khi file thay đổi)
+        def load_customer_data():
+            with span('app.load_collaborative'):
+                recommender = get_collaborative_recommender(
+                    [COLLABORATIVE_FULL_DATA_PART1, COLLABORATIVE_FULL_DATA_PART2],
+                    COLLABORATIVE_MODEL_FILE
+                )
+            return recommender.customer_ids
 
-        customer_ids = load_customer_data([COLLABORATIVE_FULL_DATA_PART1, COLLABORATIVE_FULL_DATA_PART2])
+        customer_ids = load_customer_data()
+        customer_search = get_customer_search(customer_ids)
 
         # Sử dụng session_state để lưu trạng thái tên và mã khách hàng
         if "customer_name" not in st.session_state:
@@ -628,11 +687,12 @@ elif page == "Hệ thống gợi ý sản phẩm":
             "Nhập tên của bạn:",
             value=st.session_state.customer_name
         ).strip()
-        customer_id = st.selectbox(
+        customer_id = search_select(
             "Nhập hoặc chọn mã khách hàng của bạn:",
-            options=[""] + list(customer_ids),
+            customer_search,
+            key="customer_id_select",
             format_func=lambda x: f"Mã khách hàng: {x}" if x else "",
-            index=([""] + list(customer_ids)).index(st.session_state.customer_id) if st.session_state.customer_id in customer_ids else 0
+            default=st.session_state.customer_id
         )
 
         # Nút đăng nhập
@@ -687,4 +747,68 @@ elif page == "Hệ thống gợi ý sản phẩm":
         elif st.session_state.customer_name and not st.session_state.customer_id:
             st.warning("Vui lòng nhập hoặc chọn mã khách hàng để gợi ý sản phẩm!")
         elif not st.session_state.customer_name and st.session_state.customer_id:
-            st.warning("Vui lòng nhập tên của bạn!")
\ No newline at end of file
+            st.warning("Vui lòng nhập tên của bạn!")
+
+    # Tab 3: Hybrid - sinh ứng viên rồi chấm điểm kết hợp (collaborative + nội dung + đánh giá);
+    # chấm điểm toàn bộ catalog nếu chưa chạy job offline tạo bảng láng giềng / chỉ mục ANN
+    with tab3:
+        hybrid_customer_id = search_select(
+            "Chọn mã khách hàng:",
+            customer_search,
+            key="hybrid_customer_id",
+            format_func=lambda x: f"Mã khách hàng: {x}" if x else "",
+            default=st.session_state.customer_id
+        )
+        hybrid_product_name = search_select(
+            "Sản phẩm đang xem (không bắt buộc):",
+            product_search,
+            key="hybrid_product_name",
+            format_func=lambda x: x if x else "Không chọn"
+        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            weight_collaborative = st.slider("Trọng số collaborative", 0.0, 1.0, 0.5, 0.05)
+        with col2:
+            weight_content = st.slider("Trọng số nội dung", 0.0, 1.0, 0.3, 0.05)
+        with col3:
+            weight_rating = st.slider("Trọng số điểm đánh giá", 0.0, 1.0, 0.2, 0.05)
+
+        if hybrid_customer_id:
+            hybrid_product = df_products[df_products['ten_san_pham'] == hybrid_product_name] if hybrid_product_name else pd.DataFrame()
+            hybrid_args = (
+                df_products,
+                [COLLABORATIVE_FULL_DATA_PART1, COLLABORATIVE_FULL_DATA_PART2],
+                COLLABORATIVE_MODEL_FILE,
+                hybrid_customer_id,
+            )
+            hybrid_kwargs = dict(
+                product_id=hybrid_product.iloc[0]['ma_san_pham'] if not hybrid_product.empty else None,
+                top_n=6,
+                weight_collaborative=weight_collaborative,
+                weight_content=weight_content,
+                weight_rating=weight_rating
+            )
+            try:
+                recommendations = recommend_pipeline(*hybrid_args, **hybrid_kwargs)
+            except FileNotFoundError:
+                recommendations = recommend_hybrid(*hybrid_args, **hybrid_kwargs)
+
+            st.write("### Sản phẩm gợi ý:")
+            cols = st.columns(3)
+            for idx, (_, row) in enumerate(recommendations.iterrows()):
+                col = cols[idx % 3]
+                with col:
+                    st.image(row['hinh_anh'], use_column_width=True)
+                    st.markdown(f"<h4 style='font-size:18px; font-weight:bold; text-align:center;'>{row['ten_san_pham']}</h4>",
+                                unsafe_allow_html=True)
+                    st.markdown(f"**Mã sản phẩm:** <span style='color: blue;'>{row['ma_san_pham']}</span>", unsafe_allow_html=True)
+                    st.markdown(f"**Điểm dự đoán:** {row['EstimateScore']:.2f} · **Tương tự:** {row['similarity_score']:.2f} · **Tổng:** {row['final_score']:.2f}")
+                    rating = row.get('average_rating', 0)
+                    stars = render_stars(rating)
+                    st.markdown(
+                        f"**Điểm đánh giá:** {stars} <span style='font-size: 1.0em;'>({rating:.1f})</span>",
+                        unsafe_allow_html=True
+                    )
+                    with st.expander("Xem mô tả sản phẩm"):
+                        st.write(row.get('mo_ta', "Không có mô tả."))
+                    st.markdown("---")
\ No newline at end of file
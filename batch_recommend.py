@@ -0,0 +1,173 @@
+import argparse
+import json
+import os
+import sys
+from itertools import islice
+
+from data_store import load_table
+
+# Đường dẫn tệp mặc định (giống app.py)
+CONTENT_BASED_DATA_FILE = "data/content_based_preprocessed.csv"
+COLLABORATIVE_DATA_FILES = ["data/collaborative_full_data_part1.csv", "data/collaborative_full_data_part2.csv"]
+COLLABORATIVE_MODEL_FILE = "model/collaborative_model.pkl.gz"
+
+
+def read_ids(path):
+    """
+    Đọc lần lượt từng mã (mỗi dòng một mã) để không phải giữ toàn bộ file trong bộ nhớ.
+    """
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            value = line.strip()
+            if value:
+                yield value
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class JsonlWriter:
+    """
+    Mỗi dòng: {"<cột mã truy vấn>": mã, "recommendations": [...]}.
+    """
+
+    def __init__(self, path, query_column):
+        self.file = open(path, "w", encoding="utf-8")
+        self.query_column = query_column
+
+    def write(self, recommendations):
+        records = json.loads(recommendations.to_json(orient="records", force_ascii=False))
+        grouped = {}
+        for record in records:
+            grouped.setdefault(record.pop(self.query_column), []).append(record)
+        for query, items in grouped.items():
+            self.file.write(json.dumps({self.query_column: query, "recommendations": items}, ensure_ascii=False))
+            self.file.write("\n")
+
+    def close(self):
+        self.file.close()
+
+
+# Kiểu cố định của các cột mã/hạng/điểm; các cột thông tin sản phẩm còn lại theo kiểu của bảng nguồn
+FIXED_COLUMN_TYPES = {
+    'query_ma_san_pham': 'string',
+    'query_ma_khach_hang': 'string',
+    'ma_san_pham': 'string',
+    'rank': 'int64',
+    'similarity_score': 'double',
+    'average_rating': 'double',
+    'final_score': 'double',
+    'EstimateScore': 'double',
+}
+
+
+def output_schema(template):
+    """
+    Schema Parquet của bảng kết quả dạng dài, lấy từ một kết quả mẫu (có thể rỗng):
+    cột mã/hạng/điểm theo FIXED_COLUMN_TYPES, cột số giữ kiểu số, các cột khác là chuỗi.
+    Không suy ra từ lô đầu tiên vì lô rỗng cho kiểu null.
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    fields = []
+    for column, dtype in template.dtypes.items():
+        if column in FIXED_COLUMN_TYPES:
+            arrow_type = pa.type_for_alias(FIXED_COLUMN_TYPES[column])
+        elif pd.api.types.is_bool_dtype(dtype):
+            arrow_type = pa.bool_()
+        elif pd.api.types.is_integer_dtype(dtype):
+            arrow_type = pa.int64()
+        elif pd.api.types.is_float_dtype(dtype):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+
+class ParquetWriter:
+    """
+    Ghi dạng bảng dài (mỗi dòng một cặp truy vấn - gợi ý), từng lô một row group.
+    Schema được khai báo khi tạo (từ kết quả mẫu `template`) nên lô rỗng không làm sai kiểu cột.
+    """
+
+    def __init__(self, path, query_column, template):
+        import pyarrow.parquet as pq
+
+        # Cột mã truy vấn và hạng đứng đầu như ở kết quả không rỗng
+        columns = [query_column, 'rank'] + [col for col in template.columns if col not in (query_column, 'rank')]
+        self.schema = output_schema(template[columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, recommendations):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(recommendations, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path, query_column, template):
+    if os.path.splitext(path)[1] == ".parquet":
+        return ParquetWriter(path, query_column, template)
+    return JsonlWriter(path, query_column)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chấm điểm gợi ý hàng loạt cho chiến dịch email/push")
+    parser.add_argument("kind", choices=["content", "user"], help="content: theo mã sản phẩm, user: theo mã khách hàng")
+    parser.add_argument("--input", required=True, help="File mã đầu vào, mỗi dòng một mã ('-' để đọc stdin)")
+    parser.add_argument("--output", required=True, help="File kết quả .jsonl hoặc .parquet")
+    parser.add_argument("--top-n", type=int, default=6)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--content-data", default=CONTENT_BASED_DATA_FILE)
+    parser.add_argument("--data-files", nargs="+", default=COLLABORATIVE_DATA_FILES)
+    parser.add_argument("--model-file", default=COLLABORATIVE_MODEL_FILE)
+    args = parser.parse_args()
+
+    if args.kind == "content":
+        from content_based_recommendation import get_content_index, recommend_many_products
+
+        df_products = load_table(args.content_data)
+        df_products['ma_san_pham'] = df_products['ma_san_pham'].astype(str)
+        index = get_content_index(df_products)
+        query_column = 'query_ma_san_pham'
+
+        def score(batch):
+            return recommend_many_products(batch, df_products, top_n=args.top_n, index=index)
+    else:
+        from collaborative_recommend import get_recommender
+
+        recommender = get_recommender(args.data_files, args.model_file)
+        query_column = 'query_ma_khach_hang'
+
+        def score(batch):
+            return recommender.recommend_many(batch, top_n=args.top_n)
+
+    # Kết quả rỗng làm mẫu cột/kiểu cho file Parquet
+    writer = open_writer(args.output, query_column, score([]))
+    total = 0
+    try:
+        for batch in batches(read_ids(args.input), args.batch_size):
+            writer.write(score(batch))
+            total += len(batch)
+            print(f"Đã xử lý {total} mã", file=sys.stderr)
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Gói benchmark: chạy bằng `python -m benchmarks.run_benchmarks` / `python -m benchmarks.synthetic` từ thư mục gốc repo
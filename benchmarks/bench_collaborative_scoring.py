@@ -0,0 +1,62 @@
+"""
+So sánh chấm điểm collaborative theo lô (collaborative_scoring.py) với cách gọi
+`model.predict` cho từng sản phẩm: sai lệch lớn nhất và thời gian cho mỗi khách hàng.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_collaborative_scoring --model model/collaborative_model.pkl.gz
+"""
+import argparse
+import gzip
+import pickle
+import time
+
+import numpy as np
+
+from collaborative_scoring import export_knn_baseline, max_abs_error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="model/collaborative_model.pkl.gz")
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with gzip.open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    state = export_knn_baseline(model)
+
+    rng = np.random.default_rng(args.seed)
+    customers = rng.choice(state.user_ids, size=min(args.customers, state.n_users), replace=False)
+    # Thêm một khách hàng và một sản phẩm không có trong trainset để kiểm tra nhánh baseline
+    customers = list(customers) + ["__khach_hang_moi__"]
+    items = list(state.item_ids) + ["__san_pham_moi__"]
+
+    error = max_abs_error(model, state, customers, items)
+
+    start = time.perf_counter()
+    for customer in customers:
+        [model.predict(customer, item).est for item in items]
+    loop_ms = (time.perf_counter() - start) * 1000 / len(customers)
+
+    start = time.perf_counter()
+    for customer in customers:
+        state.estimate([customer], items)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(customers)
+
+    # Đường phục vụ (CollaborativeRecommender) ánh xạ mã sang chỉ số nội bộ một lần khi nạp
+    users, inner_items = state.inner_users(customers), state.inner_items(items)
+    start = time.perf_counter()
+    for user in users:
+        state.estimate_inner([user], inner_items)
+    inner_ms = (time.perf_counter() - start) * 1000 / len(customers)
+
+    print(f"{state.n_users} khách hàng, {state.n_items} sản phẩm, k={state.k}, user_based={state.user_based}")
+    print(f"Sai lệch lớn nhất so với model.predict: {error:.3e}")
+    print(f"model.predict từng sản phẩm: {loop_ms:.3f} ms/khách hàng")
+    print(f"Chấm điểm theo lô:           {batch_ms:.3f} ms/khách hàng (nhanh hơn {loop_ms / batch_ms:.1f} lần)")
+    print(f"Theo lô, chỉ số đã ánh xạ:   {inner_ms:.3f} ms/khách hàng (nhanh hơn {loop_ms / inner_ms:.1f} lần)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+So sánh chỉ mục ANN (LSH trên LSI) với đường chính xác của content-based:
+recall@k của top-k sản phẩm tương tự và độ trễ trung bình mỗi truy vấn.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_content_ann --data data/content_based_preprocessed.csv --k 10
+"""
+import argparse
+import time
+
+import numpy as np
+from data_store import load_table
+
+from collaborative_scoring import top_k_indices
+from content_based_recommendation import get_content_index
+from content_ann import LSHContentIndex
+
+
+def exact_top_k(index, row, k):
+    sims = index.similarities(row)
+    return top_k_indices(sims, k)
+
+
+def ann_top_k(index, ann, row, k, n_candidates):
+    rows = ann.candidates(row, n_candidates)
+    sims = index.similarities(row, rows)
+    return rows[top_k_indices(sims, k)]
+
+
+def recall_at_k(index, ann, queries, k, n_candidates):
+    """
+    Trả về (recall@k trung bình, ms/truy vấn exact, ms/truy vấn ANN).
+    """
+    recalls = []
+    exact_time = ann_time = 0.0
+    for row in queries:
+        start = time.perf_counter()
+        exact = exact_top_k(index, row, k)
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = ann_top_k(index, ann, row, k, n_candidates)
+        ann_time += time.perf_counter() - start
+
+        recalls.append(len(np.intersect1d(exact, approx)) / len(exact))
+    n = max(1, len(queries))
+    return float(np.mean(recalls)), exact_time * 1000 / n, ann_time * 1000 / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data/content_based_preprocessed.csv")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--components", type=int, default=128)
+    parser.add_argument("--tables", type=int, default=8)
+    parser.add_argument("--bits", type=int, nargs="+", default=[8, 10, 12, 14])
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = get_content_index(load_table(args.data))
+    rng = np.random.default_rng(args.seed)
+    queries = rng.choice(len(index), size=min(args.queries, len(index)), replace=False)
+
+    print(f"{len(index)} sản phẩm, {len(queries)} truy vấn, k={args.k}, candidates={args.candidates}")
+    print(f"{'bits':>5} {'tables':>6} {'recall@k':>9} {'exact ms':>9} {'ann ms':>8}")
+    for n_bits in args.bits:
+        ann = LSHContentIndex.build(index, n_components=args.components, n_tables=args.tables,
+                                    n_bits=n_bits, seed=args.seed)
+        recall, exact_ms, ann_ms = recall_at_k(index, ann, queries, args.k, args.candidates)
+        print(f"{n_bits:>5} {args.tables:>6} {recall:>9.3f} {exact_ms:>9.3f} {ann_ms:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+So sánh xây dựng lại toàn bộ chỉ mục TF-IDF với cập nhật tăng dần (ContentIndex.sync)
+sau một lần crawl giả lập: thêm `--added` sản phẩm, sửa `--changed`, xóa `--removed`.
+Báo thời gian và mức lệch top-k so với xây dựng lại, trước và sau khi tính lại IDF.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_content_incremental --data data/content_based_preprocessed.csv
+"""
+import argparse
+import time
+
+import numpy as np
+from data_store import load_table
+
+from collaborative_scoring import top_k_indices
+from content_based_recommendation import ContentIndex, parse_tokens
+
+
+def simulate_crawl(df, n_added, n_changed, n_removed, rng):
+    """
+    Trả về (dữ liệu trước crawl, dữ liệu sau crawl).
+    """
+    rows = rng.permutation(len(df))
+    added = rows[:n_added]
+    changed = rows[n_added:n_added + n_changed]
+    removed = rows[n_added + n_changed:n_added + n_changed + n_removed]
+
+    before = df.drop(df.index[added]).reset_index(drop=True)
+    # Sản phẩm bị sửa: bỏ nửa sau danh sách từ
+    tokens = df['tokens'].tolist()
+    for row in changed:
+        words = parse_tokens(tokens[row])
+        tokens[row] = words[:max(1, len(words) // 2)]
+    after = df.assign(tokens=tokens).drop(df.index[removed]).reset_index(drop=True)
+    return before, after
+
+
+def top_k_overlap(index, reference, queries, k):
+    overlaps = []
+    for row in queries:
+        exact = top_k_indices(reference.similarities(row), k)
+        approx = top_k_indices(index.similarities(row), k)
+        overlaps.append(len(np.intersect1d(exact, approx)) / len(exact))
+    return float(np.mean(overlaps))
+
+
+def max_similarity_error(index, reference, queries):
+    return max(float(np.abs(index.similarities(row) - reference.similarities(row)).max()) for row in queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default="data/content_based_preprocessed.csv")
+    parser.add_argument("--added", type=int, default=300)
+    parser.add_argument("--changed", type=int, default=100)
+    parser.add_argument("--removed", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    before, after = simulate_crawl(load_table(args.data), args.added, args.changed, args.removed, rng)
+    index = ContentIndex.build(before)
+    index.IDF_REFRESH_THRESHOLD = np.inf
+
+    start = time.perf_counter()
+    rebuilt = ContentIndex.build(after)
+    rebuild_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.sync(after)
+    sync_s = time.perf_counter() - start
+    queries = rng.choice(len(after), size=min(args.queries, len(after)), replace=False)
+    stale_overlap = top_k_overlap(index, rebuilt, queries, args.k)
+
+    start = time.perf_counter()
+    index.refresh_idf()
+    refresh_s = time.perf_counter() - start
+    fresh_overlap = top_k_overlap(index, rebuilt, queries, args.k)
+
+    print(f"{len(before)} -> {len(after)} sản phẩm (+{args.added}, ~{args.changed}, -{args.removed})")
+    print(f"Xây dựng lại toàn bộ:        {rebuild_s * 1000:9.1f} ms")
+    print(f"Cập nhật tăng dần (IDF cũ):  {sync_s * 1000:9.1f} ms  top-{args.k} trùng {stale_overlap:.3f}"
+          f"  (nhanh hơn {rebuild_s / sync_s:.1f} lần)")
+    print(f"Tính lại IDF:                {refresh_s * 1000:9.1f} ms  top-{args.k} trùng {fresh_overlap:.3f}"
+          f"  sai lệch tương tự lớn nhất {max_similarity_error(index, rebuilt, queries):.2e}")
+
+
+if __name__ == "__main__":
+    main()
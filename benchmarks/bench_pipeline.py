@@ -0,0 +1,66 @@
+"""
+So sánh pipeline hai bước (sinh ứng viên + xếp hạng lại, recommendation_pipeline.py) với
+chấm điểm toàn bộ catalog (HybridRecommender): độ trễ mỗi truy vấn, thời gian từng bước và
+tỷ lệ top-k của pipeline trùng với top-k khi chấm toàn bộ catalog.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_pipeline --customers 200 --with-product
+"""
+import argparse
+import time
+
+import numpy as np
+from data_store import load_table
+
+from recommendation_pipeline import get_pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--content-data", default="data/content_based_preprocessed.csv")
+    parser.add_argument("--data-files", nargs="+", default=["data/collaborative_full_data_part1.csv",
+                                                            "data/collaborative_full_data_part2.csv"])
+    parser.add_argument("--model-file", default="model/collaborative_model.pkl.gz")
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--with-product", action="store_true", help="Kèm một sản phẩm gốc ngẫu nhiên mỗi truy vấn")
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = load_table(args.content_data)
+    pipeline = get_pipeline(df, args.data_files, args.model_file)
+    pipeline.candidates_per_generator = args.candidates
+    hybrid = pipeline.hybrid
+
+    rng = np.random.default_rng(args.seed)
+    customers = rng.choice(hybrid.collaborative.customer_ids, size=args.customers, replace=False)
+    products = hybrid.index.product_ids[rng.integers(len(hybrid.index), size=args.customers)]
+    queries = [(c, p if args.with_product else None) for c, p in zip(customers, products)]
+
+    # Chạy thử một lần để nạp bảng láng giềng / chỉ mục ANN
+    pipeline.run(*queries[0], top_n=args.k)
+    pipeline.stats.clear()
+
+    full_ms, pipeline_ms, overlaps = [], [], []
+    for customer_id, product_id in queries:
+        start = time.perf_counter()
+        exact = hybrid.recommend(customer_id, product_id, top_n=args.k)
+        full_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        approx = pipeline.recommend(customer_id, product_id, top_n=args.k)
+        pipeline_ms.append((time.perf_counter() - start) * 1000)
+        if len(exact):
+            overlaps.append(len(np.intersect1d(exact['ma_san_pham'], approx['ma_san_pham'])) / len(exact))
+
+    print(f"{len(queries)} truy vấn, catalog {len(hybrid.index)} sản phẩm, top-{args.k}")
+    print(f"Chấm toàn bộ catalog: p50 {np.percentile(full_ms, 50):7.2f} ms  p95 {np.percentile(full_ms, 95):7.2f} ms")
+    print(f"Pipeline hai bước:    p50 {np.percentile(pipeline_ms, 50):7.2f} ms  p95 {np.percentile(pipeline_ms, 95):7.2f} ms"
+          f"  top-{args.k} trùng {np.mean(overlaps):.3f}")
+    for stage, (calls, seconds, candidates) in pipeline.stats.items():
+        print(f"  {stage:20s} {seconds / calls * 1000:7.2f} ms/truy vấn  {candidates / calls:7.1f} ứng viên")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Bộ benchmark độ trễ, thông lượng và bộ nhớ cho hai recommender và đường nạp dữ liệu.
+
+Mỗi kịch bản chạy trong một tiến trình riêng (spawn) với thư mục làm việc là thư mục bộ dữ liệu
+(cùng bố cục data/, model/ như repo) nên các hàm được gọi với đường dẫn mặc định như khi chạy thật,
+và bộ nhớ đỉnh (peak RSS) đo được là của riêng kịch bản đó. Bộ dữ liệu x1, x10, x100 được sinh
+bằng benchmarks/synthetic.py (nếu chưa có); `--repo` chạy thêm trên chính thư mục repo
+(chỉ đọc: chỉ mục nội dung được nạp/xây dựng trong thư mục tạm, không ghi vào model/ của repo).
+
+Kết quả (p50/p95/p99, thông lượng, peak RSS) được in ra và lưu JSON kèm commit hiện tại;
+`--compare` so với một file kết quả trước đó.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.run_benchmarks --scales 1 10 --queries 200
+    python -m benchmarks.run_benchmarks --scales 1 --compare benchmarks/results/<file trước>.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+DATASETS_DIR = os.path.join(REPO_ROOT, "benchmarks", "datasets")
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+CONTENT_FILE = "data/content_based_preprocessed.csv"
+SCENARIOS = ('content_load', 'content_index_build', 'collaborative_load', 'content_recommend',
+             'collaborative_recommend')
+
+
+def collaborative_files():
+    import glob
+
+    data_files = sorted(glob.glob("data/collaborative_full_data_part*.csv"))
+    # Ưu tiên mô hình dạng mảng (model_store.py), nếu không có thì dùng pickle
+    model_file = "model/collaborative_model"
+    if not os.path.isdir(model_file):
+        model_file += ".pkl.gz"
+    return data_files, model_file
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_queries(function, queries, threads):
+    """
+    Gọi `function(query)` cho từng truy vấn (song song `threads` luồng); trả về (độ trễ từng lần, tổng thời gian).
+    """
+    start = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            samples = list(pool.map(lambda query: timed(function, query), queries))
+    else:
+        samples = [timed(function, query) for query in queries]
+    return samples, time.perf_counter() - start
+
+
+def scenario_content_load(args, rng):
+    from content_based_recommendation import ContentIndex, get_content_index
+    from data_store import load_table
+
+    # Chỉ mục phải có sẵn trên đĩa để đo đường nạp (không tính lần xây dựng đầu tiên)
+    if not ContentIndex.exists(args.index_dir):
+        get_content_index(load_table(CONTENT_FILE), args.index_dir)
+
+    def load(_):
+        load_table(CONTENT_FILE)
+        ContentIndex.load(args.index_dir)
+
+    return run_queries(load, range(args.load_repeats), 1)
+
+
+def scenario_content_index_build(args, rng):
+    from content_based_recommendation import ContentIndex
+    from data_store import load_table
+
+    df = load_table(CONTENT_FILE)
+    return run_queries(lambda _: ContentIndex.build(df), range(args.load_repeats), 1)
+
+
+def scenario_collaborative_load(args, rng):
+    from collaborative_recommend import CollaborativeRecommender
+
+    data_files, model_file = collaborative_files()
+    return run_queries(lambda _: CollaborativeRecommender(data_files, model_file), range(args.load_repeats), 1)
+
+
+def scenario_content_recommend(args, rng):
+    from content_based_recommendation import get_content_index, recommend_products
+    from data_store import load_table
+
+    df = load_table(CONTENT_FILE)
+    index = get_content_index(df, args.index_dir)
+    queries = rng.choice(index.product_ids, size=args.queries)
+    recommend_products(queries[0], df, index=index, use_cache=False)
+    return run_queries(lambda pid: recommend_products(pid, df, index=index, use_cache=False), queries, args.threads)
+
+
+def scenario_collaborative_recommend(args, rng):
+    from collaborative_recommend import get_recommender, recommend_products
+
+    data_files, model_file = collaborative_files()
+    recommender = get_recommender(data_files, model_file)
+    queries = rng.choice(recommender.customer_ids, size=args.queries)
+    recommend_products(data_files, model_file, queries[0], use_cache=False)
+    return run_queries(lambda cid: recommend_products(data_files, model_file, cid, use_cache=False), queries,
+                       args.threads)
+
+
+def run_scenario(dataset_dir, scenario, args, results):
+    """
+    Chạy trong tiến trình con: đổi thư mục làm việc sang bộ dữ liệu, đo và gửi kết quả về.
+    """
+    import resource
+
+    os.chdir(dataset_dir)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from content_based_recommendation import CONTENT_INDEX_DIR
+
+    # Trên thư mục repo, chỉ mục nội dung được chép sang (hoặc xây dựng trong) thư mục tạm
+    # để lần chạy benchmark không ghi vào model/ của repo
+    temp_dir = None
+    args.index_dir = CONTENT_INDEX_DIR
+    if os.path.realpath(dataset_dir) == REPO_ROOT:
+        temp_dir = tempfile.mkdtemp(prefix="bench-content-index-")
+        args.index_dir = os.path.join(temp_dir, "content_index")
+        if os.path.isdir(CONTENT_INDEX_DIR):
+            shutil.copytree(CONTENT_INDEX_DIR, args.index_dir)
+    rng = np.random.default_rng(args.seed)
+    try:
+        samples, wall = globals()[f"scenario_{scenario}"](args, rng)
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    samples_ms = np.asarray(samples) * 1000
+    results.put({
+        'n': len(samples),
+        'p50_ms': float(np.percentile(samples_ms, 50)),
+        'p95_ms': float(np.percentile(samples_ms, 95)),
+        'p99_ms': float(np.percentile(samples_ms, 99)),
+        'mean_ms': float(samples_ms.mean()),
+        'throughput_per_s': len(samples) / wall,
+        # ru_maxrss tính bằng kB trên Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def measure(dataset_dir, scenario, args):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_scenario, args=(dataset_dir, scenario, args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_dirs(args):
+    """
+    Danh sách (tên, thư mục) bộ dữ liệu; sinh bộ dữ liệu tổng hợp nếu chưa có.
+    """
+    from benchmarks.synthetic import MODEL_DIR, build_dataset
+
+    datasets = [("repo", REPO_ROOT)] if args.repo else []
+    for scale in args.scales:
+        path = os.path.join(DATASETS_DIR, f"x{scale}")
+        if not os.path.isdir(os.path.join(path, MODEL_DIR)):
+            print(f"Sinh bộ dữ liệu x{scale} ...", flush=True)
+            build_dataset(scale, path, REPO_ROOT, seed=args.seed)
+        datasets.append((f"x{scale}", path))
+    return datasets
+
+
+def compare(results, previous_path):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = {(r['dataset'], r['scenario']): r for r in json.load(f)['results']}
+    print(f"\nSo với {previous_path}:")
+    for result in results:
+        before = previous.get((result['dataset'], result['scenario']))
+        if before is None:
+            continue
+        changes = "  ".join(f"{key} {(result[key] / before[key] - 1) * 100:+6.1f}%"
+                            for key in ('p50_ms', 'p95_ms', 'throughput_per_s', 'peak_rss_mb') if before[key])
+        print(f"{result['dataset']:6s} {result['scenario']:24s} {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="Ví dụ: 1 10 100")
+    parser.add_argument("--repo", action="store_true", help="Chạy thêm trên data/ và model/ của repo")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--queries", type=int, default=200, help="Số truy vấn mỗi kịch bản gợi ý")
+    parser.add_argument("--load-repeats", type=int, default=3, help="Số lần lặp mỗi kịch bản nạp dữ liệu")
+    parser.add_argument("--threads", type=int, default=1, help="Số luồng gửi truy vấn song song")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Mặc định: benchmarks/results/<thời gian>-<commit>.json")
+    parser.add_argument("--compare", default=None, help="File kết quả trước đó để so sánh")
+    args = parser.parse_args()
+
+    commit = current_commit()
+    results = []
+    print(f"{'dataset':6s} {'scenario':24s} {'n':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} "
+          f"{'/s':>9s} {'RSS MB':>8s}")
+    for name, path in dataset_dirs(args):
+        for scenario in args.scenarios:
+            result = {'dataset': name, 'scenario': scenario, **measure(path, scenario, args)}
+            results.append(result)
+            print(f"{name:6s} {scenario:24s} {result['n']:5d} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+                  f"{result['p99_ms']:9.2f} {result['throughput_per_s']:9.1f} {result['peak_rss_mb']:8.1f}",
+                  flush=True)
+
+    report = {
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'queries': args.queries, 'load_repeats': args.load_repeats, 'threads': args.threads,
+                     'seed': args.seed},
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Đã lưu kết quả: {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Sinh bộ dữ liệu benchmark có cùng bố cục với repo (data/ và model/) từ dữ liệu đi kèm,
+phóng to catalog và log đánh giá `--scale` lần.
+
+- Sản phẩm: bảng `content_based_preprocessed.csv` nếu có, nếu không thì `san_pham_updated.csv`
+  với tokens tách đơn giản từ tên và mô tả. Mỗi bản sao có mã mới (mã gốc * 1000 + k) và
+  tokens bị xáo trộn (bỏ ngẫu nhiên một phần, thêm từ của sản phẩm khác) để độ tương tự khác nhau.
+- Đánh giá: `Danh_gia.csv` ghép thông tin sản phẩm (không gồm mô tả/phân loại để file 100x vẫn
+  vừa phải). Mỗi bản sao trỏ tới sản phẩm sao chép tương ứng và hoán vị khách hàng; số khách hàng
+  giữ nguyên nên ma trận tương tự khách hàng x khách hàng của mô hình không tăng kích thước.
+- Mô hình: mô hình đi kèm cập nhật tăng dần với các đánh giá sinh thêm (collaborative_update.py),
+  lưu dạng mảng tại `model/collaborative_model`.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.synthetic --scale 10 --output benchmarks/datasets/x10
+"""
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from data_store import load_table
+
+CONTENT_FILE = "data/content_based_preprocessed.csv"
+REVIEWS_FILE = "data/collaborative_full_data_part1.csv"
+MODEL_DIR = "model/collaborative_model"
+PRODUCT_COLUMNS = ['ma_san_pham', 'ten_san_pham', 'gia_ban', 'gia_goc', 'diem_trung_binh', 'hinh_anh']
+ID_MULTIPLIER = 1000
+
+
+def tokenize(text):
+    return re.findall(r"\w+", str(text).lower())
+
+
+def base_products(source_dir):
+    path = os.path.join(source_dir, CONTENT_FILE)
+    if os.path.exists(path):
+        return load_table(path)
+    products = load_table(os.path.join(source_dir, "data/san_pham_updated.csv"))
+    products['tokens'] = (products['ten_san_pham'].fillna('') + ' ' + products['mo_ta'].fillna('')).map(tokenize)
+    return products
+
+
+def base_reviews(source_dir, products):
+    reviews = load_table(os.path.join(source_dir, "data/Danh_gia.csv"))
+    return reviews.merge(products[PRODUCT_COLUMNS], on='ma_san_pham', how='inner')
+
+
+def perturb_tokens(tokens, other, rng, drop=0.3):
+    tokens = [t for t in tokens if rng.random() >= drop]
+    extra = other[:max(1, len(other) // 4)]
+    return tokens + list(extra)
+
+
+def scale_tables(products, reviews, scale, rng):
+    """
+    Trả về (sản phẩm, đánh giá) gồm bản gốc và `scale - 1` bản sao.
+    """
+    product_parts, review_parts = [products], [reviews]
+    tokens = products['tokens'].tolist()
+    customers = reviews['ma_khach_hang'].unique()
+    max_review_id = int(reviews['id'].max()) + 1
+    for k in range(1, scale):
+        others = rng.integers(len(tokens), size=len(tokens))
+        product_parts.append(products.assign(
+            ma_san_pham=products['ma_san_pham'].astype(np.int64) * ID_MULTIPLIER + k,
+            tokens=[perturb_tokens(t, tokens[o], rng) for t, o in zip(tokens, others)],
+        ))
+        customer_map = pd.Series(rng.permutation(customers), index=customers)
+        review_parts.append(reviews.assign(
+            id=reviews['id'].astype(np.int64) + k * max_review_id,
+            ma_khach_hang=customer_map.loc[reviews['ma_khach_hang']].to_numpy(),
+            ma_san_pham=reviews['ma_san_pham'].astype(np.int64) * ID_MULTIPLIER + k,
+        ))
+    return pd.concat(product_parts, ignore_index=True), pd.concat(review_parts, ignore_index=True)
+
+
+def write_table(df, csv_path):
+    """
+    Ghi CSV và file Feather bên cạnh (mới hơn CSV) như `data_store.py convert`.
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+    from data_store import feather_path, normalize_types
+
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    df.to_csv(csv_path, index=False)
+    table = pa.Table.from_pandas(normalize_types(df), preserve_index=False)
+    feather.write_feather(table, feather_path(csv_path), compression='uncompressed')
+
+
+def build_dataset(scale, output_dir, source_dir=".", model_file="model/collaborative_model.pkl.gz", seed=0):
+    """
+    Sinh bộ dữ liệu tại `output_dir` (data/, model/); trả về `output_dir`.
+    """
+    from collaborative_update import load_model_state, save_state, update_state
+
+    rng = np.random.default_rng(seed)
+    products = base_products(source_dir)
+    reviews = base_reviews(source_dir, products)
+    n_base_reviews = len(reviews)
+    products, reviews = scale_tables(products, reviews, scale, rng)
+    write_table(products, os.path.join(output_dir, CONTENT_FILE))
+    write_table(reviews, os.path.join(output_dir, REVIEWS_FILE))
+
+    state = load_model_state(os.path.join(source_dir, model_file))
+    # Mô hình đi kèm đã có các đánh giá gốc, chỉ gộp thêm các bản sao
+    extra = reviews.iloc[n_base_reviews:]
+    if len(extra):
+        state = update_state(state, extra['ma_khach_hang'].astype(str).to_numpy(),
+                             extra['ma_san_pham'].astype(str).to_numpy(), extra['so_sao'].to_numpy())
+    save_state(state, os.path.join(output_dir, MODEL_DIR), scale=scale, seed=seed)
+    return output_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Mặc định: benchmarks/datasets/x<scale>")
+    parser.add_argument("--source", default=".", help="Thư mục repo chứa data/ và model/")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    output = build_dataset(args.scale, args.output or f"benchmarks/datasets/x{args.scale}", args.source,
+                           seed=args.seed)
+    print(f"Đã sinh bộ dữ liệu x{args.scale} tại {output} trong {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,170 @@
+import os
+import hashlib
+import multiprocessing
+import numpy as np
+from id_registry import IdRegistry
+from model_store import HEADER_FILE
+
+# File lưu top-N sản phẩm gợi ý đã tính trước cho từng khách hàng
+COLLABORATIVE_TOPN_FILE = "model/collaborative_topn.npz"
+
+
+def file_signature(path):
+    """
+    Mã băm nội dung file mô hình: kết quả tính trước chỉ dùng được với đúng mô hình đã sinh ra nó.
+    Với thư mục mảng (model_store), header đã chứa mã băm từng mảng nên chỉ cần băm header.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, HEADER_FILE)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PrecomputedRecommendations:
+    """
+    Top-N vị trí trong catalog (int32) và điểm (float32) cho mọi khách hàng,
+    kèm dấu vân tay đánh giá tại thời điểm tính để biết dòng nào đã cũ.
+    """
+
+    def __init__(self, customer_ids, catalog_ids, top_items, top_scores, fingerprints, model_signature):
+        self.customer_ids = np.asarray(customer_ids, dtype=str)
+        self.catalog_ids = np.asarray(catalog_ids, dtype=str)
+        self.top_items = np.asarray(top_items, dtype=np.int32)
+        self.top_scores = np.asarray(top_scores, dtype=np.float32)
+        self.fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        self.model_signature = str(model_signature)
+        self.customers = IdRegistry(self.customer_ids)
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+    @property
+    def top_n(self):
+        return self.top_items.shape[1]
+
+    def lookup(self, customer_id, top_n, fingerprint=None):
+        """
+        Trả về (vị trí catalog, điểm) hoặc None nếu chưa có, không đủ top_n
+        hoặc đánh giá của khách hàng đã thay đổi kể từ lần tính (khác `fingerprint`).
+        """
+        row = self.customers.get(customer_id)
+        if row < 0 or top_n > self.top_n:
+            return None
+        if fingerprint is not None and fingerprint != self.fingerprints[row]:
+            return None
+        items = self.top_items[row, :top_n]
+        valid = items >= 0
+        return items[valid], self.top_scores[row, :top_n][valid].astype(np.float64)
+
+    def save(self, path=COLLABORATIVE_TOPN_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, customer_ids=self.customer_ids, catalog_ids=self.catalog_ids,
+                 top_items=self.top_items, top_scores=self.top_scores,
+                 fingerprints=self.fingerprints, model_signature=np.array(self.model_signature))
+
+    @classmethod
+    def load(cls, path=COLLABORATIVE_TOPN_FILE):
+        with np.load(path) as data:
+            return cls(data['customer_ids'], data['catalog_ids'], data['top_items'], data['top_scores'],
+                       data['fingerprints'], str(data['model_signature']))
+
+
+def load_precomputed(path, model_file, catalog_ids):
+    """
+    Nạp kết quả tính trước nếu có và được sinh từ đúng mô hình và catalog hiện tại.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    store = PrecomputedRecommendations.load(path)
+    if store.model_signature != file_signature(model_file) or not np.array_equal(store.catalog_ids, catalog_ids):
+        return None
+    return store
+
+
+# Recommender của tiến trình worker (kế thừa khi fork, hoặc nạp lại trong initializer)
+_worker_recommender = None
+
+
+def _init_worker(data_files, model_file):
+    global _worker_recommender
+    if _worker_recommender is None:
+        from collaborative_recommend import CollaborativeRecommender
+        _worker_recommender = CollaborativeRecommender(data_files, model_file, precomputed_file=None)
+
+
+def _score_chunk(args):
+    codes, top_n = args
+    return _worker_recommender.top_items_for_codes(codes, top_n)
+
+
+def precompute_recommendations(recommender, top_n=20, processes=None, chunk_size=256, previous=None):
+    """
+    Tính top-N cho mọi khách hàng bằng một pool tiến trình. Nếu có `previous`
+    (cùng mô hình và catalog) thì chỉ tính lại khách hàng mới hoặc có đánh giá thay đổi.
+    """
+    global _worker_recommender
+
+    # Khách hàng có trong dữ liệu đánh giá là các chỉ số đầu tiên của bộ đăng ký mã
+    fingerprints = recommender.fingerprints
+    customers = recommender.customers.to_ids(np.arange(len(fingerprints)))
+    signature = file_signature(recommender.model_file)
+
+    top_items = np.full((len(customers), top_n), -1, dtype=np.int32)
+    top_scores = np.full((len(customers), top_n), np.nan, dtype=np.float32)
+
+    todo = np.arange(len(customers))
+    if (previous is not None and previous.model_signature == signature and previous.top_n >= top_n
+            and np.array_equal(previous.catalog_ids, recommender.catalog_ids)):
+        # Giữ lại các dòng có dấu vân tay không đổi
+        old_rows = previous.customers.lookup(customers).astype(np.int64)
+        unchanged = (old_rows >= 0) & (previous.fingerprints[np.maximum(old_rows, 0)] == fingerprints)
+        top_items[unchanged] = previous.top_items[old_rows[unchanged], :top_n]
+        top_scores[unchanged] = previous.top_scores[old_rows[unchanged], :top_n]
+        todo = np.flatnonzero(~unchanged)
+
+    chunks = [todo[start:start + chunk_size] for start in range(0, len(todo), chunk_size)]
+    # Worker nhận chỉ số khách hàng (cùng thứ tự đăng ký ở mọi tiến trình) thay vì mã chuỗi
+    tasks = [(rows, top_n) for rows in chunks]
+
+    if tasks:
+        # Với fork, worker dùng chung recommender đã nạp của tiến trình cha
+        _worker_recommender = recommender
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with context.Pool(processes, initializer=_init_worker,
+                          initargs=(recommender.data_files, recommender.model_file)) as pool:
+            for rows, (items, scores) in zip(chunks, pool.imap(_score_chunk, tasks)):
+                top_items[rows, :items.shape[1]] = items
+                top_scores[rows, :scores.shape[1]] = scores
+
+    return PrecomputedRecommendations(customers, recommender.catalog_ids, top_items, top_scores,
+                                      fingerprints, signature), len(todo)
+
+
+if __name__ == "__main__":
+    # Job offline: python collaborative_precompute.py [--full] [--top-n 20] [--processes N]
+    import argparse
+    from collaborative_recommend import CollaborativeRecommender
+
+    parser = argparse.ArgumentParser(description="Tính trước top-N gợi ý collaborative cho mọi khách hàng")
+    parser.add_argument("--data-files", nargs="+", default=["data/collaborative_full_data_part1.csv",
+                                                            "data/collaborative_full_data_part2.csv"])
+    parser.add_argument("--model-file", default="model/collaborative_model.pkl.gz")
+    parser.add_argument("--output", default=COLLABORATIVE_TOPN_FILE)
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--processes", type=int, default=None, help="Mặc định dùng toàn bộ số nhân CPU")
+    parser.add_argument("--full", action="store_true", help="Tính lại toàn bộ, bỏ qua kết quả cũ")
+    args = parser.parse_args()
+
+    recommender = CollaborativeRecommender(args.data_files, args.model_file, precomputed_file=None)
+    previous = None
+    if not args.full and os.path.exists(args.output):
+        previous = PrecomputedRecommendations.load(args.output)
+
+    store, refreshed = precompute_recommendations(recommender, top_n=args.top_n, processes=args.processes,
+                                                  previous=previous)
+    store.save(args.output)
+    print(f"Đã tính lại {refreshed}/{len(store)} khách hàng, lưu vào {args.output}")
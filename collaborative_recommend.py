@@ -1,36 +1,213 @@
+import threading
+import numpy as np
 import pandas as pd
-import gzip
-import pickle
+from collaborative_scoring import top_k_indices, top_k_rows
+from collaborative_update import load_model_state, resolve_model_file
+from collaborative_precompute import COLLABORATIVE_TOPN_FILE, load_precomputed
+from ingestion import DEFAULT_CHUNKSIZE, load_interactions
+from metrics import increment, span
+from recommendation_cache import dependency_signature, recommendation_cache
 
-def recommend_products(data_files, model_file, customer_id, top_n=6):
-    # Load dữ liệu từ nhiều file
-    full_data = pd.concat([pd.read_csv(f) for f in data_files])
 
-    # Chuẩn hóa cột
-    full_data['ma_khach_hang'] = full_data['ma_khach_hang'].astype(str).str.strip()
-    full_data['ma_san_pham'] = full_data['ma_san_pham'].astype(str).str.strip()
-    customer_id = str(customer_id).strip()
+class CollaborativeRecommender:
+    """
+    Giữ mô hình KNNBaseline và dữ liệu đánh giá trong bộ nhớ:
+    chỉ đọc file và giải nén mô hình một lần khi khởi tạo.
+    """
 
-    # Load model
-    with gzip.open(model_file, 'rb') as f:
-        model = pickle.load(f)
+    def __init__(self, data_files, model_file, precomputed_file=COLLABORATIVE_TOPN_FILE, chunksize=DEFAULT_CHUNKSIZE):
+        self.data_files = list(data_files)
+        # Phiên bản cập nhật mới nhất (nếu có) thay cho file pickle được cấu hình
+        self.model_file = resolve_model_file(model_file)
 
-    # Lọc các sản phẩm đã đánh giá cao
-    df_selected = full_data[(full_data['ma_khach_hang'] == customer_id) & (full_data['so_sao'] >= 3)]['ma_san_pham']
+        # Đọc dữ liệu đánh giá theo từng khối (ingestion.py): chỉ giữ mảng chỉ số và thông tin sản phẩm
+        with span('collaborative.load_interactions'):
+            interactions = load_interactions(self.data_files, chunksize)
+        self.interactions = interactions
 
-    # Chuẩn bị danh sách sản phẩm để dự đoán
-    df_score = full_data[['ma_san_pham']].drop_duplicates()
-    df_score = df_score[~df_score['ma_san_pham'].isin(df_selected)]
+        # Load model (pickle Surprise hoặc phiên bản cập nhật tăng dần) và trích xuất các mảng cần cho suy luận
+        with span('collaborative.load_model'):
+            self.state = load_model_state(self.model_file)
 
-    # Dự đoán điểm
-    df_score['EstimateScore'] = df_score['ma_san_pham'].apply(
-        lambda x: model.predict(customer_id, x).est
-    )
+        # Catalog là các sản phẩm theo chỉ số trong bộ đăng ký mã sản phẩm (id_registry.py),
+        # thông tin sản phẩm cùng thứ tự dùng khi trả kết quả
+        self.products = interactions.product_info
+        self.product_details = self.products.drop(columns='ma_san_pham')
+        self.catalog_ids = interactions.product_ids
+        self.catalog_items = self.state.inner_items(self.catalog_ids)
 
-    # Lọc và sắp xếp
-    recommendations = df_score.sort_values(by='EstimateScore', ascending=False).head(top_n)
-    recommendations = recommendations.merge(full_data.drop_duplicates(subset='ma_san_pham'), on='ma_san_pham', how='left')
-    return recommendations
+        # Chỉ số khách hàng: khách hàng trong dữ liệu trước, sau đó khách hàng chỉ có trong mô hình;
+        # mỗi chỉ số ánh xạ sẵn sang chỉ số nội bộ của mô hình (-1 nếu không có)
+        self.customers = interactions.customers
+        n_customers = len(self.customers)
+        self.customer_ids = self.customers.ids
+        self.customers.add(self.state.user_ids)
+        self.customer_users = self.state.inner_users(self.customers.ids)
 
+        # Sản phẩm (vị trí trong catalog) mỗi khách hàng đã đánh giá cao (>= 3 sao), dạng CSR theo chỉ số
+        self.liked_indptr, self.liked_positions = interactions.liked_products(min_rating=3)
+        self.liked_indptr = np.pad(self.liked_indptr, (0, len(self.customers) - n_customers), mode='edge')
 
+        # Dấu vân tay đánh giá (theo chỉ số khách hàng) và kết quả tính trước (nếu có, còn khớp mô hình)
+        self.fingerprints = interactions.fingerprints
+        with span('collaborative.load_precomputed'):
+            self.precomputed = load_precomputed(precomputed_file, self.model_file, self.catalog_ids)
 
+    def customer_codes(self, customer_ids):
+        return self.customers.lookup(customer_ids)
+
+    def fingerprint(self, code):
+        return self.fingerprints[code] if 0 <= code < len(self.fingerprints) else None
+
+    def scores_for_codes(self, codes):
+        """
+        Ma trận điểm ước lượng (số khách hàng x catalog) theo chỉ số khách hàng (-1 là khách hàng mới);
+        sản phẩm khách đã đánh giá cao là -inf.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        scores = self.state.estimate_inner(self.users_for_codes(codes), self.catalog_items)
+        scores[self.liked_pairs(codes)] = -np.inf
+        return scores
+
+    def users_for_codes(self, codes):
+        """
+        Chỉ số nội bộ của mô hình cho các chỉ số khách hàng (-1 nếu không có).
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        return np.where(codes >= 0, self.customer_users[np.maximum(codes, 0)], -1)
+
+    def liked_pairs(self, codes):
+        """
+        Các cặp (dòng trong `codes`, vị trí catalog) sản phẩm đã đánh giá cao của nhiều khách hàng
+        cùng lúc, bằng cách trải các đoạn CSR.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        rows = np.flatnonzero(codes >= 0)
+        starts = self.liked_indptr[codes[rows]]
+        lengths = self.liked_indptr[codes[rows] + 1] - starts
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(rows, lengths), self.liked_positions[np.repeat(starts, lengths) + offsets]
+
+    def scores_many(self, customer_ids):
+        return self.scores_for_codes(self.customer_codes(customer_ids))
+
+    def scores(self, customer_id):
+        return self.scores_many([customer_id])[0]
+
+    def top_items_for_codes(self, codes, top_n=6):
+        return top_k_rows(self.scores_for_codes(codes), top_n)
+
+    def top_items(self, customer_ids, top_n=6):
+        """
+        Top-N vị trí trong catalog và điểm cho nhiều khách hàng cùng lúc (-1 nếu không đủ sản phẩm).
+        """
+        return self.top_items_for_codes(self.customer_codes(customer_ids), top_n)
+
+    def recommend(self, customer_id, top_n=6):
+        customer_id = str(customer_id).strip()
+        code = self.customers.get(customer_id)
+
+        # Ưu tiên kết quả đã tính trước (collaborative_precompute.py) nếu còn hợp lệ
+        precomputed = None
+        if self.precomputed is not None and self.fingerprint(code) is not None:
+            with span('collaborative.precomputed_lookup'):
+                precomputed = self.precomputed.lookup(customer_id, top_n, self.fingerprint(code))
+        if precomputed is not None:
+            top, top_scores = precomputed
+            increment('recommendation_precomputed_hits_total', recommender='collaborative')
+        else:
+            # Dự đoán điểm cho toàn bộ catalog trong một phép tính vector hóa
+            with span('collaborative.score'):
+                scores = self.scores_for_codes([code])[0]
+            increment('recommendation_items_scored_total', len(scores), recommender='collaborative')
+            with span('collaborative.top_k'):
+                top = top_k_indices(scores, min(top_n, int(np.isfinite(scores).sum())))
+                top_scores = scores[top]
+
+        with span('collaborative.build'):
+            return self.build_recommendations(top, top_scores)
+
+    def recommend_many(self, customer_ids, top_n=6, chunk_size=256):
+        """
+        Gợi ý cho nhiều khách hàng: chấm điểm theo từng khối khách hàng trong một phép tính
+        vector hóa. Trả về DataFrame dài với cột 'query_ma_khach_hang' và 'rank'.
+        """
+        customer_ids = np.asarray([str(c).strip() for c in customer_ids], dtype=object)
+        codes = self.customer_codes(customer_ids)
+        if not len(customer_ids):
+            recommendations = self.build_recommendations(np.empty(0, dtype=np.intp), [])
+            return recommendations.assign(query_ma_khach_hang=[], rank=[])
+
+        queries, ranks, positions, scores = [], [], [], []
+        for start in range(0, len(customer_ids), chunk_size):
+            top, top_scores = self.top_items_for_codes(codes[start:start + chunk_size], top_n)
+            valid = top >= 0
+            rows, cols = np.nonzero(valid)
+            queries.append(customer_ids[start:start + chunk_size][rows])
+            ranks.append(cols + 1)
+            positions.append(top[valid])
+            scores.append(top_scores[valid])
+
+        recommendations = self.build_recommendations(np.concatenate(positions), np.concatenate(scores))
+        recommendations.insert(0, 'query_ma_khach_hang', np.concatenate(queries))
+        recommendations.insert(1, 'rank', np.concatenate(ranks))
+        return recommendations
+
+    def build_recommendations(self, positions, scores):
+        """
+        Ghép thông tin sản phẩm cho các vị trí catalog đã chọn.
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        recommendations = pd.DataFrame({
+            'ma_san_pham': self.catalog_ids[positions],
+            'EstimateScore': scores,
+        })
+        # Thông tin sản phẩm cùng thứ tự với catalog nên lấy trực tiếp theo vị trí
+        details = self.product_details.iloc[positions].reset_index(drop=True)
+        return pd.concat([recommendations, details], axis=1)
+
+
+# Recommender dùng chung cho cả ứng dụng, mỗi bộ (data_files, model_file) chỉ nạp một lần
+# và chỉ nạp lại khi file mô hình/dữ liệu thay đổi
+_recommenders = {}
+_recommenders_lock = threading.Lock()
+
+
+def _dependencies(data_files, model_file):
+    # Mô hình đã phân giải: khi có phiên bản cập nhật mới, đường dẫn (và chữ ký) đổi nên recommender được nạp lại
+    return tuple(data_files) + (resolve_model_file(model_file), COLLABORATIVE_TOPN_FILE)
+
+
+def get_recommender(data_files, model_file):
+    key = (tuple(data_files), model_file)
+    signature = dependency_signature(_dependencies(data_files, model_file))
+    entry = _recommenders.get(key)
+    if entry is None or entry[1] != signature:
+        with _recommenders_lock:
+            entry = _recommenders.get(key)
+            if entry is None or entry[1] != signature:
+                entry = (CollaborativeRecommender(data_files, model_file), signature)
+                _recommenders[key] = entry
+    return entry[0]
+
+
+def recommend_many_customers(data_files, model_file, customer_ids, top_n=6, chunk_size=256):
+    """
+    Gợi ý cho nhiều khách hàng cùng lúc, dùng chung recommender đã nạp.
+    """
+    return get_recommender(data_files, model_file).recommend_many(customer_ids, top_n, chunk_size)
+
+
+def recommend_products(data_files, model_file, customer_id, top_n=6, use_cache=True):
+    """
+    Gợi ý sản phẩm cho khách hàng; kết quả được cache (recommendation_cache.py)
+    cho tới khi file mô hình hoặc dữ liệu thay đổi.
+    """
+    def compute():
+        return get_recommender(data_files, model_file).recommend(customer_id, top_n)
+
+    with span('collaborative.recommend'):
+        if not use_cache:
+            return compute()
+        key = ('collaborative', str(customer_id).strip(), tuple(data_files), model_file, top_n)
+        return recommendation_cache.get_or_compute(key, compute, dependencies=_dependencies(data_files, model_file))
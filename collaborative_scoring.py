@@ -0,0 +1,247 @@
+import numpy as np
+from id_registry import IdRegistry
+
+
+class KNNBaselineState:
+    """
+    Các thành phần của mô hình KNNBaseline (Surprise) cần cho suy luận, lưu dưới
+    dạng mảng NumPy: baseline `bu`/`bi`, ma trận tương tự và ma trận đánh giá của
+    trainset. Cho phép ước lượng điểm cho nhiều (khách hàng, sản phẩm) cùng lúc
+    thay vì gọi `model.predict` cho từng cặp.
+
+    Đánh giá được lưu theo "yr" của Surprise (dạng CSR): với mô hình item-based,
+    mỗi dòng y là một khách hàng và các cột x là sản phẩm; với user-based thì ngược lại.
+    """
+
+    def __init__(self, global_mean, bu, bi, sim, yr_indptr, yr_indices, yr_ratings,
+                 user_ids, item_ids, k, min_k, user_based, rating_scale,
+                 sim_options=None, bsl_options=None):
+        self.global_mean = float(global_mean)
+        self.bu = np.asarray(bu, dtype=np.float64)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.sim = np.asarray(sim, dtype=np.float64)
+        self.yr_indptr = np.asarray(yr_indptr, dtype=np.int64)
+        self.yr_indices = np.asarray(yr_indices, dtype=np.int32)
+        self.yr_ratings = np.asarray(yr_ratings, dtype=np.float64)
+        self.user_ids = np.asarray(user_ids, dtype=str)
+        self.item_ids = np.asarray(item_ids, dtype=str)
+        self.k = int(k)
+        self.min_k = int(min_k)
+        self.user_based = bool(user_based)
+        self.rating_scale = tuple(float(v) for v in rating_scale)
+        self.sim_options = dict(sim_options or {})
+        self.bsl_options = dict(bsl_options or {})
+        self.users = IdRegistry(self.user_ids)
+        self.items = IdRegistry(self.item_ids)
+        self._full_layout = None
+
+    @property
+    def n_users(self):
+        return len(self.user_ids)
+
+    @property
+    def n_items(self):
+        return len(self.item_ids)
+
+    @property
+    def bx(self):
+        return self.bu if self.user_based else self.bi
+
+    @property
+    def by(self):
+        return self.bi if self.user_based else self.bu
+
+    def inner_users(self, user_ids):
+        """
+        Chuyển mã khách hàng sang chỉ số nội bộ (-1 nếu không có trong trainset).
+        """
+        return self.users.lookup(user_ids).astype(np.int64)
+
+    def inner_items(self, item_ids):
+        return self.items.lookup(item_ids).astype(np.int64)
+
+    def estimate(self, user_ids, item_ids, max_cells=4_000_000):
+        """
+        Ma trận điểm ước lượng (số khách hàng x số sản phẩm), tương đương
+        `model.predict(u, i).est` của Surprise cho từng cặp (kể cả clip theo rating_scale).
+        """
+        return self.estimate_inner(self.inner_users(user_ids), self.inner_items(item_ids), max_cells)
+
+    def estimate_inner(self, users, items, max_cells=4_000_000):
+        """
+        Như `estimate` nhưng nhận trực tiếp chỉ số nội bộ (-1 là chưa biết).
+        """
+        users = np.asarray(users, dtype=np.int64)
+        items = np.asarray(items, dtype=np.int64)
+        known_u = users >= 0
+        known_i = items >= 0
+
+        est = np.full((len(users), len(items)), self.global_mean)
+        est += np.where(known_u, self.bu[np.where(known_u, users, 0)], 0.0)[:, None]
+        est += np.where(known_i, self.bi[np.where(known_i, items, 0)], 0.0)[None, :]
+
+        # Chỉ các cặp mà cả khách hàng và sản phẩm đều có trong trainset mới dùng láng giềng
+        ku = np.flatnonzero(known_u)
+        ki = np.flatnonzero(known_i)
+        if len(ku) and len(ki):
+            if self.user_based:
+                term = self._neighbor_term(users[ku], items[ki], max_cells)
+            else:
+                term = self._neighbor_term(items[ki], users[ku], max_cells).T
+            est[np.ix_(ku, ki)] += term
+
+        lower, higher = self.rating_scale
+        return np.clip(est, lower, higher)
+
+    def _neighbor_term(self, xs, ys, max_cells):
+        """
+        sum(sim * (r - baseline)) / sum(sim) trên k láng giềng có sim lớn nhất
+        (chỉ tính sim > 0), cho mọi cặp (x, y). Kết quả có dạng (len(xs) x len(ys)).
+        """
+        out = np.zeros((len(xs), len(ys)))
+        if len(ys) == len(self.yr_indptr) - 1 and np.array_equal(ys, np.arange(len(ys))):
+            # Trường hợp thường gặp (mọi y): bố cục đoạn chỉ tính một lần
+            if self._full_layout is None:
+                self._full_layout = self._segment_layout(ys)
+            layout = self._full_layout
+        else:
+            layout = self._segment_layout(ys)
+        if layout is None:
+            return out
+        nonempty, seg, seg_starts, lengths, neighbors, deviations = layout
+
+        rows_per_chunk = max(1, max_cells // len(seg))
+        for start in range(0, len(xs), rows_per_chunk):
+            stop = min(start + rows_per_chunk, len(xs))
+            weights = self.sim[np.ix_(xs[start:stop], neighbors)]
+            out[start:stop, nonempty] = _segment_top_k_mean(
+                weights, deviations, seg, seg_starts, lengths, self.k, self.min_k
+            )
+        return out
+
+    def _segment_layout(self, ys):
+        """
+        Gom các đánh giá của mọi y thành một dãy, mỗi y là một đoạn liên tiếp,
+        kèm độ lệch so với baseline của từng đánh giá.
+        """
+        starts = self.yr_indptr[ys]
+        lengths = self.yr_indptr[ys + 1] - starts
+        nonempty = np.flatnonzero(lengths > 0)
+        if len(nonempty) == 0:
+            return None
+        starts = starts[nonempty]
+        lengths = lengths[nonempty]
+
+        seg = np.repeat(np.arange(len(nonempty)), lengths)
+        seg_starts = np.cumsum(lengths) - lengths
+        positions = starts[seg] + (np.arange(len(seg)) - seg_starts[seg])
+        neighbors = self.yr_indices[positions]
+        baseline = self.global_mean + self.bx[neighbors] + self.by[ys[nonempty][seg]]
+        deviations = self.yr_ratings[positions] - baseline
+        return nonempty, seg, seg_starts, lengths, neighbors, deviations
+
+
+def _segment_top_k_mean(weights, deviations, seg, seg_starts, lengths, k, min_k):
+    """
+    Với mỗi dòng của `weights` và mỗi đoạn `seg`, lấy k phần tử có trọng số lớn
+    nhất (giống heapq.nlargest, giữ thứ tự gốc khi bằng nhau), bỏ trọng số <= 0
+    và trả về trung bình có trọng số của `deviations`.
+    """
+    n_entries = weights.shape[1]
+    if lengths.max() > k:
+        # Sắp xếp trong từng đoạn theo trọng số giảm dần; các đoạn vẫn giữ nguyên vị trí.
+        # Hai lượt sắp xếp ổn định (theo trọng số rồi theo đoạn) để so sánh chính xác từng giá trị.
+        order = np.argsort(-weights, axis=1, kind='stable')
+        order = np.take_along_axis(order, np.argsort(seg[order], axis=1, kind='stable'), axis=1)
+        weights = np.take_along_axis(weights, order, axis=1)
+        deviations = deviations[order]
+        rank = np.arange(n_entries) - seg_starts[seg]
+        keep = (rank < k) & (weights > 0)
+    else:
+        keep = weights > 0
+
+    kept = np.where(keep, weights, 0.0)
+    sum_ratings = np.add.reduceat(kept * deviations, seg_starts, axis=1)
+    sum_sim = np.add.reduceat(kept, seg_starts, axis=1)
+    actual_k = np.add.reduceat(keep.astype(np.int32), seg_starts, axis=1)
+
+    sum_ratings[actual_k < min_k] = 0
+    return np.divide(sum_ratings, sum_sim, out=np.zeros_like(sum_sim), where=sum_sim != 0)
+
+
+def export_knn_baseline(model):
+    """
+    Trích xuất trạng thái suy luận từ một mô hình KNNBaseline đã huấn luyện.
+    """
+    trainset = model.trainset
+    user_based = model.sim_options.get('user_based', True)
+    yr = trainset.ir if user_based else trainset.ur
+    n_y = trainset.n_items if user_based else trainset.n_users
+
+    lengths = np.fromiter((len(yr[y]) for y in range(n_y)), dtype=np.int64, count=n_y)
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    indices = np.fromiter((x for y in range(n_y) for x, _ in yr[y]), dtype=np.int32, count=indptr[-1])
+    ratings = np.fromiter((r for y in range(n_y) for _, r in yr[y]), dtype=np.float64, count=indptr[-1])
+
+    user_ids = [None] * trainset.n_users
+    for raw, inner in trainset._raw2inner_id_users.items():
+        user_ids[inner] = str(raw).strip()
+    item_ids = [None] * trainset.n_items
+    for raw, inner in trainset._raw2inner_id_items.items():
+        item_ids[inner] = str(raw).strip()
+
+    return KNNBaselineState(
+        global_mean=trainset.global_mean,
+        bu=model.bu,
+        bi=model.bi,
+        sim=model.sim,
+        yr_indptr=indptr,
+        yr_indices=indices,
+        yr_ratings=ratings,
+        user_ids=user_ids,
+        item_ids=item_ids,
+        k=model.k,
+        min_k=model.min_k,
+        user_based=user_based,
+        rating_scale=trainset.rating_scale,
+        sim_options=model.sim_options,
+        bsl_options=model.bsl_options,
+    )
+
+
+def max_abs_error(model, state, user_ids, item_ids):
+    """
+    Sai lệch lớn nhất giữa `state.estimate` và `model.predict(...).est`, dùng để kiểm tra.
+    """
+    batch = state.estimate(user_ids, item_ids)
+    reference = np.array([[model.predict(str(u).strip(), str(i).strip()).est for i in item_ids]
+                          for u in user_ids])
+    return float(np.abs(batch - reference).max()) if batch.size else 0.0
+
+
+def top_k_indices(scores, k):
+    """
+    Chỉ số của k phần tử có điểm cao nhất, sắp xếp giảm dần.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def top_k_rows(scores, k):
+    """
+    top-k theo từng dòng của ma trận điểm: trả về (chỉ số cột, điểm), sắp xếp giảm dần.
+    Các vị trí có điểm -inf (bị loại) được đánh dấu -1.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((len(scores), 0), dtype=np.int32), np.empty((len(scores), 0))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1).astype(np.int32)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    top[~np.isfinite(top_scores)] = -1
+    return top, top_scores
@@ -0,0 +1,332 @@
+import os
+import re
+import gzip
+import pickle
+import time
+import numpy as np
+from scipy import sparse
+from collaborative_scoring import KNNBaselineState, export_knn_baseline
+from id_registry import IdRegistry
+import model_store
+
+# Thư mục lưu các phiên bản mô hình sau mỗi lần cập nhật tăng dần
+SNAPSHOT_DIR = "model/collaborative_snapshots"
+SNAPSHOT_PATTERN = re.compile(r"collaborative_v(\d+)$")
+
+# Tham số mặc định của Surprise (bsl_options/sim_options)
+DEFAULT_BSL_OPTIONS = {'method': 'als', 'n_epochs': 10, 'reg_u': 15, 'reg_i': 10}
+SIMILARITIES = ('msd', 'cosine', 'pearson_baseline')
+
+
+def rating_triples(state):
+    """
+    Các đánh giá của trainset dưới dạng (chỉ số khách hàng, chỉ số sản phẩm, số sao).
+    """
+    ys = np.repeat(np.arange(len(state.yr_indptr) - 1), np.diff(state.yr_indptr))
+    xs = state.yr_indices.astype(np.int64)
+    if state.user_based:
+        return xs, ys, state.yr_ratings
+    return ys, xs, state.yr_ratings
+
+
+def baseline_als(users, items, ratings, n_users, n_items, global_mean, n_epochs=10, reg_u=15, reg_i=10):
+    """
+    Ước lượng baseline bu/bi bằng ALS như `baseline_als` của Surprise,
+    mỗi epoch là hai phép cộng theo nhóm (np.bincount) thay vì vòng lặp từng đánh giá.
+    """
+    count_u = np.bincount(users, minlength=n_users)
+    count_i = np.bincount(items, minlength=n_items)
+    bu = np.zeros(n_users)
+    bi = np.zeros(n_items)
+    for _ in range(n_epochs):
+        bi = np.bincount(items, weights=ratings - global_mean - bu[users], minlength=n_items) / (reg_i + count_i)
+        bu = np.bincount(users, weights=ratings - global_mean - bi[items], minlength=n_users) / (reg_u + count_u)
+    return bu, bi
+
+
+def similarity_rows(rows, xs, ys, ratings, n_x, n_y, name='msd', min_support=1, shrinkage=100,
+                    bx=None, by=None, global_mean=0.0):
+    """
+    Các dòng `rows` của ma trận tương tự (msd, cosine hoặc pearson_baseline, như Surprise),
+    tính bằng tích ma trận sparse trên các đánh giá chung thay vì duyệt từng cặp.
+    """
+    def matrix(values):
+        return sparse.csr_matrix((values, (xs, ys)), shape=(n_x, n_y))
+
+    def pair_sum(left, right):
+        return (left[rows] @ right.T).toarray()
+
+    counts = matrix(np.ones(len(ratings)))
+    freq = pair_sum(counts, counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if name == 'msd':
+            values = matrix(ratings)
+            squares = matrix(ratings ** 2)
+            sq_diff = pair_sum(squares, counts) + pair_sum(counts, squares) - 2 * pair_sum(values, values)
+            sim = 1 / (sq_diff / freq + 1)
+        elif name == 'cosine':
+            values = matrix(ratings)
+            squares = matrix(ratings ** 2)
+            sim = pair_sum(values, values) / np.sqrt(pair_sum(squares, counts) * pair_sum(counts, squares))
+        elif name == 'pearson_baseline':
+            deviations = ratings - global_mean - bx[xs] - by[ys]
+            values = matrix(deviations)
+            squares = matrix(deviations ** 2)
+            sim = pair_sum(values, values) / np.sqrt(pair_sum(squares, counts) * pair_sum(counts, squares))
+            sim *= (freq - 1) / (freq - 1 + shrinkage)
+        else:
+            raise ValueError(f"Độ đo tương tự '{name}' không được hỗ trợ (chỉ {', '.join(SIMILARITIES)}).")
+
+    sim = np.where((freq >= min_support) & np.isfinite(sim), sim, 0.0)
+    sim[np.arange(len(rows)), rows] = 1.0
+    return sim
+
+
+def update_state(state, customer_ids, product_ids, ratings, full_similarity=False, max_cells=4_000_000):
+    """
+    Gộp các đánh giá mới vào mô hình mà không huấn luyện lại bằng Surprise:
+    - thêm khách hàng/sản phẩm mới;
+    - ước lượng lại baseline bằng ALS vector hóa trên toàn bộ đánh giá;
+    - chỉ tính lại các dòng/cột tương tự của khách hàng (user-based) hoặc sản phẩm
+      (item-based) có đánh giá mới. Với msd/cosine kết quả trùng với huấn luyện lại;
+      pearson_baseline phụ thuộc baseline nên có thể đặt `full_similarity=True`.
+    Trả về một KNNBaselineState mới, trạng thái cũ giữ nguyên.
+    """
+    if state.bsl_options.get('method', 'als') != 'als':
+        raise ValueError("Chỉ hỗ trợ cập nhật tăng dần cho baseline ALS.")
+    bsl_options = {**DEFAULT_BSL_OPTIONS, **state.bsl_options}
+    name = state.sim_options.get('name', 'msd')
+    min_support = state.sim_options.get('min_support', 1)
+    shrinkage = state.sim_options.get('shrinkage', 100)
+
+    users, items, old_ratings = rating_triples(state)
+    user_registry = IdRegistry(state.user_ids)
+    item_registry = IdRegistry(state.item_ids)
+    new_users = user_registry.add(customer_ids).astype(np.int64)
+    new_items = item_registry.add(product_ids).astype(np.int64)
+    new_ratings = np.asarray(ratings, dtype=np.float64)
+
+    users = np.concatenate([users, new_users])
+    items = np.concatenate([items, new_items])
+    all_ratings = np.concatenate([old_ratings, new_ratings])
+    n_users, n_items = len(user_registry), len(item_registry)
+
+    global_mean = all_ratings.mean()
+    bu, bi = baseline_als(users, items, all_ratings, n_users, n_items, global_mean,
+                          bsl_options['n_epochs'], bsl_options['reg_u'], bsl_options['reg_i'])
+
+    # x là phía có ma trận tương tự (khách hàng nếu user-based), y là phía còn lại
+    if state.user_based:
+        xs, ys, n_x, n_y, bx, by, changed = users, items, n_users, n_items, bu, bi, new_users
+    else:
+        xs, ys, n_x, n_y, bx, by, changed = items, users, n_items, n_users, bi, bu, new_items
+
+    # Ma trận "yr" dạng CSR theo y; sắp xếp ổn định để đánh giá mới nằm sau đánh giá cũ như Surprise
+    order = np.argsort(ys, kind='stable')
+    yr_indptr = np.concatenate(([0], np.cumsum(np.bincount(ys, minlength=n_y))))
+
+    sim = np.zeros((n_x, n_x))
+    sim[:len(state.sim), :len(state.sim)] = state.sim
+    affected = np.arange(n_x) if full_similarity else np.unique(changed)
+    rows_per_chunk = max(1, max_cells // max(1, n_x))
+    for start in range(0, len(affected), rows_per_chunk):
+        rows = affected[start:start + rows_per_chunk]
+        block = similarity_rows(rows, xs, ys, all_ratings, n_x, n_y, name, min_support, shrinkage,
+                                bx, by, global_mean)
+        sim[rows, :] = block
+        sim[:, rows] = block.T
+
+    return KNNBaselineState(
+        global_mean=global_mean,
+        bu=bu,
+        bi=bi,
+        sim=sim,
+        yr_indptr=yr_indptr,
+        yr_indices=xs[order],
+        yr_ratings=all_ratings[order],
+        user_ids=user_registry.ids,
+        item_ids=item_registry.ids,
+        k=state.k,
+        min_k=state.min_k,
+        user_based=state.user_based,
+        rating_scale=state.rating_scale,
+        sim_options=state.sim_options,
+        bsl_options=state.bsl_options,
+    )
+
+
+def snapshot_path(version, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, f"collaborative_v{version:04d}")
+
+
+def list_snapshots(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Các phiên bản đã lưu, sắp xếp tăng dần: danh sách (phiên bản, đường dẫn).
+    """
+    if not os.path.isdir(snapshot_dir):
+        return []
+    versions = []
+    for name in os.listdir(snapshot_dir):
+        match = SNAPSHOT_PATTERN.match(name)
+        if match and model_store.is_model_dir(os.path.join(snapshot_dir, name)):
+            versions.append((int(match.group(1)), os.path.join(snapshot_dir, name)))
+    return sorted(versions)
+
+
+def latest_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    snapshots = list_snapshots(snapshot_dir)
+    return snapshots[-1][1] if snapshots else None
+
+
+def resolve_model_file(model_file, snapshot_dir=None):
+    """
+    Mô hình thực sự được dùng cho `model_file`: thư mục mảng chỉ định trực tiếp được giữ nguyên; với file
+    pickle, dùng phiên bản cập nhật mới nhất (thư mục collaborative_snapshots cạnh file) nếu phiên bản
+    đó không cũ hơn file pickle (huấn luyện lại sau khi cập nhật thì dùng file pickle).
+    """
+    if os.path.isdir(model_file):
+        return model_file
+    if snapshot_dir is None:
+        snapshot_dir = os.path.join(os.path.dirname(model_file), os.path.basename(SNAPSHOT_DIR))
+    latest = latest_snapshot(snapshot_dir)
+    if latest is None:
+        return model_file
+    if os.path.exists(model_file) and (os.path.getmtime(os.path.join(latest, model_store.HEADER_FILE))
+                                       < os.path.getmtime(model_file)):
+        return model_file
+    return latest
+
+
+def save_state(state, path, **metadata):
+    """
+    Lưu trạng thái suy luận thành thư mục mảng NumPy (xem `model_store`).
+    """
+    metadata.update({
+        'global_mean': state.global_mean,
+        'n_ratings': int(len(state.yr_ratings)),
+        'k': state.k,
+        'min_k': state.min_k,
+        'user_based': state.user_based,
+        'rating_scale': list(state.rating_scale),
+        'sim_options': state.sim_options,
+        'bsl_options': state.bsl_options,
+    })
+    arrays = {
+        'bu': state.bu, 'bi': state.bi, 'sim': state.sim,
+        'yr_indptr': state.yr_indptr, 'yr_indices': state.yr_indices, 'yr_ratings': state.yr_ratings,
+        'user_ids': state.user_ids, 'item_ids': state.item_ids,
+    }
+    return model_store.save_arrays(path, arrays, metadata)
+
+
+def load_state(path, mmap=True, check=False):
+    """
+    Nạp trạng thái suy luận từ thư mục mảng; với `mmap=True` ma trận tương tự và các mảng
+    lớn được memory-map (không sao chép), các worker dùng chung một bản trong bộ nhớ.
+    """
+    arrays, metadata = model_store.load_arrays(path, mmap=mmap, check=check)
+    return KNNBaselineState(
+        global_mean=metadata['global_mean'],
+        k=metadata['k'],
+        min_k=metadata['min_k'],
+        user_based=metadata['user_based'],
+        rating_scale=metadata['rating_scale'],
+        sim_options=metadata['sim_options'],
+        bsl_options=metadata['bsl_options'],
+        **arrays,
+    )
+
+
+def save_snapshot(state, snapshot_dir=SNAPSHOT_DIR, parent=None, n_new_ratings=0):
+    """
+    Lưu mô hình thành phiên bản mới (số phiên bản tăng dần, không ghi đè phiên bản cũ).
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshots = list_snapshots(snapshot_dir)
+    version = snapshots[-1][0] + 1 if snapshots else 1
+    return save_state(state, snapshot_path(version, snapshot_dir), version=version, parent=parent,
+                      n_new_ratings=int(n_new_ratings))
+
+
+def load_snapshot(path):
+    return load_state(path)
+
+
+def exported_path(model_file):
+    """
+    Thư mục mảng tương ứng với file pickle: model/collaborative_model.pkl.gz -> model/collaborative_model.
+    """
+    for suffix in (".pkl.gz", ".pkl"):
+        if model_file.endswith(suffix):
+            return model_file[:-len(suffix)]
+    return model_file + ".arrays"
+
+
+def source_signature(model_file):
+    stat = os.stat(model_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def convert_pickle(model_file, output=None):
+    """
+    Chuyển một lần mô hình Surprise đã pickle sang thư mục mảng NumPy. Header ghi lại
+    chữ ký file nguồn để `load_model_state` chỉ dùng bản chuyển đổi khi pickle chưa đổi.
+    """
+    with gzip.open(model_file, 'rb') as f:
+        model = pickle.load(f)
+    output = output or exported_path(model_file)
+    return save_state(export_knn_baseline(model), output, source=os.path.abspath(model_file),
+                      source_signature=source_signature(model_file))
+
+
+def load_model_state(model_file):
+    """
+    Nạp trạng thái suy luận từ thư mục mảng (mô hình đã chuyển đổi hoặc phiên bản cập nhật)
+    hoặc từ mô hình Surprise đã pickle (.pkl.gz); phiên bản cập nhật mới nhất được ưu tiên
+    (xem `resolve_model_file`). Với pickle, nếu đã có bản chuyển đổi
+    (`model_store.py convert`) còn khớp với file nguồn thì dùng bản đó, không cần unpickle.
+    """
+    model_file = resolve_model_file(model_file)
+    if os.path.isdir(model_file):
+        return load_state(model_file)
+    exported = exported_path(model_file)
+    if model_store.is_model_dir(exported):
+        header = model_store.read_header(exported)
+        if header['metadata'].get('source_signature') == source_signature(model_file):
+            return load_state(exported)
+    with gzip.open(model_file, 'rb') as f:
+        model = pickle.load(f)
+    return export_knn_baseline(model)
+
+
+if __name__ == "__main__":
+    # python collaborative_update.py --new-ratings data/new_reviews.csv [--base model/...] [--append-to data/...]
+    import argparse
+    import pandas as pd
+    from ingestion import iter_chunks, normalize_ids
+
+    parser = argparse.ArgumentParser(description="Cập nhật tăng dần mô hình collaborative với đánh giá mới")
+    parser.add_argument("--new-ratings", required=True, help="CSV đánh giá mới (ma_khach_hang, ma_san_pham, so_sao, ...)")
+    parser.add_argument("--base", default=None,
+                        help="Mô hình gốc; mặc định là phiên bản mới nhất, nếu chưa có thì model/collaborative_model.pkl.gz")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--append-to", default=None,
+                        help="Nối đánh giá mới vào file dữ liệu collaborative (để loại sản phẩm đã đánh giá, thêm sản phẩm mới)")
+    parser.add_argument("--full-similarity", action="store_true", help="Tính lại toàn bộ ma trận tương tự")
+    args = parser.parse_args()
+
+    base = args.base or resolve_model_file("model/collaborative_model.pkl.gz", args.snapshot_dir)
+    new_reviews = pd.concat([normalize_ids(chunk) for chunk in iter_chunks([args.new_ratings])], ignore_index=True)
+
+    start = time.perf_counter()
+    state = update_state(load_model_state(base), new_reviews['ma_khach_hang'].to_numpy(),
+                         new_reviews['ma_san_pham'].to_numpy(), new_reviews['so_sao'].to_numpy(),
+                         full_similarity=args.full_similarity)
+    path = save_snapshot(state, args.snapshot_dir, parent=base, n_new_ratings=len(new_reviews))
+    print(f"Đã gộp {len(new_reviews)} đánh giá mới vào {base} trong {time.perf_counter() - start:.1f}s -> {path}")
+
+    if args.append_to:
+        columns = pd.read_csv(args.append_to, nrows=0).columns
+        pd.read_csv(args.new_ratings).reindex(columns=columns).to_csv(args.append_to, mode='a', header=False,
+                                                                      index=False)
+        print(f"Đã nối đánh giá mới vào {args.append_to}")
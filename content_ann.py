@@ -0,0 +1,143 @@
+import os
+import numpy as np
+from scipy.sparse.linalg import svds
+
+# File lưu chỉ mục ANN (LSH trên vector LSI)
+CONTENT_ANN_FILE = "model/content_ann.npz"
+
+
+class LSHContentIndex:
+    """
+    Chỉ mục láng giềng gần đúng cho content-based: giảm chiều ma trận TF-IDF
+    bằng truncated SVD (LSI) rồi băm các vector bằng random-projection LSH
+    trên nhiều bảng. Khi truy vấn chỉ xét các sản phẩm rơi vào cùng bucket
+    (và các bucket lệch 1 bit) thay vì quét toàn bộ catalog.
+    """
+
+    def __init__(self, product_ids, vectors, planes, sorted_codes, order, fingerprint=''):
+        self.product_ids = np.asarray(product_ids, dtype=str)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.planes = np.asarray(planes, dtype=np.float32)
+        self.sorted_codes = np.asarray(sorted_codes, dtype=np.int64)
+        self.order = np.asarray(order, dtype=np.int32)
+        # Mã băm nội dung (ContentIndex.fingerprint) của chỉ mục lúc xây dựng
+        self.fingerprint = str(fingerprint)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @property
+    def n_tables(self):
+        return self.planes.shape[0]
+
+    @property
+    def n_bits(self):
+        return self.planes.shape[1]
+
+    @classmethod
+    def build(cls, index, n_components=128, n_tables=8, n_bits=12, seed=0):
+        """
+        Xây dựng từ ContentIndex (ma trận TF-IDF đã chuẩn hóa).
+        """
+        matrix = index.matrix.astype(np.float64)
+        n_components = max(1, min(n_components, min(matrix.shape) - 1))
+        u, s, _ = svds(matrix, k=n_components)
+        vectors = u * s
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1)
+
+        rng = np.random.default_rng(seed)
+        planes = rng.standard_normal((n_tables, n_bits, n_components)).astype(np.float32)
+        codes = cls._hash(planes, vectors.astype(np.float32))
+        order = np.argsort(codes, axis=1, kind='stable')
+        sorted_codes = np.take_along_axis(codes, order, axis=1)
+        return cls(index.product_ids, vectors, planes, sorted_codes, order, index.fingerprint)
+
+    @staticmethod
+    def _hash(planes, vectors):
+        """
+        Mã băm (n_tables x n) : mỗi bit là dấu của tích vô hướng với một siêu phẳng ngẫu nhiên.
+        """
+        bits = np.einsum('tbd,nd->tnb', planes, vectors) > 0
+        weights = np.left_shift(1, np.arange(planes.shape[1], dtype=np.int64))
+        return bits.astype(np.int64) @ weights
+
+    def matches(self, index):
+        # Cùng mã băm nội dung (gồm cả mã sản phẩm theo từng dòng) với chỉ mục nội dung
+        return bool(self.fingerprint) and self.fingerprint == index.fingerprint
+
+    def candidates(self, row, max_candidates=None):
+        """
+        Các dòng ứng viên cho sản phẩm ở dòng `row`, xếp theo độ tương tự LSI giảm dần.
+        """
+        codes = self._hash(self.planes, self.vectors[row:row + 1])[:, 0]
+        flips = np.left_shift(1, np.arange(self.n_bits, dtype=np.int64))
+
+        found = []
+        for t in range(self.n_tables):
+            # Multi-probe: bucket chính và các bucket lệch đúng 1 bit
+            probes = np.concatenate(([codes[t]], codes[t] ^ flips))
+            lo = np.searchsorted(self.sorted_codes[t], probes, side='left')
+            hi = np.searchsorted(self.sorted_codes[t], probes, side='right')
+            for a, b in zip(lo, hi):
+                if b > a:
+                    found.append(self.order[t, a:b])
+        if not found:
+            return np.array([row], dtype=np.int32)
+
+        rows = np.unique(np.concatenate(found))
+        approx = self.vectors[rows] @ self.vectors[row]
+        ranked = rows[np.argsort(-approx, kind='stable')]
+        return ranked if max_candidates is None else ranked[:max_candidates]
+
+    def save(self, path=CONTENT_ANN_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, product_ids=self.product_ids, vectors=self.vectors, planes=self.planes,
+                 sorted_codes=self.sorted_codes, order=self.order, fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, path=CONTENT_ANN_FILE):
+        with np.load(path) as data:
+            fingerprint = str(data['fingerprint']) if 'fingerprint' in data.files else ''
+            return cls(data['product_ids'], data['vectors'], data['planes'], data['sorted_codes'], data['order'],
+                       fingerprint)
+
+
+# Chỉ mục ANN dùng chung trong tiến trình
+_ann_index = None
+
+
+def get_ann_index(index, path=CONTENT_ANN_FILE, build=True):
+    """
+    Nạp chỉ mục ANN một lần; xây dựng lại (và lưu) nếu chưa có hoặc không khớp chỉ mục nội dung.
+    Với `build=False` (đường phục vụ request) không xây dựng mà trả về None.
+    """
+    global _ann_index
+    if _ann_index is not None and _ann_index.matches(index):
+        return _ann_index
+
+    ann = LSHContentIndex.load(path) if os.path.exists(path) else None
+    if ann is None or not ann.matches(index):
+        if not build:
+            return None
+        ann = LSHContentIndex.build(index)
+        ann.save(path)
+
+    _ann_index = ann
+    return _ann_index
+
+
+if __name__ == "__main__":
+    # Job offline, chạy lại sau mỗi lần crawl: python content_ann.py [đường_dẫn_csv]
+    import sys
+    import time
+    from data_store import load_table
+    from content_based_recommendation import get_content_index
+
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "data/content_based_preprocessed.csv"
+    content_index = get_content_index(load_table(data_file))
+    start = time.perf_counter()
+    ann = LSHContentIndex.build(content_index)
+    ann.save(CONTENT_ANN_FILE)
+    print(f"Đã lưu chỉ mục ANN ({ann.n_tables} bảng x {ann.n_bits} bit) của {len(ann)} sản phẩm vào "
+          f"{CONTENT_ANN_FILE} trong {time.perf_counter() - start:.1f}s")
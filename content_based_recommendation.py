@@ -1,63 +1,523 @@
+import os
+import hashlib
 import pandas as pd
-from gensim import corpora, models, similarities
+import numpy as np
+from scipy import sparse
+from gensim import corpora, models, matutils
 import ast
+from content_neighbors import CONTENT_NEIGHBORS_FILE, get_neighbor_table
+from content_ann import CONTENT_ANN_FILE, get_ann_index
+from recommendation_cache import frame_signature, recommendation_cache
+from collaborative_scoring import top_k_indices, top_k_rows
+from id_registry import IdRegistry
+from metrics import increment, span
 
-def recommend_products(product_id, df, weight_content=0.7, weight_rating=0.3, top_n=6):
+# Thư mục lưu chỉ mục TF-IDF đã xây dựng sẵn
+CONTENT_INDEX_DIR = "model/content_index"
+
+
+def parse_tokens(value):
+    """
+    Chuyển cột 'tokens' (chuỗi dạng list Python) về list từ.
+    """
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    return []
+
+
+def token_key(value):
+    """
+    Chuỗi đại diện cột 'tokens' (chuỗi đọc từ CSV hoặc list), dùng để phát hiện sản phẩm đổi nội dung.
+    """
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return str(list(value))
+    return str(value)
+
+
+def token_hashes(tokens):
+    return pd.util.hash_array(np.asarray([token_key(value) for value in tokens], dtype=object))
+
+
+def product_ratings(df):
+    """
+    Điểm đánh giá trung bình theo thứ tự dòng (thiếu hoặc không hợp lệ thì 0).
+    """
+    return pd.to_numeric(df['diem_trung_binh'], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+
+def _df2idf(dfs, num_docs):
+    # Giống df2idf của Gensim (log cơ số 2), từ không còn xuất hiện có IDF 0
+    dfs = np.asarray(dfs, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(dfs > 0, np.log2(num_docs / np.maximum(dfs, 1)), 0.0)
+
+
+class ContentIndex:
+    """
+    Chỉ mục TF-IDF của toàn bộ sản phẩm: xây dựng một lần, lưu xuống đĩa
+    và nạp lại khi khởi động. Mỗi hàng của `matrix` là vector TF-IDF
+    (đã chuẩn hóa L2) của một sản phẩm, theo đúng thứ tự dòng của DataFrame.
+
+    Chỉ mục giữ thêm tần suất từ (`counts`) và vector IDF đang dùng để thêm/sửa/xóa
+    sản phẩm mà không xử lý lại toàn bộ mô tả. IDF chỉ được tính lại (`refresh_idf`)
+    khi số sản phẩm thay đổi từ lần tính trước vượt `IDF_REFRESH_THRESHOLD` hoặc khi gọi trực tiếp.
+    Mỗi lần thay đổi tăng `revision` để bảng láng giềng/chỉ mục ANN cũ không còn được dùng.
+    """
+
+    DICTIONARY_FILE = "dictionary.gensim"
+    TFIDF_FILE = "tfidf.gensim"
+    MATRIX_FILE = "matrix.npz"
+    COUNTS_FILE = "counts.npz"
+    IDS_FILE = "product_ids.npy"
+    HASHES_FILE = "token_hashes.npy"
+    IDF_FILE = "idf.npy"
+    STATE_FILE = "state.npy"
+    RATINGS_FILE = "ratings.npy"
+
+    # Tỷ lệ sản phẩm thêm/sửa/xóa (so với catalog) cho phép trước khi tính lại IDF
+    IDF_REFRESH_THRESHOLD = 0.05
+
+    def __init__(self, dictionary, tfidf, matrix, product_ids, ratings, counts, hashes, idf,
+                 pending_idf_changes=0, revision=0):
+        self.dictionary = dictionary
+        self.tfidf = tfidf
+        self.matrix = matrix.tocsr()
+        self.product_ids = np.asarray(product_ids, dtype=str)
+        # Điểm đánh giá trung bình theo thứ tự dòng, dùng cho phép trộn điểm vector hóa
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        self.products = IdRegistry(self.product_ids)
+        self.counts = counts.tocsr()
+        self.token_hashes = np.asarray(hashes, dtype=np.uint64)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.pending_idf_changes = int(pending_idf_changes)
+        self.revision = int(revision)
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @property
+    def fingerprint(self):
+        """
+        Mã băm nội dung chỉ mục (mã sản phẩm theo dòng, hash tokens, IDF, điểm đánh giá).
+        Bảng láng giềng / chỉ mục ANN lưu kèm mã này: khác với `revision` (về 0 mỗi lần xây dựng lại),
+        mã chỉ trùng khi chỉ mục cho cùng kết quả.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for array in (self.product_ids, self.token_hashes, self.idf, self.ratings):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    @classmethod
+    def build(cls, df):
+        """
+        Xây dựng chỉ mục từ DataFrame có cột 'ma_san_pham' và 'tokens'.
+        """
+        with span('content_index.parse_tokens'):
+            tokens = df['tokens'].apply(parse_tokens)
+
+        # Tạo dictionary Gensim và mô hình TF-IDF
+        with span('content_index.tfidf'):
+            dictionary = corpora.Dictionary(tokens)
+            corpus = [dictionary.doc2bow(text) for text in tokens]
+            tfidf = models.TfidfModel(corpus)
+
+        # Ma trận sparse (số sản phẩm x số từ), giống SparseMatrixSimilarity
+        with span('content_index.matrix'):
+            num_terms = len(dictionary.token2id)
+            matrix = matutils.corpus2csc(
+                tfidf[corpus], num_terms=num_terms, num_docs=len(corpus), dtype=np.float32
+            ).T.tocsr()
+            counts = matutils.corpus2csc(corpus, num_terms=num_terms, num_docs=len(corpus), dtype=np.float32).T
+            idf = np.array([tfidf.idfs.get(term, 0.0) for term in range(num_terms)])
+
+        product_ids = df['ma_san_pham'].astype(str).str.strip().to_numpy()
+        ratings = product_ratings(df)
+        return cls(dictionary, tfidf, matrix, product_ids, ratings, counts, token_hashes(df['tokens']), idf)
+
+    def save(self, index_dir=CONTENT_INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        self.dictionary.save(os.path.join(index_dir, self.DICTIONARY_FILE))
+        self.tfidf.save(os.path.join(index_dir, self.TFIDF_FILE))
+        sparse.save_npz(os.path.join(index_dir, self.MATRIX_FILE), self.matrix)
+        sparse.save_npz(os.path.join(index_dir, self.COUNTS_FILE), self.counts)
+        np.save(os.path.join(index_dir, self.IDS_FILE), self.product_ids)
+        np.save(os.path.join(index_dir, self.HASHES_FILE), self.token_hashes)
+        np.save(os.path.join(index_dir, self.IDF_FILE), self.idf)
+        np.save(os.path.join(index_dir, self.STATE_FILE), np.array([self.pending_idf_changes, self.revision]))
+        np.save(os.path.join(index_dir, self.RATINGS_FILE), self.ratings)
+
+    @classmethod
+    def load(cls, index_dir=CONTENT_INDEX_DIR):
+        dictionary = corpora.Dictionary.load(os.path.join(index_dir, cls.DICTIONARY_FILE))
+        tfidf = models.TfidfModel.load(os.path.join(index_dir, cls.TFIDF_FILE))
+        matrix = sparse.load_npz(os.path.join(index_dir, cls.MATRIX_FILE))
+        counts = sparse.load_npz(os.path.join(index_dir, cls.COUNTS_FILE))
+        product_ids = np.load(os.path.join(index_dir, cls.IDS_FILE))
+        hashes = np.load(os.path.join(index_dir, cls.HASHES_FILE))
+        idf = np.load(os.path.join(index_dir, cls.IDF_FILE))
+        pending_idf_changes, revision = np.load(os.path.join(index_dir, cls.STATE_FILE))
+        ratings = np.load(os.path.join(index_dir, cls.RATINGS_FILE))
+        return cls(dictionary, tfidf, matrix, product_ids, ratings, counts, hashes, idf,
+                   pending_idf_changes, revision)
+
+    @classmethod
+    def exists(cls, index_dir=CONTENT_INDEX_DIR):
+        # Chỉ mục lưu theo định dạng cũ (chưa có tần suất từ) sẽ được xây dựng lại
+        return all(os.path.exists(os.path.join(index_dir, name)) for name in (cls.COUNTS_FILE, cls.RATINGS_FILE))
+
+    def matches(self, df):
+        """
+        Kiểm tra chỉ mục có cùng danh sách sản phẩm (đúng thứ tự từng dòng) với DataFrame không.
+        """
+        if len(df) != len(self.product_ids):
+            return False
+        return np.array_equal(df['ma_san_pham'].astype(str).str.strip().to_numpy().astype(str), self.product_ids)
+
+    def is_current(self, df):
+        """
+        Chỉ mục khớp hoàn toàn với DataFrame: cùng mã sản phẩm theo từng dòng, cùng 'tokens'
+        (so theo hash) và cùng điểm đánh giá. Nếu không, cần `sync(df)`.
+        """
+        return (self.matches(df)
+                and np.array_equal(token_hashes(df['tokens']), self.token_hashes)
+                and np.array_equal(product_ratings(df), self.ratings))
+
+    def row_of(self, product_id):
+        """
+        Trả về chỉ số dòng của sản phẩm trong chỉ mục.
+        """
+        row = self.products.get(product_id)
+        if row < 0:
+            raise ValueError("Mã sản phẩm không tồn tại trong dữ liệu.")
+        return row
+
+    def similarities(self, row, rows=None):
+        """
+        Điểm tương tự cosine giữa sản phẩm ở dòng `row` và toàn bộ sản phẩm
+        (hoặc chỉ các dòng trong `rows`).
+        """
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return (matrix @ self.matrix[row].T).toarray().ravel()
+
+    def sync(self, df):
+        """
+        Đồng bộ chỉ mục với DataFrame sản phẩm mới (ví dụ sau khi crawl): chỉ các sản phẩm mới
+        hoặc có 'tokens' thay đổi được xử lý lại, sản phẩm không còn trong df bị xóa,
+        và thứ tự dòng theo đúng df.
+        """
+        product_ids = df['ma_san_pham'].astype(str).str.strip().to_numpy()
+        tokens = df['tokens'].to_numpy()
+        old_rows = self.products.lookup(product_ids)
+        hashes = token_hashes(tokens)
+        changed = (old_rows < 0) | (self.token_hashes[np.maximum(old_rows, 0)] != hashes)
+        ratings = product_ratings(df)
+        return self._apply(product_ids, ratings, dict(zip(product_ids[changed], tokens[changed])))
+
+    def upsert(self, df):
+        """
+        Thêm mới hoặc cập nhật các sản phẩm trong `df` (cột 'ma_san_pham', 'tokens', 'diem_trung_binh');
+        sản phẩm mới được thêm vào cuối chỉ mục.
+        """
+        product_ids = df['ma_san_pham'].astype(str).str.strip().to_numpy()
+        rows = self.products.lookup(product_ids)
+        ratings = product_ratings(df)
+        new = rows < 0
+        all_ratings = self.ratings.copy()
+        all_ratings[rows[~new]] = ratings[~new]
+        _, first = np.unique(product_ids[new], return_index=True)
+        first = np.sort(first)
+        target = np.concatenate([self.product_ids.astype(object), product_ids[new][first]])
+        all_ratings = np.concatenate([all_ratings, ratings[new][first]])
+        return self._apply(target, all_ratings, dict(zip(product_ids, df['tokens'].to_numpy())))
+
+    def remove(self, product_ids):
+        """
+        Xóa các sản phẩm khỏi chỉ mục (mã không tồn tại được bỏ qua).
+        """
+        removed = self.products.lookup(list(product_ids))
+        keep = np.ones(len(self), dtype=bool)
+        keep[removed[removed >= 0]] = False
+        return self._apply(self.product_ids[keep], self.ratings[keep], {})
+
+    def refresh_idf(self):
+        """
+        Tính lại IDF theo số sản phẩm hiện tại và trọng số TF-IDF của mọi sản phẩm
+        (phép tính vector hóa trên `counts`, không đọc lại mô tả).
+        """
+        num_terms = len(self.dictionary.token2id)
+        dfs = np.array([self.dictionary.dfs.get(term, 0) for term in range(num_terms)])
+        self.idf = _df2idf(dfs, len(self))
+        self.tfidf = models.TfidfModel(dictionary=self.dictionary)
+        self.matrix = self._weigh(self.counts)
+        self.pending_idf_changes = 0
+        self._fingerprint = None
+        return self
+
+    def _weigh(self, counts):
+        """
+        TF-IDF chuẩn hóa L2 (như TfidfModel của Gensim) từ tần suất từ và IDF hiện tại.
+        """
+        weighted = counts.multiply(self.idf[:counts.shape[1]][None, :]).tocsr()
+        weighted.data[np.abs(weighted.data) <= 1e-12] = 0
+        weighted.eliminate_zeros()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        weighted = sparse.diags(1 / np.where(norms > 0, norms, 1)) @ weighted
+        return weighted.astype(np.float32).tocsr()
+
+    def _forget(self, rows):
+        # Bỏ đóng góp của các dòng bị xóa/thay thế khỏi thống kê của dictionary (df, cf, số tài liệu)
+        counts = self.counts[rows]
+        n_docs = np.bincount(counts.indices, minlength=counts.shape[1])
+        totals = np.bincount(counts.indices, weights=counts.data, minlength=counts.shape[1])
+        for term in np.flatnonzero(n_docs).tolist():
+            self.dictionary.dfs[term] -= int(n_docs[term])
+            self.dictionary.cfs[term] -= int(totals[term])
+            if self.dictionary.dfs[term] <= 0:
+                del self.dictionary.dfs[term]
+                del self.dictionary.cfs[term]
+        self.dictionary.num_docs -= len(rows)
+        self.dictionary.num_pos -= int(counts.sum())
+        self.dictionary.num_nnz -= counts.nnz
+
+    def _apply(self, product_ids, ratings, documents):
+        """
+        Đưa chỉ mục về danh sách sản phẩm `product_ids` (đúng thứ tự này). `documents` là
+        {mã sản phẩm: tokens} của các sản phẩm mới hoặc thay đổi; các sản phẩm còn lại giữ nguyên vector.
+        """
+        product_ids = np.asarray(product_ids, dtype=object)
+        old_rows = self.products.lookup(product_ids).astype(np.int64)
+        kept = old_rows >= 0
+        kept[kept] = [pid not in documents for pid in product_ids[kept]]
+        forgotten = np.setdiff1d(np.arange(len(self)), old_rows[kept])
+        self._forget(forgotten)
+
+        # Chỉ tài liệu mới/thay đổi đi qua dictionary (cập nhật df, thêm từ mới)
+        new_ids = product_ids[~kept]
+        corpus = [self.dictionary.doc2bow(parse_tokens(documents[pid]), allow_update=True) for pid in new_ids]
+        num_terms = len(self.dictionary.token2id)
+        new_counts = matutils.corpus2csc(corpus, num_terms=num_terms, num_docs=len(corpus),
+                                         dtype=np.float32).T.tocsr()
+
+        # Từ mới nhận IDF theo số sản phẩm hiện tại; từ cũ giữ IDF tới lần refresh_idf
+        if num_terms > len(self.idf):
+            dfs = [self.dictionary.dfs.get(term, 0) for term in range(len(self.idf), num_terms)]
+            self.idf = np.concatenate([self.idf, _df2idf(dfs, len(product_ids))])
+
+        # Ghép dòng cũ giữ nguyên và dòng mới tính theo thứ tự đích
+        source = np.empty(len(product_ids), dtype=np.int64)
+        source[kept] = old_rows[kept]
+        source[~kept] = len(self) + np.arange(len(new_ids))
+        counts = sparse.csr_matrix(self.counts, shape=(len(self), num_terms))
+        matrix = sparse.csr_matrix(self.matrix, shape=(len(self), num_terms))
+        self.counts = sparse.vstack([counts, new_counts], format='csr')[source]
+        self.matrix = sparse.vstack([matrix, self._weigh(new_counts)], format='csr')[source]
+
+        hashes = np.empty(len(product_ids), dtype=np.uint64)
+        hashes[kept] = self.token_hashes[old_rows[kept]]
+        hashes[~kept] = token_hashes([documents[pid] for pid in new_ids])
+        self.token_hashes = hashes
+        self.product_ids = product_ids.astype(str)
+        self.products = IdRegistry(self.product_ids)
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        self.revision += 1
+        self._fingerprint = None
+
+        self.pending_idf_changes += len(forgotten) + len(new_ids)
+        if self.pending_idf_changes > self.IDF_REFRESH_THRESHOLD * max(1, len(self)):
+            self.refresh_idf()
+        return self
+
+
+# Chỉ mục dùng chung trong tiến trình, chỉ nạp/xây dựng một lần
+_content_index = None
+# DataFrame sản phẩm đã kiểm tra khớp với chỉ mục (so theo đối tượng, không kiểm tra lại mỗi lần gợi ý)
+_content_source = None
+
+
+def get_content_index(df=None, index_dir=CONTENT_INDEX_DIR):
+    """
+    Lấy chỉ mục đã nạp; nạp từ đĩa hoặc xây dựng lại (và lưu) nếu chưa có.
+    Nếu DataFrame khác chỉ mục (thêm/xóa/đổi thứ tự sản phẩm, đổi 'tokens' hoặc điểm đánh giá)
+    thì chỉ mục được đồng bộ bằng `sync` rồi lưu lại.
+    """
+    global _content_index, _content_source
+    if _content_index is not None and (df is None or df is _content_source):
+        return _content_index
+    if _content_index is not None and _content_index.is_current(df):
+        _content_source = df
+        return _content_index
+
+    index = ContentIndex.load(index_dir) if ContentIndex.exists(index_dir) else None
+    if index is None or (df is not None and not index.is_current(df)):
+        if df is None:
+            raise ValueError("Chưa có chỉ mục nội dung, cần truyền DataFrame sản phẩm để xây dựng.")
+        # Đã có chỉ mục cũ thì chỉ cập nhật các sản phẩm thêm/sửa/xóa thay vì xây dựng lại
+        index = ContentIndex.build(df) if index is None else index.sync(df)
+        index.save(index_dir)
+
+    _content_index, _content_source = index, df
+    return _content_index
+
+
+# Các cột của bảng sản phẩm xuất hiện trong kết quả gợi ý
+RESULT_COLUMNS = ['ma_san_pham', 'ten_san_pham', 'diem_trung_binh', 'hinh_anh', 'gia_ban', 'gia_goc', 'mo_ta']
+
+
+def build_recommendations(df, rows, sims, final_scores):
+    """
+    Tạo DataFrame kết quả từ các dòng được chọn bằng một lần truy xuất theo chỉ số.
+    """
+    selected = df.iloc[rows]
+    n = len(rows)
+    return pd.DataFrame({
+        'ma_san_pham': selected['ma_san_pham'].to_numpy(),
+        'ten_san_pham': selected['ten_san_pham'].to_numpy(),
+        'similarity_score': sims,
+        'average_rating': selected['diem_trung_binh'].to_numpy(),
+        'final_score': final_scores,
+        'hinh_anh': selected['hinh_anh'].to_numpy(),  # Lấy trực tiếp từ cột 'hinh_anh'
+        'gia_ban': selected['gia_ban'].to_numpy() if 'gia_ban' in selected else ['Không có thông tin'] * n,
+        'gia_goc': selected['gia_goc'].to_numpy() if 'gia_goc' in selected else ['Không có thông tin'] * n,
+        'mo_ta': selected['mo_ta'].to_numpy() if 'mo_ta' in selected else ['Không có mô tả.'] * n,
+    })
+
+
+def recommend_products(product_id, df, weight_content=0.7, weight_rating=0.3, top_n=6, index=None,
+                       use_neighbor_table=True, backend='exact', ann_candidates=200, use_cache=True):
     """
     Gợi ý sản phẩm tương tự dựa trên nội dung.
+    backend='exact' quét toàn bộ ma trận TF-IDF; backend='ann' chỉ chấm điểm
+    `ann_candidates` ứng viên lấy từ chỉ mục LSH (xem content_ann.py).
+    Kết quả được cache (recommendation_cache.py) cho tới khi chỉ mục trên đĩa thay đổi.
     """
-    # Đảm bảo cột 'tokens' có định dạng đúng
-    df['tokens'] = df['tokens'].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    if backend not in ('exact', 'ann'):
+        raise ValueError(f"backend không hợp lệ: {backend}")
+    if index is None:
+        index = get_content_index(df)
+
+    def compute():
+        return _recommend_products(product_id, df, weight_content, weight_rating, top_n, index,
+                                   use_neighbor_table, backend, ann_candidates)
+
+    with span('content.recommend'):
+        if not use_cache:
+            return compute()
+        # Kết quả phụ thuộc cả DataFrame dùng để ghép thông tin sản phẩm và việc có tra bảng láng giềng hay không
+        key = ('content', str(product_id).strip(), weight_content, weight_rating, top_n, backend, ann_candidates,
+               index.fingerprint, frame_signature(df, RESULT_COLUMNS), bool(use_neighbor_table))
+        return recommendation_cache.get_or_compute(
+            key, compute, dependencies=(CONTENT_INDEX_DIR, CONTENT_NEIGHBORS_FILE, CONTENT_ANN_FILE)
+        )
 
-    # Tạo dictionary Gensim
-    dictionary = corpora.Dictionary(df['tokens'])
-    corpus = [dictionary.doc2bow(text) for text in df['tokens']]
 
-    # Tạo mô hình TF-IDF và biến đổi corpus
-    tfidf = models.TfidfModel(corpus)
-    tfidf_corpus = tfidf[corpus]
+def _recommend_products(product_id, df, weight_content, weight_rating, top_n, index,
+                        use_neighbor_table, backend, ann_candidates):
+    # Nếu đã có bảng láng giềng tính trước (content_neighbors.py) thì chỉ cần tra cứu
+    table = get_neighbor_table() if use_neighbor_table else None
+    if table is not None and table.matches(index) and table.supports(weight_content, weight_rating, top_n):
+        with span('content.neighbor_lookup'):
+            rows, sims, scores = table.lookup(product_id, top_n)
+        with span('content.build'):
+            return build_recommendations(df, rows, sims, scores)
 
-    # Tạo similarity index
-    index = similarities.SparseMatrixSimilarity(tfidf_corpus, num_features=len(dictionary.token2id))
-    
     # Lấy chỉ số của sản phẩm đầu vào
-    try:
-        query_idx = df[df['ma_san_pham'] == product_id].index[0]
-    except IndexError:
-        raise ValueError("Mã sản phẩm không tồn tại trong dữ liệu.")
-    
-    query_bow = dictionary.doc2bow(df.iloc[query_idx]['tokens'])
-    
-    # Tính điểm tương tự
-    sims = index[tfidf[query_bow]]
-    final_scores = []
-    
-    for idx, sim_score in enumerate(sims):
-        rating = df.iloc[idx]['diem_trung_binh']
-        final_score = sim_score * weight_content + rating * weight_rating
-        final_scores.append((idx, final_score))
-    
-    # Sắp xếp theo điểm số kết hợp
-    final_scores_sorted = sorted(final_scores, key=lambda item: -item[1])
-    
+    query_idx = index.row_of(product_id)
+
+    if backend == 'ann':
+        # Chỉ tính điểm chính xác trên tập ứng viên gần đúng
+        with span('content.ann_candidates'):
+            rows = get_ann_index(index).candidates(query_idx, ann_candidates)
+        with span('content.score'):
+            sims = index.similarities(query_idx, rows)
+            final_scores = sims * weight_content + index.ratings[rows] * weight_rating
+        increment('recommendation_items_scored_total', len(rows), recommender='content')
+        with span('content.top_k'):
+            top = top_k_indices(final_scores, top_n)
+        with span('content.build'):
+            return build_recommendations(df, rows[top], sims[top], final_scores[top])
+
+    # Tính điểm tương tự và trộn với điểm đánh giá trên toàn bộ mảng
+    with span('content.score'):
+        sims = index.similarities(query_idx)
+        final_scores = sims * weight_content + index.ratings * weight_rating
+    increment('recommendation_items_scored_total', len(final_scores), recommender='content')
+
     # Lấy top sản phẩm gợi ý
-    top_similar_products = []
-    for item in final_scores_sorted[:top_n]:
-        product_idx = item[0]
-        top_similar_products.append({
-            'ma_san_pham': df.iloc[product_idx]['ma_san_pham'],
-            'ten_san_pham': df.iloc[product_idx]['ten_san_pham'],
-            'similarity_score': sims[product_idx],
-            'average_rating': df.iloc[product_idx]['diem_trung_binh'],
-            'final_score': item[1],
-            'hinh_anh': df.iloc[product_idx]['hinh_anh'],  # Lấy trực tiếp từ cột 'hinh_anh'
-            'gia_ban': df.iloc[product_idx].get('gia_ban', 'Không có thông tin'),  # Thêm giá bán
-            'gia_goc': df.iloc[product_idx].get('gia_goc', 'Không có thông tin'),  # Thêm giá gốc
-            'mo_ta': df.iloc[product_idx].get('mo_ta', 'Không có mô tả.')  # Thêm mô tả sản phẩm
-        })
-    
-    # Chuyển đổi danh sách gợi ý thành DataFrame
-    df_recommendations = pd.DataFrame(top_similar_products)
-    
-    return df_recommendations
+    with span('content.top_k'):
+        top = top_k_indices(final_scores, top_n)
+    with span('content.build'):
+        return build_recommendations(df, top, sims[top], final_scores[top])
+
+
+def recommend_many_products(product_ids, df, weight_content=0.7, weight_rating=0.3, top_n=6, index=None,
+                            use_neighbor_table=True, chunk_size=256, exclude_query=True):
+    """
+    Gợi ý cho nhiều sản phẩm cùng lúc: tính tương tự cho cả khối sản phẩm bằng
+    một phép nhân ma trận sparse và chọn top-k theo từng dòng.
+    Trả về một DataFrame dài với cột 'query_ma_san_pham' và 'rank';
+    mã sản phẩm không có trong dữ liệu bị bỏ qua. Với `exclude_query` (mặc định),
+    chính sản phẩm truy vấn không nằm trong gợi ý của nó (giống /recommend/content/{id} của api.py).
+    """
+    if index is None:
+        index = get_content_index(df)
+    query_ids = np.asarray([str(pid).strip() for pid in product_ids], dtype=object)
+    query_rows = index.products.lookup(query_ids).astype(np.intp)
+    queries = query_ids[query_rows >= 0]
+    query_rows = query_rows[query_rows >= 0]
+    if not len(query_rows):
+        return build_recommendations(df, np.empty(0, dtype=np.intp), [], []).assign(query_ma_san_pham=[], rank=[])
+
+    # Lấy dư một sản phẩm để còn đủ top_n sau khi loại sản phẩm truy vấn
+    n_candidates = top_n + 1 if exclude_query else top_n
+    table = get_neighbor_table() if use_neighbor_table else None
+    if table is not None and table.matches(index) and table.supports(weight_content, weight_rating, n_candidates):
+        # Bảng láng giềng có cùng thứ tự dòng với chỉ mục nên tra cứu trực tiếp cả khối
+        top = table.neighbors[query_rows, :n_candidates].astype(np.intp)
+        sims = table.similarities[query_rows, :n_candidates]
+        scores = table.scores[query_rows, :n_candidates]
+    else:
+        blocks = []
+        matrix_t = index.matrix.T.tocsc()
+        for start in range(0, len(query_rows), chunk_size):
+            rows = query_rows[start:start + chunk_size]
+            block_sims = (index.matrix[rows] @ matrix_t).toarray()
+            block_top, block_scores = top_k_rows(block_sims * weight_content + index.ratings * weight_rating,
+                                                 n_candidates)
+            block_top = block_top.astype(np.intp)
+            blocks.append((block_top, np.take_along_axis(block_sims, block_top, axis=1), block_scores))
+        top = np.concatenate([b[0] for b in blocks])
+        sims = np.concatenate([b[1] for b in blocks])
+        scores = np.concatenate([b[2] for b in blocks])
+
+    # Giữ tối đa top_n gợi ý mỗi dòng, bỏ chính sản phẩm truy vấn
+    keep = top != query_rows[:, None] if exclude_query else np.ones(top.shape, dtype=bool)
+    ranks = np.cumsum(keep, axis=1)
+    keep &= ranks <= top_n
+    recommendations = build_recommendations(df, top[keep], sims[keep], scores[keep])
+    recommendations.insert(0, 'query_ma_san_pham', np.repeat(queries, keep.sum(axis=1)))
+    recommendations.insert(1, 'rank', ranks[keep])
+    return recommendations
+
+
+if __name__ == "__main__":
+    # Xây dựng trước chỉ mục: python content_based_recommendation.py [đường_dẫn_csv] [--incremental] [--refresh-idf]
+    import sys
+    from data_store import load_table
 
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    data_file = paths[0] if paths else "data/content_based_preprocessed.csv"
+    products = load_table(data_file)
+    if "--incremental" in sys.argv and ContentIndex.exists(CONTENT_INDEX_DIR):
+        # Sau mỗi lần crawl: chỉ cập nhật sản phẩm thêm/sửa/xóa, "--refresh-idf" để tính lại IDF ngay
+        content_index = ContentIndex.load(CONTENT_INDEX_DIR).sync(products)
+        if "--refresh-idf" in sys.argv:
+            content_index.refresh_idf()
+    else:
+        content_index = ContentIndex.build(products)
+    content_index.save(CONTENT_INDEX_DIR)
+    print(f"Đã lưu chỉ mục nội dung (revision {content_index.revision}) vào {CONTENT_INDEX_DIR}")
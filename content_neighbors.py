@@ -0,0 +1,156 @@
+import os
+import threading
+import numpy as np
+from id_registry import IdRegistry
+from recommendation_cache import dependency_signature
+
+# File lưu bảng láng giềng đã tính trước
+CONTENT_NEIGHBORS_FILE = "model/content_neighbors.npz"
+
+
+class NeighborTable:
+    """
+    Bảng top-N sản phẩm gợi ý đã tính trước cho mọi `ma_san_pham`.
+    Dòng r của `neighbors` chứa chỉ số dòng (trong chỉ mục nội dung) của các
+    sản phẩm gợi ý cho sản phẩm ở dòng r, sắp xếp giảm dần theo điểm kết hợp.
+    """
+
+    def __init__(self, product_ids, neighbors, similarities, scores, weight_content, weight_rating, fingerprint=''):
+        self.product_ids = np.asarray(product_ids, dtype=str)
+        self.neighbors = np.asarray(neighbors, dtype=np.int32)
+        self.similarities = np.asarray(similarities, dtype=np.float32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.weight_content = float(weight_content)
+        self.weight_rating = float(weight_rating)
+        # Mã băm nội dung (ContentIndex.fingerprint) của chỉ mục lúc tính bảng
+        self.fingerprint = str(fingerprint)
+        self.products = IdRegistry(self.product_ids)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @property
+    def top_n(self):
+        return self.neighbors.shape[1]
+
+    def matches(self, index):
+        """
+        Bảng phải được tính từ đúng chỉ mục nội dung đang dùng (cùng mã băm nội dung, gồm cả mã sản phẩm
+        theo từng dòng); bảng lưu theo định dạng cũ (không có mã băm) không bao giờ khớp.
+        """
+        return bool(self.fingerprint) and self.fingerprint == index.fingerprint
+
+    def supports(self, weight_content, weight_rating, top_n):
+        """
+        Bảng chỉ trả lời được khi cùng trọng số và top_n không vượt quá số láng giềng đã lưu.
+        """
+        return (np.isclose(weight_content, self.weight_content)
+                and np.isclose(weight_rating, self.weight_rating)
+                and top_n <= self.top_n)
+
+    def lookup(self, product_id, top_n=None):
+        """
+        Tra cứu O(1): trả về (dòng láng giềng, điểm tương tự, điểm kết hợp).
+        """
+        row = self.products.get(product_id)
+        if row < 0:
+            raise ValueError("Mã sản phẩm không tồn tại trong dữ liệu.")
+        top_n = self.top_n if top_n is None else top_n
+        return self.neighbors[row, :top_n], self.similarities[row, :top_n], self.scores[row, :top_n]
+
+    def save(self, path=CONTENT_NEIGHBORS_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Ghi file tạm rồi đổi tên: tiến trình đang phục vụ nạp lại bảng khi file đổi, không đọc phải file ghi dở
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        np.savez(
+            tmp_path,
+            product_ids=self.product_ids,
+            neighbors=self.neighbors,
+            similarities=self.similarities,
+            scores=self.scores,
+            weights=np.array([self.weight_content, self.weight_rating]),
+            fingerprint=np.array(self.fingerprint),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CONTENT_NEIGHBORS_FILE):
+        with np.load(path) as data:
+            weight_content, weight_rating = data['weights']
+            fingerprint = str(data['fingerprint']) if 'fingerprint' in data.files else ''
+            return cls(data['product_ids'], data['neighbors'], data['similarities'], data['scores'],
+                       weight_content, weight_rating, fingerprint)
+
+
+def build_neighbor_table(index, top_n=50, weight_content=0.7, weight_rating=0.3, memory_budget_mb=256):
+    """
+    Tính top-N láng giềng cho toàn bộ sản phẩm theo từng khối dòng của ma trận
+    tương tự, sao cho mỗi khối (dạng dense) không vượt quá `memory_budget_mb`.
+    """
+    n = len(index)
+    top_n = min(top_n, n)
+    # Mỗi dòng của khối cần vài mảng float64 kích thước n (tương tự, điểm kết hợp, argpartition)
+    bytes_per_row = max(1, n) * 8 * 3
+    chunk_size = max(1, int(memory_budget_mb * 1024 * 1024 // bytes_per_row))
+
+    neighbors = np.empty((n, top_n), dtype=np.int32)
+    similarities = np.empty((n, top_n), dtype=np.float32)
+    scores = np.empty((n, top_n), dtype=np.float32)
+    rating_part = index.ratings * weight_rating
+    matrix_t = index.matrix.T.tocsc()
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        sims = (index.matrix[start:stop] @ matrix_t).toarray()
+        final = sims * weight_content + rating_part
+
+        # Chọn top-N mỗi dòng bằng argpartition rồi chỉ sắp xếp N phần tử đó
+        top = np.argpartition(-final, top_n - 1, axis=1)[:, :top_n]
+        top_final = np.take_along_axis(final, top, axis=1)
+        order = np.argsort(-top_final, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+
+        neighbors[start:stop] = top
+        similarities[start:stop] = np.take_along_axis(sims, top, axis=1)
+        scores[start:stop] = np.take_along_axis(top_final, order, axis=1)
+
+    return NeighborTable(index.product_ids, neighbors, similarities, scores, weight_content, weight_rating,
+                         index.fingerprint)
+
+
+# Bảng dùng chung trong tiến trình theo đường dẫn: (bảng hoặc None nếu chưa có file, chữ ký file lúc nạp)
+_neighbor_tables = {}
+_neighbor_tables_lock = threading.Lock()
+
+
+def get_neighbor_table(path=CONTENT_NEIGHBORS_FILE):
+    """
+    Bảng láng giềng đã nạp; nạp lại khi file được ghi lại (mtime/kích thước đổi), kể cả khi file
+    mới được tạo sau khi tiến trình khởi động. Trả về None nếu chưa chạy job tính trước.
+    """
+    signature = dependency_signature([path])
+    entry = _neighbor_tables.get(path)
+    if entry is None or entry[1] != signature:
+        with _neighbor_tables_lock:
+            entry = _neighbor_tables.get(path)
+            if entry is None or entry[1] != signature:
+                entry = (NeighborTable.load(path) if os.path.exists(path) else None, signature)
+                _neighbor_tables[path] = entry
+    return entry[0]
+
+
+if __name__ == "__main__":
+    # Job offline, chạy lại sau mỗi lần crawl:
+    # python content_neighbors.py [đường_dẫn_csv] [top_n] [memory_budget_mb]
+    import sys
+    from data_store import load_table
+    from content_based_recommendation import get_content_index
+
+    data_file = sys.argv[1] if len(sys.argv) > 1 else "data/content_based_preprocessed.csv"
+    top_n = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    memory_budget_mb = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+
+    content_index = get_content_index(load_table(data_file))
+    table = build_neighbor_table(content_index, top_n=top_n, memory_budget_mb=memory_budget_mb)
+    table.save(CONTENT_NEIGHBORS_FILE)
+    print(f"Đã lưu top-{table.top_n} láng giềng của {len(table)} sản phẩm vào {CONTENT_NEIGHBORS_FILE}")
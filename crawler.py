@@ -0,0 +1,322 @@
+import os
+import time
+import random
+import asyncio
+from html.parser import HTMLParser
+import numpy as np
+import pandas as pd
+
+# Crawler danh mục sản phẩm Hasaki (thay cho scrape_hasaki_data trong app.py): tải các trang danh mục
+# bất đồng bộ qua một connection pool (httpx), giới hạn số request đồng thời (semaphore) và tốc độ
+# (token bucket), thử lại với backoff khi lỗi mạng / 429 / 5xx. Kết quả được so với file hiện có theo
+# `ma_san_pham` và giá: chỉ sản phẩm mới, đổi giá/thông tin hoặc không còn bán được ghi lại.
+
+BASE_URL = "https://hasaki.vn/danh-muc/cham-soc-da-mat-c4.html"
+OUTPUT_FILE = "data/San_pham_new.csv"
+COLUMNS = ['ma_san_pham', 'ten_san_pham', 'gia_ban', 'gia_goc', 'hinh_anh']
+# Giá trị cột 'gia_goc' khi sản phẩm không có giá gốc (giống scrape_hasaki_data trong app.py)
+NO_ORIGINAL_PRICE = "Không có giá gốc"
+# Cột dùng để phát hiện sản phẩm thay đổi
+CHANGE_COLUMNS = ['gia_ban', 'gia_goc', 'ten_san_pham', 'hinh_anh']
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_price(text):
+    """
+    "218.000 ₫" -> 218000; None nếu không có giá.
+    """
+    digits = ''.join(ch for ch in str(text) if ch.isdigit())
+    return int(digits) if digits else None
+
+
+class ProductListParser(HTMLParser):
+    """
+    Trích xuất sản phẩm từ HTML trang danh mục (cùng các thẻ/class mà scrape_hasaki_data dùng với BeautifulSoup).
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.products = []
+        self._item = None
+        self._depth = 0
+        self._field = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get('class') or '').split())
+        if self._item is None:
+            if tag == 'div' and 'item_sp_hasaki' in classes:
+                self._item = {'ma_san_pham': None, 'ten_san_pham': None, 'gia_ban': None, 'gia_goc': None,
+                              'hinh_anh': None}
+                self._depth = 1
+            return
+        if tag == 'div':
+            self._depth += 1
+        elif tag == 'a' and 'block_info_item_sp' in classes:
+            self._item['ma_san_pham'] = attrs.get('data-id')
+            self._item['ten_san_pham'] = attrs.get('data-name')
+        elif tag == 'strong' and 'item_giamoi' in classes:
+            self._field = 'gia_ban'
+        elif tag == 'span' and 'item_giacu' in classes:
+            self._field = 'gia_goc'
+        elif tag == 'img' and 'img_thumb' in classes:
+            self._item['hinh_anh'] = attrs.get('data-src') or attrs.get('src')
+
+    def handle_data(self, data):
+        if self._item is not None and self._field is not None and data.strip():
+            self._item[self._field] = parse_price(data)
+            self._field = None
+
+    def handle_endtag(self, tag):
+        if self._item is None or tag != 'div':
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            if self._item['ma_san_pham']:
+                self.products.append(self._item)
+            self._item = None
+            self._field = None
+
+
+def parse_products(html):
+    parser = ProductListParser()
+    parser.feed(html)
+    parser.close()
+    return parser.products
+
+
+class TokenBucket:
+    """
+    Giới hạn tốc độ: trung bình `rate` request/giây, cho phép dồn tối đa `capacity` request.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Crawler:
+    """
+    Tải các trang danh mục `?p=1..max_pages` song song (tối đa `concurrency` request cùng lúc,
+    `rate` request/giây); dừng khi gặp trang không còn sản phẩm.
+    """
+
+    def __init__(self, base_url=BASE_URL, concurrency=4, rate=2.0, burst=2, retries=3, backoff=1.0, timeout=20.0):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Thống kê của lần crawl gần nhất
+        self.stats = {'requests': 0, 'retries': 0, 'failed_pages': []}
+
+    def page_url(self, page):
+        return f"{self.base_url}?p={page}"
+
+    def retry_delay(self, attempt, response=None):
+        # Ưu tiên Retry-After của máy chủ, nếu không thì backoff lũy thừa có jitter
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** attempt * (0.5 + random.random() / 2)
+
+    async def fetch(self, client, semaphore, bucket, url):
+        """
+        Nội dung trang; None nếu vẫn lỗi sau `retries` lần thử lại hoặc mã trạng thái không thử lại được.
+        """
+        import httpx
+
+        for attempt in range(self.retries + 1):
+            response = None
+            async with semaphore:
+                await bucket.acquire()
+                self.stats['requests'] += 1
+                try:
+                    response = await client.get(url)
+                except httpx.TransportError as e:
+                    print(f"Lỗi khi truy cập: {url}, {e}")
+                else:
+                    if response.status_code == 200:
+                        return response.text
+                    print(f"Không thể truy cập trang: {url} (status code: {response.status_code})")
+                    if response.status_code not in RETRY_STATUSES:
+                        return None
+            if attempt < self.retries:
+                self.stats['retries'] += 1
+                await asyncio.sleep(self.retry_delay(attempt, response))
+        return None
+
+    async def crawl_async(self, max_pages=68):
+        import httpx
+
+        self.stats = {'requests': 0, 'retries': 0, 'failed_pages': []}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        bucket = TokenBucket(self.rate, self.burst)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        products = []
+        async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=self.timeout,
+                                     follow_redirects=True) as client:
+            # Tải theo từng đợt `concurrency` trang để dừng sớm khi hết sản phẩm
+            for start in range(1, max_pages + 1, self.concurrency):
+                pages = range(start, min(start + self.concurrency, max_pages + 1))
+                htmls = await asyncio.gather(*(self.fetch(client, semaphore, bucket, self.page_url(p))
+                                               for p in pages))
+                reached_end = False
+                for page, html in zip(pages, htmls):
+                    if html is None:
+                        self.stats['failed_pages'].append(page)
+                        continue
+                    items = parse_products(html)
+                    if not items:
+                        reached_end = True
+                    products.extend(items)
+                if reached_end:
+                    break
+        return products_frame(products)
+
+    def crawl(self, max_pages=68):
+        return asyncio.run(self.crawl_async(max_pages))
+
+
+def price_text(value, missing=''):
+    """
+    Giá dạng chuỗi như trong file CSV: 218000 -> "218000", không có giá -> `missing`.
+    """
+    return missing if value is None or pd.isna(value) else str(int(value))
+
+
+def products_frame(products):
+    """
+    DataFrame sản phẩm theo đúng định dạng file San_pham_new.csv (mọi cột là chuỗi, thiếu giá gốc
+    ghi NO_ORIGINAL_PRICE), bỏ trùng theo `ma_san_pham` và giữ lần xuất hiện đầu tiên.
+    """
+    df = pd.DataFrame(products, columns=COLUMNS)
+    df['ma_san_pham'] = df['ma_san_pham'].astype(str).str.strip()
+    df['gia_ban'] = df['gia_ban'].map(price_text).astype(object)
+    df['gia_goc'] = df['gia_goc'].map(lambda value: price_text(value, NO_ORIGINAL_PRICE)).astype(object)
+    df[['ten_san_pham', 'hinh_anh']] = df[['ten_san_pham', 'hinh_anh']].fillna('').astype(str)
+    return df.drop_duplicates(subset=['ma_san_pham'], keep='first').reset_index(drop=True)
+
+
+def load_existing(path=OUTPUT_FILE):
+    """
+    Đọc file hiện có dạng chuỗi nguyên văn (không đổi "Không có giá gốc" hay giá trống thành NA)
+    để so sánh và ghi lại không làm đổi định dạng các dòng không thay đổi.
+    """
+    if not os.path.exists(path):
+        return products_frame([])
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df = df[COLUMNS].copy()
+    df['ma_san_pham'] = df['ma_san_pham'].str.strip()
+    return df.drop_duplicates(subset=['ma_san_pham'], keep='first').reset_index(drop=True)
+
+
+def diff_products(old, new):
+    """
+    So sánh theo `ma_san_pham`: trả về (mã mới, mã đổi giá/thông tin, mã không còn trong lần crawl).
+    """
+    old_indexed = old.set_index('ma_san_pham')
+    new_indexed = new.set_index('ma_san_pham')
+    added = new_indexed.index.difference(old_indexed.index)
+    removed = old_indexed.index.difference(new_indexed.index)
+    common = new_indexed.index.intersection(old_indexed.index)
+    # Hai bảng đều ở dạng chuỗi của file CSV (xem products_frame, load_existing)
+    before = old_indexed.loc[common, CHANGE_COLUMNS].astype(str)
+    after = new_indexed.loc[common, CHANGE_COLUMNS].astype(str)
+    changed = common[(before != after).any(axis=1).to_numpy()]
+    return list(added), list(changed), list(removed)
+
+
+def merge_products(old, new, drop_removed=True):
+    """
+    Bảng sau khi cập nhật: dòng cũ giữ nguyên thứ tự (cập nhật nếu đổi), sản phẩm mới thêm vào cuối;
+    sản phẩm không còn trong lần crawl bị bỏ nếu `drop_removed`.
+    """
+    merged = pd.concat([new, old], ignore_index=True).drop_duplicates(subset=['ma_san_pham'], keep='first')
+    # Vị trí trong file cũ; sản phẩm mới theo thứ tự crawl, sau các sản phẩm cũ
+    old_position = pd.Series(np.arange(len(old)), index=old['ma_san_pham'])
+    order = merged['ma_san_pham'].map(old_position).to_numpy(dtype=float)
+    order[np.isnan(order)] = len(old) + np.arange(np.isnan(order).sum())
+    merged = merged.iloc[np.argsort(order, kind='stable')]
+    if drop_removed:
+        merged = merged[merged['ma_san_pham'].isin(new['ma_san_pham'])]
+    return merged.reset_index(drop=True)
+
+
+def write_products(df, path=OUTPUT_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+    os.replace(tmp_path, path)
+
+
+def crawl_incremental(output=OUTPUT_FILE, base_url=BASE_URL, max_pages=68, max_removed_fraction=0.2,
+                      **crawler_options):
+    """
+    Crawl danh mục và cập nhật `output` nếu có thay đổi. Sản phẩm không thấy trong lần crawl chỉ bị bỏ
+    khi crawl đầy đủ: không có trang lỗi, có sản phẩm và số sản phẩm bị bỏ không vượt quá
+    `max_removed_fraction` số sản phẩm cũ (trang đổi bố cục, parse ra 0 sản phẩm thì không xóa cả file);
+    nếu không, các dòng cũ được giữ và `stats['removal_skipped']` là True.
+    Trả về (mã mới, mã thay đổi, mã bị bỏ, thống kê crawler).
+    """
+    crawler = Crawler(base_url, **crawler_options)
+    new = crawler.crawl(max_pages)
+    old = load_existing(output)
+    added, changed, removed = diff_products(old, new)
+    complete = (not crawler.stats['failed_pages'] and len(new) > 0
+                and len(removed) <= max_removed_fraction * len(old))
+    crawler.stats['removal_skipped'] = bool(removed) and not complete
+    if not complete:
+        removed = []
+    if added or changed or removed:
+        write_products(merge_products(old, new, drop_removed=complete), output)
+    return added, changed, removed, crawler.stats
+
+
+if __name__ == "__main__":
+    # python crawler.py [--max-pages 68] [--concurrency 4] [--rate 2]
+    # Thử với máy chủ giả lập cục bộ: python crawler_fixtures.py --port 8765, rồi
+    # python crawler.py --base-url http://127.0.0.1:8765/danh-muc/cham-soc-da-mat-c4.html --output /tmp/San_pham_new.csv
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crawl danh mục sản phẩm Hasaki (bất đồng bộ, tăng dần)")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--max-pages", type=int, default=68)
+    parser.add_argument("--concurrency", type=int, default=4, help="Số request đồng thời tối đa")
+    parser.add_argument("--rate", type=float, default=2.0, help="Số request mỗi giây (trung bình)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--max-removed-fraction", type=float, default=0.2,
+                        help="Tỉ lệ tối đa sản phẩm cũ được bỏ trong một lần crawl (vượt quá thì giữ dòng cũ)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    added, changed, removed, stats = crawl_incremental(args.output, args.base_url, args.max_pages,
+                                                       concurrency=args.concurrency, rate=args.rate,
+                                                       max_removed_fraction=args.max_removed_fraction,
+                                                       retries=args.retries)
+    print(f"{stats['requests']} request ({stats['retries']} lần thử lại) trong {time.perf_counter() - start:.1f}s; "
+          f"trang lỗi: {stats['failed_pages'] or 'không'}")
+    print(f"Sản phẩm mới: {len(added)}, thay đổi: {len(changed)}, không còn bán: {len(removed)} -> {args.output}")
+    if stats['removal_skipped']:
+        print("Crawl không đầy đủ (trang lỗi, không có sản phẩm hoặc quá nhiều sản phẩm biến mất): giữ các dòng cũ")
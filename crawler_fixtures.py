@@ -0,0 +1,130 @@
+import html
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+
+# Máy chủ HTTP giả lập trang danh mục Hasaki để chạy thử crawler.py cục bộ: các trang `?p=N` được sinh
+# từ một bảng sản phẩm (mặc định data/San_pham_new.csv) với cùng thẻ/class như trang thật; trang vượt
+# quá số sản phẩm trả về danh mục rỗng. Có thể giả lập lỗi 503 để kiểm tra thử lại với backoff.
+
+CATEGORY_PATH = "/danh-muc/cham-soc-da-mat-c4.html"
+ITEM_TEMPLATE = """
+<div class="item_sp_hasaki width_common relative">
+  <a class="block_info_item_sp width_common card-body" data-id="{id}" data-name="{name}" href="/san-pham/{id}.html">
+    <div class="width_common space_bottom_3">
+      <img class="img_thumb lazy" data-src="{image}" src="data:image/gif;base64,R0lGODlhAQABAAAAACw=" alt="{name}">
+    </div>
+    <div class="width_common">
+      <strong class="item_giamoi txt_16">{price}</strong>
+      {original}
+    </div>
+  </a>
+</div>"""
+
+
+def format_price(value):
+    return f"{int(value):,} ₫".replace(",", ".")
+
+
+def render_page(products):
+    """
+    HTML một trang danh mục chứa các sản phẩm (DataFrame cùng cột với San_pham_new.csv).
+    """
+    items = []
+    for row in products.itertuples(index=False):
+        original = pd.to_numeric(row.gia_goc, errors='coerce')
+        items.append(ITEM_TEMPLATE.format(
+            id=html.escape(str(row.ma_san_pham)),
+            name=html.escape(str(row.ten_san_pham)),
+            image=html.escape(str(row.hinh_anh)),
+            price=format_price(row.gia_ban),
+            original=f'<span class="item_giacu txt_12 right">{format_price(original)}</span>'
+            if pd.notna(original) else '',
+        ))
+    return ("<html><head><meta charset='utf-8'></head><body><div class='list_product'>"
+            + "".join(items) + "</div></body></html>")
+
+
+class FixtureServer:
+    """
+    Phục vụ `products` theo trang (`per_page` sản phẩm mỗi trang) trên 127.0.0.1:`port` (0 = cổng ngẫu nhiên).
+    `fail_first` là số lần đầu tiên mỗi trang trả về 503 (giả lập máy chủ quá tải).
+    Dùng `with FixtureServer(df) as server: Crawler(server.base_url).crawl()`.
+    """
+
+    def __init__(self, products, per_page=40, port=0, fail_first=0):
+        self.products = products
+        self.per_page = per_page
+        self.fail_first = fail_first
+        self.requests = {}
+        self._lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != CATEGORY_PATH:
+                    self.send_error(404)
+                    return
+                page = int(parse_qs(url.query).get('p', ['1'])[0])
+                with fixture._lock:
+                    fixture.requests[page] = fixture.requests.get(page, 0) + 1
+                    attempt = fixture.requests[page]
+                if attempt <= fixture.fail_first:
+                    self.send_response(503)
+                    self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    return
+                start = (page - 1) * fixture.per_page
+                body = render_page(fixture.products.iloc[start:start + fixture.per_page]).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{CATEGORY_PATH}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # python crawler_fixtures.py --port 8765 [--input data/San_pham_new.csv] [--fail-first 1]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Máy chủ giả lập trang danh mục Hasaki cho crawler.py")
+    parser.add_argument("--input", default="data/San_pham_new.csv")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--per-page", type=int, default=40)
+    parser.add_argument("--fail-first", type=int, default=0, help="Số lần 503 đầu tiên của mỗi trang")
+    args = parser.parse_args()
+
+    products = pd.read_csv(args.input, dtype={'ma_san_pham': str})
+    server = FixtureServer(products, args.per_page, args.port, args.fail_first)
+    print(f"Phục vụ {len(products)} sản phẩm tại {server.base_url} (Ctrl+C để dừng)")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,132 @@
+import os
+import ast
+import numpy as np
+import pandas as pd
+from metrics import span
+
+# Các bộ dữ liệu được chuyển sang định dạng cột nhị phân (Feather/Arrow IPC)
+DATASET_FILES = [
+    "data/san_pham_updated.csv",
+    "data/Danh_gia.csv",
+    "data/content_based_preprocessed.csv",
+    "data/collaborative_full_data_part1.csv",
+    "data/collaborative_full_data_part2.csv",
+]
+
+# Kiểu dữ liệu của từng cột (cột không có trong danh sách giữ nguyên kiểu của pandas)
+ID_COLUMNS = ['id', 'ma_khach_hang', 'ma_san_pham']
+NUMERIC_COLUMNS = ['gia_ban', 'gia_goc', 'diem_trung_binh', 'so_sao', 'token_count']
+TEXT_COLUMNS = ['phan_loai']
+LIST_COLUMNS = ['tokens']
+
+
+def feather_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".feather"
+
+
+def _parse_list(value):
+    if isinstance(value, str):
+        return ast.literal_eval(value)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    return []
+
+
+def _normalize_ids(values):
+    """
+    Mã số nguyên -> Int64 (cho phép thiếu), các mã khác -> chuỗi; giá trị thiếu là <NA> chứ không thành
+    'nan' hay làm cột thành số thực (123.0), nên mã luôn đọc lại là '123' sau khi qua Feather.
+    """
+    missing = values.isna()
+    text = values[~missing].astype(str).str.strip()
+    numeric = pd.to_numeric(values[~missing], errors='coerce')
+    if numeric.notna().all() and (numeric % 1 == 0).all():
+        integers = numeric.astype(np.int64)
+        # Giữ dạng chuỗi nếu chuyển sang số làm mất thông tin (số 0 ở đầu, '1e3', ...)
+        if values.dtype == object and not (integers.astype(str) == text).all():
+            return _as_string(values, missing, text)
+        result = pd.Series(pd.NA, index=values.index, dtype='Int64')
+        result[~missing] = integers
+        return result
+    return _as_string(values, missing, text)
+
+
+def _as_string(values, missing, text):
+    result = pd.Series(pd.NA, index=values.index, dtype='string')
+    result[~missing] = text
+    return result
+
+
+def normalize_types(df):
+    """
+    Chuẩn hóa kiểu cột: mã là số nguyên Int64 (hoặc chuỗi nếu không phải số), giá/điểm là số,
+    phân loại là chuỗi (văn bản tự do, giữ giá trị thiếu) và tokens là list.
+    """
+    df = df.copy()
+    for col in ID_COLUMNS:
+        if col in df:
+            df[col] = _normalize_ids(df[col])
+    for col in NUMERIC_COLUMNS:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in TEXT_COLUMNS:
+        if col in df:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    for col in LIST_COLUMNS:
+        if col in df:
+            df[col] = df[col].apply(_parse_list)
+    return df
+
+
+def convert_to_feather(csv_path, output_path=None):
+    """
+    Đọc CSV một lần, chuẩn hóa kiểu và ghi ra Feather không nén (đọc được bằng memory-map).
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+
+    output_path = output_path or feather_path(csv_path)
+    df = normalize_types(pd.read_csv(csv_path))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    feather.write_feather(table, output_path, compression='uncompressed')
+    return output_path
+
+
+def feather_is_fresh(csv_path, binary_path):
+    if not os.path.exists(binary_path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(binary_path) >= os.path.getmtime(csv_path)
+
+
+def load_table(csv_path, columns=None):
+    """
+    Đọc bộ dữ liệu: ưu tiên file Feather (memory-map) bên cạnh file CSV,
+    nếu chưa có (hoặc cũ hơn CSV) thì đọc CSV và chuẩn hóa kiểu như nhau.
+    """
+    binary_path = feather_path(csv_path)
+    if feather_is_fresh(csv_path, binary_path):
+        from pyarrow import feather
+        with span('load_table.feather'):
+            return feather.read_table(binary_path, columns=columns, memory_map=True).to_pandas()
+    with span('load_table.read_csv'):
+        df = pd.read_csv(csv_path, usecols=columns)
+    with span('load_table.normalize_types'):
+        return normalize_types(df)
+
+
+def load_tables(csv_paths, columns=None):
+    """
+    Đọc và nối nhiều bộ dữ liệu cùng cấu trúc (ví dụ các file collaborative part).
+    """
+    return pd.concat([load_table(path, columns) for path in csv_paths], ignore_index=True)
+
+
+if __name__ == "__main__":
+    # Chuyển đổi một lần: python data_store.py [đường_dẫn_csv ...]
+    import sys
+
+    for path in sys.argv[1:] or DATASET_FILES:
+        if os.path.exists(path):
+            print(f"{path} -> {convert_to_feather(path)}")
+        else:
+            print(f"Bỏ qua {path}: không tìm thấy file")
@@ -0,0 +1,207 @@
+import threading
+import numpy as np
+from scipy import sparse
+from collaborative_recommend import get_recommender
+from collaborative_scoring import top_k_rows
+from content_based_recommendation import build_recommendations, get_content_index
+from metrics import increment, span
+
+
+class HybridRecommender:
+    """
+    Gợi ý kết hợp collaborative và content-based trong một lần chấm điểm catalog.
+    Ứng viên là toàn bộ sản phẩm của chỉ mục nội dung; với mỗi khách hàng tính cùng lúc
+    điểm ước lượng KNNBaseline, độ tương tự nội dung với sản phẩm gốc (hoặc với các sản phẩm
+    khách đã thích nếu không có sản phẩm gốc) và điểm đánh giá trung bình, rồi trộn theo trọng số.
+    """
+
+    def __init__(self, df, collaborative, index=None):
+        self.df = df
+        self.index = index if index is not None else get_content_index(df)
+        if not self.index.matches(df):
+            raise ValueError("Chỉ mục nội dung không khớp với DataFrame sản phẩm.")
+        self.revision = self.index.revision
+        self.collaborative = collaborative
+        self.matrix_t = self.index.matrix.T.tocsc()
+
+        state = collaborative.state
+        # Chỉ số trong mô hình của từng ứng viên (-1: sản phẩm chưa có trong mô hình, chỉ dùng baseline)
+        self.candidate_items = state.inner_items(self.index.product_ids)
+        # Vị trí trong catalog collaborative -> dòng trong chỉ mục nội dung (-1 nếu không có)
+        self.catalog_rows = self.index.products.lookup(collaborative.catalog_ids).astype(np.int64)
+
+        # Điểm ước lượng và điểm trung bình được đưa về [0, 1] theo thang đánh giá để trộn với cosine
+        low, high = state.rating_scale
+        self.rating_low, self.rating_range = low, (high - low) or 1.0
+        self.average_ratings = np.clip((self.index.ratings - low) / self.rating_range, 0.0, 1.0)
+
+    def content_profiles(self, n_queries, seed_rows, liked_rows, liked_content):
+        """
+        Vector nội dung (đã chuẩn hóa L2) của mỗi truy vấn: vector của sản phẩm gốc nếu có,
+        nếu không là trung bình vector các sản phẩm khách đã thích.
+        """
+        has_seed = seed_rows >= 0
+        use_liked = ~has_seed[liked_rows]
+        rows = np.concatenate([np.flatnonzero(has_seed), liked_rows[use_liked]])
+        cols = np.concatenate([seed_rows[has_seed], liked_content[use_liked]])
+        selection = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                      shape=(n_queries, len(self.index)))
+        profiles = selection @ self.index.matrix
+        norms = np.sqrt(np.asarray(profiles.multiply(profiles).sum(axis=1)).ravel())
+        scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+        return sparse.diags(scale) @ profiles
+
+    def query_rows(self, customer_ids, product_ids=None):
+        """
+        Thông tin truy vấn dùng chung cho các bước chấm điểm: chỉ số khách hàng, dòng sản phẩm gốc
+        (-1 nếu không có) và các cặp (truy vấn, dòng sản phẩm đã thích) trong chỉ mục nội dung.
+        """
+        codes = self.collaborative.customer_codes(customer_ids)
+        liked_rows, liked_positions = self.collaborative.liked_pairs(codes)
+        liked_content = self.catalog_rows[liked_positions]
+        keep = liked_content >= 0
+        if product_ids is None:
+            seed_rows = np.full(len(codes), -1, dtype=np.int64)
+        else:
+            seed_rows = self.index.products.lookup(product_ids).astype(np.int64)
+        return codes, seed_rows, liked_rows[keep], liked_content[keep]
+
+    def scores_many(self, customer_ids, product_ids=None, weight_collaborative=0.5, weight_content=0.3,
+                    weight_rating=0.2, rows=None):
+        """
+        Điểm của các ứng viên (mặc định toàn bộ catalog, hoặc chỉ các dòng `rows`) cho nhiều truy vấn
+        (khách hàng, sản phẩm gốc tùy chọn) cùng lúc. Trả về (điểm trộn, điểm ước lượng collaborative,
+        độ tương tự nội dung), mỗi mảng kích thước (số truy vấn x số ứng viên);
+        sản phẩm gốc và sản phẩm khách đã thích là -inf.
+        """
+        return self.scores_for_queries(self.query_rows(customer_ids, product_ids), weight_collaborative,
+                                       weight_content, weight_rating, rows)
+
+    def scores_for_queries(self, queries, weight_collaborative=0.5, weight_content=0.3, weight_rating=0.2,
+                           rows=None):
+        """
+        Như `scores_many` nhưng nhận trực tiếp kết quả của `query_rows`.
+        """
+        codes, seed_rows, liked_rows, liked_content = queries
+        n_queries = len(codes)
+        if rows is None:
+            rows = np.arange(len(self.index))
+        rows = np.asarray(rows, dtype=np.int64)
+
+        with span('hybrid.estimate'):
+            estimates = self.collaborative.state.estimate_inner(self.collaborative.users_for_codes(codes),
+                                                                self.candidate_items[rows])
+        with span('hybrid.content_similarity'):
+            profiles = self.content_profiles(n_queries, seed_rows, liked_rows, liked_content)
+            similarities = (profiles @ self.matrix_t[:, rows]).toarray()
+        increment('recommendation_items_scored_total', n_queries * len(rows), recommender='hybrid')
+
+        scores = (weight_collaborative * (estimates - self.rating_low) / self.rating_range
+                  + weight_content * similarities
+                  + weight_rating * self.average_ratings[rows])
+
+        # Vị trí của mỗi dòng chỉ mục trong tập ứng viên (-1 nếu không thuộc tập)
+        columns = np.full(len(self.index), -1, dtype=np.int64)
+        columns[rows] = np.arange(len(rows))
+        excluded_rows = np.concatenate([liked_rows, np.flatnonzero(seed_rows >= 0)])
+        excluded_columns = columns[np.concatenate([liked_content, seed_rows[seed_rows >= 0]])]
+        keep = excluded_columns >= 0
+        scores[excluded_rows[keep], excluded_columns[keep]] = -np.inf
+        return scores, estimates, similarities
+
+    def recommend_many(self, customer_ids, product_ids=None, top_n=6, chunk_size=256, **weights):
+        """
+        Gợi ý cho nhiều khách hàng (kèm sản phẩm gốc tùy chọn, cùng độ dài), chấm điểm theo từng khối.
+        Trả về DataFrame dài với cột 'query_ma_khach_hang', 'query_ma_san_pham' (nếu có) và 'rank'.
+        """
+        customer_ids = np.asarray([str(c).strip() for c in customer_ids], dtype=object)
+        if product_ids is not None:
+            product_ids = np.asarray([str(p).strip() for p in product_ids], dtype=object)
+            if len(product_ids) != len(customer_ids):
+                raise ValueError("Số sản phẩm gốc phải bằng số khách hàng.")
+
+        queries, ranks, rows, final, estimates, similarities = [], [], [], [], [], []
+        for start in range(0, len(customer_ids), chunk_size):
+            block = slice(start, start + chunk_size)
+            scores, block_estimates, block_similarities = self.scores_many(
+                customer_ids[block], None if product_ids is None else product_ids[block], **weights)
+            top, top_scores = top_k_rows(scores, top_n)
+            valid = top >= 0
+            hits, cols = np.nonzero(valid)
+            top = top[valid]
+            queries.append(start + hits)
+            ranks.append(cols + 1)
+            rows.append(top)
+            final.append(top_scores[valid])
+            estimates.append(block_estimates[hits, top])
+            similarities.append(block_similarities[hits, top])
+
+        if not queries:
+            queries = rows = ranks = [np.empty(0, dtype=np.intp)]
+            final = estimates = similarities = [np.empty(0)]
+        queries = np.concatenate(queries)
+        recommendations = build_recommendations(self.df, np.concatenate(rows), np.concatenate(similarities),
+                                                np.concatenate(final))
+        recommendations.insert(3, 'EstimateScore', np.concatenate(estimates))
+        recommendations.insert(0, 'rank', np.concatenate(ranks))
+        if product_ids is not None:
+            recommendations.insert(0, 'query_ma_san_pham', product_ids[queries])
+        recommendations.insert(0, 'query_ma_khach_hang', customer_ids[queries])
+        return recommendations
+
+    def recommend(self, customer_id, product_id=None, top_n=6, **weights):
+        """
+        Gợi ý cho một khách hàng, tùy chọn kèm sản phẩm đang xem.
+        """
+        product_ids = None if product_id is None else [product_id]
+        recommendations = self.recommend_many([customer_id], product_ids, top_n, **weights)
+        return recommendations.drop(columns=['query_ma_khach_hang', 'query_ma_san_pham', 'rank'], errors='ignore')
+
+
+# Recommender kết hợp dùng chung, dựng lại khi recommender collaborative hoặc chỉ mục nội dung thay đổi
+_hybrid = None
+_hybrid_lock = threading.Lock()
+
+
+def get_hybrid_recommender(df, data_files, model_file):
+    global _hybrid
+    collaborative = get_recommender(data_files, model_file)
+    index = get_content_index(df)
+    with _hybrid_lock:
+        if (_hybrid is None or _hybrid.collaborative is not collaborative or _hybrid.index is not index
+                or _hybrid.df is not df or _hybrid.revision != index.revision):
+            _hybrid = HybridRecommender(df, collaborative, index)
+        return _hybrid
+
+
+def recommend_products(df, data_files, model_file, customer_id, product_id=None, top_n=6, **weights):
+    with span('hybrid.recommend'):
+        return get_hybrid_recommender(df, data_files, model_file).recommend(customer_id, product_id, top_n,
+                                                                            **weights)
+
+
+if __name__ == "__main__":
+    # python hybrid_recommendation.py 443 [--product 318900012] [--top-n 6]
+    import argparse
+    from data_store import load_table
+
+    parser = argparse.ArgumentParser(description="Gợi ý kết hợp collaborative + content-based")
+    parser.add_argument("customer_id")
+    parser.add_argument("--product", default=None, help="Sản phẩm đang xem (tùy chọn)")
+    parser.add_argument("--top-n", type=int, default=6)
+    parser.add_argument("--weight-collaborative", type=float, default=0.5)
+    parser.add_argument("--weight-content", type=float, default=0.3)
+    parser.add_argument("--weight-rating", type=float, default=0.2)
+    parser.add_argument("--content-data", default="data/content_based_preprocessed.csv")
+    parser.add_argument("--data-files", nargs="+", default=["data/collaborative_full_data_part1.csv",
+                                                            "data/collaborative_full_data_part2.csv"])
+    parser.add_argument("--model-file", default="model/collaborative_model.pkl.gz")
+    args = parser.parse_args()
+
+    df_products = load_table(args.content_data)
+    recommendations = recommend_products(
+        df_products, args.data_files, args.model_file, args.customer_id, args.product, args.top_n,
+        weight_collaborative=args.weight_collaborative, weight_content=args.weight_content,
+        weight_rating=args.weight_rating,
+    )
+    print(recommendations[['ma_san_pham', 'ten_san_pham', 'EstimateScore', 'similarity_score', 'final_score']])
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+
+def normalize_id(value):
+    return str(value).strip()
+
+
+class IdRegistry:
+    """
+    Ánh xạ mã (`ma_san_pham`, `ma_khach_hang`) <-> chỉ số int32 liên tục 0..n-1.
+    Mã được chuẩn hóa một lần khi đăng ký; các mảng nội bộ (đánh giá, láng giềng, điểm)
+    chỉ dùng chỉ số, mã chuỗi chỉ được dựng lại ở đầu ra.
+    """
+
+    def __init__(self, ids=()):
+        self._ids = []
+        self._codes = {}
+        self._index = None
+        self.add(ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, value):
+        return normalize_id(value) in self._codes
+
+    def _lookup_index(self):
+        # pd.Index dùng cho tra cứu vector hóa, dựng lại khi có mã mới
+        if self._index is None or len(self._index) != len(self._ids):
+            self._index = pd.Index(self._ids, dtype=object)
+        return self._index
+
+    @property
+    def ids(self):
+        """
+        Mảng mã theo thứ tự chỉ số.
+        """
+        return self._lookup_index().to_numpy()
+
+    def add(self, values):
+        """
+        Đăng ký các mã (mã mới nhận chỉ số tiếp theo) và trả về chỉ số của chúng.
+        """
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            value = normalize_id(value)
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self._ids)
+                self._ids.append(value)
+            codes[i] = code
+        return codes
+
+    def get(self, value, default=-1):
+        return self._codes.get(normalize_id(value), default)
+
+    def lookup(self, values):
+        """
+        Chỉ số của nhiều mã cùng lúc (-1 nếu chưa đăng ký).
+        """
+        if len(values) == 0:
+            return np.empty(0, dtype=np.int32)
+        values = pd.Index(values).astype(str).str.strip()
+        return self._lookup_index().get_indexer(values).astype(np.int32)
+
+    def to_ids(self, codes):
+        """
+        Chuyển chỉ số về mã chuỗi (chỉ dùng ở đầu ra).
+        """
+        return self.ids[np.asarray(codes, dtype=np.intp)]
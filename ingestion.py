@@ -0,0 +1,215 @@
+import os
+import numpy as np
+import pandas as pd
+from data_store import feather_path, normalize_types, feather_is_fresh
+from id_registry import IdRegistry
+
+# Số dòng đọc mỗi lần: quyết định bộ nhớ đỉnh khi đọc log đánh giá (chỉnh qua biến môi trường)
+DEFAULT_CHUNKSIZE = int(os.environ.get("INGESTION_CHUNKSIZE", 50_000))
+
+# Khóa chống trùng: mã đánh giá nếu có, nếu không thì toàn bộ nội dung đánh giá
+DEDUP_KEY = ['id']
+FALLBACK_DEDUP_KEY = ['ma_khach_hang', 'ma_san_pham', 'so_sao', 'ngay_binh_luan', 'gio_binh_luan']
+
+
+def iter_chunks(paths, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """
+    Đọc lần lượt từng khối (tối đa `chunksize` dòng) của các file, không nạp toàn bộ vào bộ nhớ.
+    Ưu tiên file Feather (memory-map) nếu còn mới, nếu không thì đọc CSV theo khối.
+    """
+    for path in paths:
+        binary_path = feather_path(path)
+        if feather_is_fresh(path, binary_path):
+            import pyarrow as pa
+
+            with pa.memory_map(binary_path) as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    if columns is not None:
+                        batch = batch.select(columns)
+                    for start in range(0, batch.num_rows, chunksize):
+                        yield batch.slice(start, chunksize).to_pandas()
+        else:
+            for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+                yield normalize_types(chunk)
+
+
+def normalize_ids(chunk):
+    chunk = chunk.copy()
+    chunk['ma_khach_hang'] = chunk['ma_khach_hang'].astype(str).str.strip()
+    chunk['ma_san_pham'] = chunk['ma_san_pham'].astype(str).str.strip()
+    return chunk
+
+
+def interaction_hashes(chunk):
+    """
+    Mã băm uint64 của từng đánh giá (khách hàng, sản phẩm, số sao), không phụ thuộc kiểu cột số sao.
+    """
+    rows = pd.DataFrame({
+        'ma_khach_hang': chunk['ma_khach_hang'].astype(str).to_numpy(),
+        'ma_san_pham': chunk['ma_san_pham'].astype(str).to_numpy(),
+        'so_sao': chunk['so_sao'].to_numpy(dtype=np.float64),
+    })
+    return pd.util.hash_pandas_object(rows, index=False).to_numpy(dtype=np.uint64)
+
+
+class Interactions:
+    """
+    Cấu trúc tương tác khách hàng - sản phẩm gọn nhẹ: bộ đăng ký mã khách hàng/sản phẩm
+    (chỉ số theo thứ tự xuất hiện đầu tiên), mảng chỉ số (int32) và số sao (float32) cho từng
+    đánh giá, thông tin sản phẩm (dòng đầu tiên của mỗi sản phẩm) và dấu vân tay đánh giá
+    của từng khách hàng (theo chỉ số khách hàng).
+    """
+
+    def __init__(self, customers, products, customer_codes, product_codes, ratings, product_info,
+                 fingerprints):
+        self.customers = customers
+        self.products = products
+        self.customer_codes = np.asarray(customer_codes, dtype=np.int32)
+        self.product_codes = np.asarray(product_codes, dtype=np.int32)
+        self.ratings = np.asarray(ratings, dtype=np.float32)
+        self.product_info = product_info
+        self.fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.ratings)
+
+    @property
+    def customer_ids(self):
+        return self.customers.ids
+
+    @property
+    def product_ids(self):
+        return self.products.ids
+
+    def liked_products(self, min_rating=3):
+        """
+        Chỉ số sản phẩm mỗi khách hàng đánh giá từ `min_rating` sao, dạng CSR theo chỉ số
+        khách hàng: sản phẩm của khách hàng c là `positions[indptr[c]:indptr[c + 1]]` (tăng dần).
+        """
+        mask = self.ratings >= min_rating
+        n_products = len(self.products)
+        pairs = np.unique(self.customer_codes[mask].astype(np.int64) * n_products + self.product_codes[mask])
+        customers, positions = np.divmod(pairs, n_products)
+        indptr = np.zeros(len(self.customers) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(customers, minlength=len(self.customers)), out=indptr[1:])
+        return indptr, positions.astype(np.int32)
+
+    def to_frame(self):
+        """
+        Bảng (ma_khach_hang, ma_san_pham, so_sao), ví dụ để huấn luyện lại mô hình.
+        """
+        return pd.DataFrame({
+            'ma_khach_hang': self.customers.to_ids(self.customer_codes),
+            'ma_san_pham': self.products.to_ids(self.product_codes),
+            'so_sao': self.ratings,
+        })
+
+
+class InteractionBuilder:
+    """
+    Xây dựng `Interactions` tăng dần từ từng khối dữ liệu: bộ nhớ đỉnh chỉ gồm một khối
+    cộng các mảng đã gom (khoảng 28 byte mỗi đánh giá: chỉ số, số sao, khóa chống trùng, mã băm).
+    Dòng trùng giữa các khối được bỏ một lần ở `build` (một lần sắp xếp toàn bộ khóa)
+    thay vì trộn lại tập khóa đã gặp ở mỗi khối.
+    """
+
+    def __init__(self):
+        self.customers = IdRegistry()
+        self.products = IdRegistry()
+        # Mỗi khối: (khóa chống trùng, chỉ số khách hàng, chỉ số sản phẩm, số sao, mã băm đánh giá)
+        self._chunks = []
+        self._products = []
+        self.n_rows = self.n_duplicates = 0
+
+    def _dedup_hashes(self, chunk):
+        fallback = [col for col in FALLBACK_DEDUP_KEY if col in chunk]
+        hashes = pd.util.hash_pandas_object(chunk[fallback].astype(str), index=False).to_numpy(dtype=np.uint64)
+        if all(col in chunk for col in DEDUP_KEY):
+            # Dòng thiếu mã đánh giá (ví dụ đánh giá mới được nối thêm) dùng khóa dự phòng
+            has_id = chunk[DEDUP_KEY].notna().all(axis=1).to_numpy()
+            by_id = pd.util.hash_pandas_object(chunk[DEDUP_KEY].astype(str), index=False).to_numpy(dtype=np.uint64)
+            hashes = np.where(has_id, by_id, hashes)
+        return hashes
+
+    def add(self, chunk):
+        """
+        Thêm một khối đánh giá: chuẩn hóa mã, bỏ dòng trùng trong khối và gom chỉ số
+        (dòng trùng với khối trước được bỏ ở `build`).
+        """
+        self.n_rows += len(chunk)
+        chunk = normalize_ids(chunk)
+
+        keys = self._dedup_hashes(chunk)
+        _, first = np.unique(keys, return_index=True)
+        if len(first) < len(chunk):
+            first.sort()
+            self.n_duplicates += len(chunk) - len(first)
+            chunk, keys = chunk.iloc[first], keys[first]
+        if chunk.empty:
+            return self
+
+        n_products = len(self.products)
+        customers = self.customers.add(chunk['ma_khach_hang'].to_numpy())
+        products = self.products.add(chunk['ma_san_pham'].to_numpy())
+        ratings = chunk['so_sao'].to_numpy(dtype=np.float32)
+        self._chunks.append((keys, customers, products, ratings, interaction_hashes(chunk)))
+
+        # Dòng đầu tiên của mỗi sản phẩm mới dùng làm thông tin sản phẩm
+        new_products = products >= n_products
+        if new_products.any():
+            self._products.append(chunk[new_products].drop_duplicates(subset='ma_san_pham'))
+        return self
+
+    def build(self):
+        if self._chunks:
+            keys, customers, products, ratings, hashes = (np.concatenate(parts) for parts in zip(*self._chunks))
+            self._chunks = [(keys, customers, products, ratings, hashes)]
+            # Giữ lần xuất hiện đầu tiên của mỗi khóa trên toàn bộ các khối
+            _, first = np.unique(keys, return_index=True)
+            if len(first) < len(keys):
+                first.sort()
+                self.n_duplicates += len(keys) - len(first)
+                self._chunks = [tuple(part[first] for part in self._chunks[0])]
+                _, customers, products, ratings, hashes = self._chunks[0]
+            product_info = pd.concat(self._products, ignore_index=True)
+        else:
+            customers = products = np.zeros(0, dtype=np.int32)
+            ratings = np.zeros(0, dtype=np.float32)
+            hashes = np.zeros(0, dtype=np.uint64)
+            product_info = pd.DataFrame(columns=['ma_san_pham'])
+
+        # Dấu vân tay là tổng mã băm các đánh giá của khách hàng (cộng tràn số uint64), tính một lần
+        fingerprints = np.zeros(len(self.customers), dtype=np.uint64)
+        np.add.at(fingerprints, customers, hashes)
+        return Interactions(self.customers, self.products, customers, products, ratings, product_info,
+                            fingerprints)
+
+
+def load_interactions(paths, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Đọc log đánh giá theo từng khối và xây dựng cấu trúc tương tác, không cần nạp toàn bộ file.
+    """
+    builder = InteractionBuilder()
+    for chunk in iter_chunks(paths, chunksize):
+        builder.add(chunk)
+    return builder.build()
+
+
+if __name__ == "__main__":
+    # python ingestion.py [--chunksize N] file.csv [file.csv ...]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Đọc log đánh giá theo khối và thống kê tương tác")
+    parser.add_argument("paths", nargs="*", default=["data/collaborative_full_data_part1.csv",
+                                                     "data/collaborative_full_data_part2.csv"])
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    builder = InteractionBuilder()
+    for chunk in iter_chunks(args.paths, args.chunksize):
+        builder.add(chunk)
+    interactions = builder.build()
+    print(f"{builder.n_rows} dòng, bỏ {builder.n_duplicates} dòng trùng: {len(interactions)} đánh giá, "
+          f"{len(interactions.customer_ids)} khách hàng, {len(interactions.product_ids)} sản phẩm")
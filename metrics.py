@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Đo thời gian từng bước (span) và đếm (counter) trong tiến trình, xuất dạng text của Prometheus
+# hoặc JSON. Mỗi lần ghi chỉ gồm một lần đọc đồng hồ và một phép cộng dưới khóa nên có thể
+# bật thường trực; tắt hẳn bằng METRICS_ENABLED=0.
+ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+# Ngưỡng (giây) của histogram thời gian, từ 0.1 ms tới 30 s
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+SPAN_METRIC = "recommendation_stage_seconds"
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """
+    Bộ đếm và histogram thời gian theo nhãn, dùng chung cho mọi luồng trong tiến trình.
+    Collector (hàm trả về {tên: {nhãn: giá trị}}) cho phép xuất thêm số liệu có sẵn ở nơi khác,
+    ví dụ số hit/miss của recommendation_cache.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        slot = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # [số lần theo từng ngưỡng (+ một ô vượt ngưỡng cuối), tổng thời gian, số lần]
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][slot] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _collected(self):
+        values = {}
+        for collector in self._collectors:
+            for name, series in collector().items():
+                for labels, value in series.items():
+                    values[(name, labels)] = value
+        return values
+
+    def snapshot(self):
+        """
+        Toàn bộ số liệu dạng dict (dùng cho JSON): counters, spans (số lần, tổng/trung bình giây, histogram).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+        counters.update(self._collected())
+        return {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'pid': os.getpid(),
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in sorted(counters.items())],
+            'spans': [{'name': name, 'labels': dict(labels), 'count': count, 'sum_seconds': total,
+                       'mean_seconds': total / count if count else 0.0,
+                       'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], counts))}
+                      for (name, labels), (counts, total, count) in sorted(histograms.items())],
+        }
+
+    def render_prometheus(self):
+        """
+        Định dạng text của Prometheus (exposition format 0.0.4).
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+        counters.update(self._collected())
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(stage, **labels):
+    """
+    Đo thời gian một bước: `with span('content.score'): ...` ghi vào histogram
+    `recommendation_stage_seconds{stage="content.score"}`.
+    """
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(SPAN_METRIC, time.perf_counter() - start, stage=stage, **labels)
+
+
+def observe(stage, seconds, **labels):
+    """
+    Ghi thời gian đã đo sẵn (ví dụ thời gian từng bước của recommendation_pipeline).
+    """
+    if ENABLED:
+        registry.observe(SPAN_METRIC, seconds, stage=stage, **labels)
+
+
+def increment(name, value=1, **labels):
+    if ENABLED:
+        registry.increment(name, value, **labels)
+
+
+def _cache_collector():
+    from recommendation_cache import recommendation_cache
+
+    stats = recommendation_cache.stats()
+    return {f"recommendation_cache_{name}_total": {(): stats[name]}
+            for name in ('hits', 'misses', 'evictions', 'expirations', 'invalidations')}
+
+
+registry.add_collector(_cache_collector)
+
+# Ghi JSON khi tiến trình kết thúc nếu đặt METRICS_DUMP_FILE (mỗi tiến trình một file theo pid)
+_dump_file = os.environ.get("METRICS_DUMP_FILE")
+if ENABLED and _dump_file:
+    atexit.register(lambda: registry.dump_json(_dump_file.replace("{pid}", str(os.getpid()))))
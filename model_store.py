@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+
+# Định dạng lưu mô hình: một thư mục gồm các mảng NumPy thô (.npy, không pickle) và header.json
+# ghi phiên bản định dạng, kiểu/kích thước và mã băm sha256 của từng mảng
+FORMAT_NAME = "hasaki-model-arrays"
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_model_dir(path):
+    return os.path.isfile(os.path.join(path, HEADER_FILE))
+
+
+def read_header(path):
+    """
+    Đọc và kiểm tra header của thư mục mô hình (định dạng, phiên bản).
+    """
+    with open(os.path.join(path, HEADER_FILE), encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get('format') != FORMAT_NAME:
+        raise ValueError(f"{path} không phải thư mục mô hình ({FORMAT_NAME}).")
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{path}: phiên bản định dạng {header.get('format_version')} không được hỗ trợ "
+                         f"(cần {FORMAT_VERSION}).")
+    return header
+
+
+def save_arrays(path, arrays, metadata=None):
+    """
+    Lưu các mảng (dict tên -> mảng) thành thư mục `path`. Ghi vào thư mục tạm rồi đổi tên
+    để tiến trình khác không đọc phải mô hình ghi dở; thư mục cũ (nếu có) bị thay thế.
+    Mảng chuỗi được lưu dạng độ dài cố định (không cần pickle khi nạp).
+    """
+    path = os.path.normpath(path)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    entries = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            array = array.astype(str)
+        file_name = f"{name}.npy"
+        np.save(os.path.join(tmp_path, file_name), array, allow_pickle=False)
+        entries[name] = {
+            'file': file_name,
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'sha256': file_sha256(os.path.join(tmp_path, file_name)),
+        }
+    header = {
+        'format': FORMAT_NAME,
+        'format_version': FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'arrays': entries,
+        'metadata': metadata or {},
+    }
+    with open(os.path.join(tmp_path, HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, indent=2)
+
+    old_path = None
+    if os.path.exists(path):
+        old_path = f"{path}.old{os.getpid()}"
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if old_path:
+        shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+
+def verify(path, header=None):
+    """
+    So mã băm sha256 của từng mảng với header; báo lỗi nếu file bị hỏng hoặc bị sửa.
+    """
+    header = header or read_header(path)
+    for name, entry in header['arrays'].items():
+        if file_sha256(os.path.join(path, entry['file'])) != entry['sha256']:
+            raise ValueError(f"{path}: mảng '{name}' không khớp mã băm trong header.")
+    return header
+
+
+def load_arrays(path, mmap=True, check=False):
+    """
+    Nạp thư mục mô hình: trả về (dict tên -> mảng, metadata).
+    Với `mmap=True` các mảng được memory-map chỉ đọc nên nhiều tiến trình dùng chung một bản
+    trong page cache. Mặc định chỉ kiểm tra header, kiểu/kích thước và độ dài file (không đọc dữ liệu);
+    `check=True` kiểm tra thêm mã băm (đọc toàn bộ file, mất lợi ích nạp lười), xem `verify`.
+    """
+    header = read_header(path)
+    if check:
+        verify(path, header)
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        file_path = os.path.join(path, entry['file'])
+        array = np.load(file_path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        if array.dtype.str != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ValueError(f"{path}: mảng '{name}' không khớp kiểu/kích thước trong header.")
+        # File bị cắt cụt/ghi thêm: độ dài phải đúng bằng phần đầu .npy cộng dữ liệu
+        if mmap and os.path.getsize(file_path) != array.offset + array.nbytes:
+            raise ValueError(f"{path}: mảng '{name}' có độ dài file không khớp header.")
+        arrays[name] = array
+    return arrays, header['metadata']
+
+
+if __name__ == "__main__":
+    # python model_store.py convert model/collaborative_model.pkl.gz [--output model/collaborative_model]
+    # python model_store.py verify model/collaborative_model
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chuyển đổi/kiểm tra mô hình dạng mảng NumPy")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Chuyển mô hình pickle (.pkl.gz) sang thư mục mảng")
+    convert_parser.add_argument("model_file", nargs="?", default="model/collaborative_model.pkl.gz")
+    convert_parser.add_argument("--output", default=None, help="Mặc định: cùng tên, bỏ đuôi .pkl.gz")
+    verify_parser = subparsers.add_parser("verify", help="Kiểm tra header và mã băm")
+    verify_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        from collaborative_update import convert_pickle
+
+        start = time.perf_counter()
+        path = convert_pickle(args.model_file, args.output)
+        print(f"Đã chuyển {args.model_file} -> {path} trong {time.perf_counter() - start:.1f}s")
+    else:
+        header = verify(args.path)
+        for name, entry in header['arrays'].items():
+            print(f"{name:12s} {entry['dtype']:>6s} {tuple(entry['shape'])}")
+        print(f"{args.path}: hợp lệ (định dạng {header['format']} v{header['format_version']})")
@@ -0,0 +1,160 @@
+import os
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+import pandas as pd
+
+
+def dependency_signature(paths):
+    """
+    Chữ ký (mtime, kích thước) của các file/thư mục phụ thuộc; thay đổi khi file được ghi lại.
+    Với thư mục, lấy chữ ký của các file bên trong.
+    """
+    signature = []
+    for path in paths:
+        if os.path.isdir(path):
+            signature.extend(dependency_signature(sorted(
+                os.path.join(path, name) for name in os.listdir(path))))
+            continue
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+# Chữ ký đã tính theo (id của DataFrame, các cột): (weakref tới DataFrame, chữ ký); tự xóa khi DataFrame bị giải phóng
+_frame_signatures = {}
+
+
+def frame_signature(df, columns=None):
+    """
+    Mã băm nội dung (tên cột và giá trị) của DataFrame, hoặc chỉ của các cột `columns` có trong DataFrame,
+    dùng trong khóa cache khi kết quả phụ thuộc DataFrame truyền vào. Chỉ tính một lần cho mỗi đối tượng;
+    sửa trực tiếp DataFrame sau đó thì không được phát hiện (tạo DataFrame mới thay vì sửa tại chỗ).
+    """
+    columns = tuple(df.columns if columns is None else [c for c in columns if c in df.columns])
+    key = (id(df), columns)
+    entry = _frame_signatures.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    digest = hashlib.sha1(repr(columns).encode('utf-8'))
+    for column in columns:
+        values = df[column]
+        try:
+            hashes = pd.util.hash_pandas_object(values, index=False)
+        except TypeError:
+            # Cột chứa giá trị không băm được (list, ...)
+            hashes = pd.util.hash_pandas_object(values.astype(str), index=False)
+        digest.update(hashes.to_numpy().tobytes())
+    signature = digest.hexdigest()
+
+    _frame_signatures[key] = (weakref.ref(df, lambda _, key=key: _frame_signatures.pop(key, None)), signature)
+    return signature
+
+
+class RecommendationCache:
+    """
+    Cache kết quả gợi ý dùng chung cho cả hai recommender, độc lập với Streamlit:
+    - giới hạn số phần tử, loại bỏ phần tử ít dùng nhất (LRU);
+    - mỗi phần tử hết hạn sau `ttl` giây;
+    - tự vô hiệu khi file mô hình/dữ liệu phụ thuộc thay đổi;
+    - đếm hit/miss để theo dõi.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600, check_interval=1.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Mỗi bộ file phụ thuộc chỉ stat lại tối đa một lần mỗi `check_interval` giây
+        self.check_interval = check_interval
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._signatures = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _current_signature(self, dependencies, now):
+        if not dependencies:
+            return ()
+        checked = self._signatures.get(dependencies)
+        if checked is None or now - checked[0] >= self.check_interval:
+            checked = (now, dependency_signature(dependencies))
+            self._signatures[dependencies] = checked
+        return checked[1]
+
+    def get_or_compute(self, key, compute, dependencies=()):
+        """
+        Trả về kết quả đã cache cho `key`, hoặc gọi `compute()` và lưu lại.
+        Kết quả trả ra luôn là bản sao để người gọi có thể sửa mà không ảnh hưởng cache.
+        """
+        dependencies = tuple(dependencies)
+        now = self.clock()
+        with self._lock:
+            signature = self._current_signature(dependencies, now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, entry_signature = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    self.expirations += 1
+                elif entry_signature != signature:
+                    del self._entries[key]
+                    self.invalidations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return _copy(value)
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl, signature)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return _copy(value)
+
+    def invalidate(self, recommender=None):
+        """
+        Xóa toàn bộ cache, hoặc chỉ các phần tử của một recommender (phần tử đầu của key).
+        """
+        with self._lock:
+            if recommender is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key for key in self._entries if key[0] == recommender]
+                for key in keys:
+                    del self._entries[key]
+                removed = len(keys)
+            self._signatures.clear()
+            self.invalidations += removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+def _copy(value):
+    return value.copy() if hasattr(value, 'copy') else value
+
+
+# Cache dùng chung trong tiến trình; kích thước và TTL chỉnh qua biến môi trường
+recommendation_cache = RecommendationCache(
+    maxsize=int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("RECOMMENDATION_CACHE_TTL", 600)),
+)
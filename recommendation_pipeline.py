@@ -0,0 +1,312 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from collaborative_scoring import top_k_indices
+from collaborative_update import rating_triples
+from content_ann import CONTENT_ANN_FILE, get_ann_index
+from content_based_recommendation import build_recommendations
+from content_neighbors import CONTENT_NEIGHBORS_FILE, get_neighbor_table
+from hybrid_recommendation import get_hybrid_recommender
+from metrics import increment, observe, span
+
+# Pipeline gợi ý hai bước: các bộ sinh ứng viên rẻ lấy vài trăm sản phẩm, sau đó chỉ các ứng viên này
+# được chấm điểm đầy đủ (collaborative + nội dung + điểm đánh giá) thay vì toàn bộ catalog.
+# Bộ sinh ứng viên là đối tượng có `name` và `__call__(query, limit)` trả về các dòng trong chỉ mục
+# nội dung (ưu tiên giảm dần); bộ xếp hạng lại có `name` và `__call__(query, rows, top_n, **weights)`.
+# Các bộ sinh chỉ đọc dữ liệu đã tính offline (bảng láng giềng, chỉ mục ANN), không xây dựng trong request.
+
+
+def unique_in_order(rows):
+    rows = np.asarray(rows, dtype=np.int64)
+    _, first = np.unique(rows, return_index=True)
+    return rows[np.sort(first)]
+
+
+def interleave(ranked_lists):
+    """
+    Trộn các danh sách đã xếp hạng theo thứ hạng: hạng 1 của mọi danh sách, rồi hạng 2, ...
+    """
+    ranked_lists = [np.asarray(rows, dtype=np.int64) for rows in ranked_lists if len(rows)]
+    if not ranked_lists:
+        return np.empty(0, dtype=np.int64)
+    rows = np.concatenate(ranked_lists)
+    ranks = np.concatenate([np.arange(len(r)) for r in ranked_lists])
+    return unique_in_order(rows[np.argsort(ranks, kind='stable')])
+
+
+class Query:
+    """
+    Truy vấn đã chuẩn hóa, dùng chung cho các bộ sinh ứng viên: chỉ số khách hàng trong mô hình
+    (-1 nếu không có), dòng sản phẩm gốc (-1 nếu không có) và các dòng sản phẩm khách đã thích.
+    """
+
+    def __init__(self, hybrid, customer_id, product_id=None):
+        self.customer_id = str(customer_id).strip()
+        self.product_id = None if product_id is None else str(product_id).strip()
+        self.parts = hybrid.query_rows([self.customer_id], None if self.product_id is None else [self.product_id])
+        codes, seed_rows, _, liked_rows = self.parts
+        self.user = int(hybrid.collaborative.users_for_codes(codes)[0])
+        self.seed_row = int(seed_rows[0])
+        self.liked_rows = liked_rows
+
+    @property
+    def seed_rows(self):
+        return np.array([self.seed_row]) if self.seed_row >= 0 else self.liked_rows
+
+
+class ContentNeighborCandidates:
+    """
+    Láng giềng nội dung của sản phẩm gốc (hoặc của các sản phẩm khách đã thích):
+    tra bảng láng giềng tính trước nếu còn khớp chỉ mục, nếu không dùng chỉ mục ANN đã xây dựng sẵn.
+    Báo lỗi FileNotFoundError ngay khi tạo nếu không có cả hai (SVD/LSH không được xây dựng trong request).
+    """
+
+    name = 'content_neighbors'
+
+    def __init__(self, index, max_seeds=20):
+        self.index = index
+        self.max_seeds = max_seeds
+        self.table = get_neighbor_table()
+        if self.table is not None and not self.table.matches(index):
+            self.table = None
+        self.ann = None if self.table is not None else get_ann_index(index, build=False)
+        if self.table is None and self.ann is None:
+            raise FileNotFoundError(
+                f"Chưa có bảng láng giềng ({CONTENT_NEIGHBORS_FILE}) hoặc chỉ mục ANN ({CONTENT_ANN_FILE}) khớp "
+                "chỉ mục nội dung: chạy python content_neighbors.py hoặc python content_ann.py."
+            )
+
+    def __call__(self, query, limit):
+        seeds = query.seed_rows[:self.max_seeds]
+        if not len(seeds):
+            return np.empty(0, dtype=np.int64)
+        per_seed = max(1, -(-limit // len(seeds)))
+        if self.table is not None:
+            found = [self.table.neighbors[row, :per_seed] for row in seeds]
+        else:
+            found = [self.ann.candidates(row, per_seed) for row in seeds]
+        return interleave(found)[:limit]
+
+
+class CoRatedCandidates:
+    """
+    Sản phẩm được các khách hàng tương tự (theo ma trận tương tự của mô hình) đánh giá cao,
+    xếp theo tổng (độ tương tự x số sao). Với mô hình item-based: sản phẩm tương tự các sản phẩm
+    khách đã đánh giá cao.
+    """
+
+    name = 'co_rated'
+
+    def __init__(self, hybrid, n_neighbors=40, min_rating=3):
+        self.state = hybrid.collaborative.state
+        self.n_neighbors = n_neighbors
+        users, items, ratings = rating_triples(self.state)
+        keep = ratings >= min_rating
+        self.user_items = sparse.csr_matrix((ratings[keep], (users[keep], items[keep])),
+                                            shape=(self.state.n_users, self.state.n_items))
+        # Chỉ số sản phẩm trong mô hình -> dòng trong chỉ mục nội dung (-1 nếu không có)
+        self.item_rows = hybrid.index.products.lookup(self.state.item_ids).astype(np.int64)
+
+    def __call__(self, query, limit):
+        if query.user < 0:
+            return np.empty(0, dtype=np.int64)
+        state = self.state
+        if state.user_based:
+            sims = np.array(state.sim[query.user])
+            sims[query.user] = 0.0
+            neighbors = top_k_indices(sims, self.n_neighbors)
+            neighbors = neighbors[sims[neighbors] > 0]
+            item_scores = self.user_items[neighbors].T @ sims[neighbors]
+        else:
+            rated = self.user_items[query.user].indices
+            item_scores = np.asarray(state.sim[rated].sum(axis=0)).ravel()
+        item_scores = np.where(self.item_rows >= 0, item_scores, 0.0)
+        top = top_k_indices(item_scores, limit)
+        return self.item_rows[top[item_scores[top] > 0]]
+
+
+class PopularCategoryCandidates:
+    """
+    Sản phẩm phổ biến nhất (nhiều lượt đánh giá, rồi điểm trung bình cao) trong cùng `phan_loai`
+    với sản phẩm gốc hoặc các sản phẩm khách đã thích; phần còn thiếu (và khách hàng mới)
+    lấy sản phẩm phổ biến nhất toàn catalog.
+    """
+
+    name = 'popular_category'
+
+    def __init__(self, hybrid):
+        index = hybrid.index
+        collaborative = hybrid.collaborative
+        n_reviews = np.bincount(collaborative.interactions.product_codes, minlength=len(collaborative.catalog_ids))
+        known = hybrid.catalog_rows >= 0
+        counts = np.zeros(len(index))
+        counts[hybrid.catalog_rows[known]] = n_reviews[known]
+        self.popular = np.lexsort((-index.ratings, -counts))
+
+        # Danh sách sản phẩm theo độ phổ biến của từng nhóm phan_loai, dạng CSR (-1: không có nhóm)
+        if 'phan_loai' in hybrid.df:
+            self.categories = pd.factorize(hybrid.df['phan_loai'])[0]
+        else:
+            self.categories = np.full(len(index), -1)
+        ranked = self.popular[self.categories[self.popular] >= 0]
+        self.category_rows = ranked[np.argsort(self.categories[ranked], kind='stable')]
+        self.category_indptr = np.zeros(self.categories.max() + 2, dtype=np.int64)
+        np.cumsum(np.bincount(self.categories[ranked], minlength=len(self.category_indptr) - 1),
+                  out=self.category_indptr[1:])
+
+    def __call__(self, query, limit):
+        categories = self.categories[query.seed_rows]
+        categories = categories[categories >= 0]
+        found = []
+        if len(categories):
+            # Nhóm xuất hiện nhiều nhất trong các sản phẩm gốc được ưu tiên
+            values, counts = np.unique(categories, return_counts=True)
+            for category in values[np.argsort(-counts, kind='stable')]:
+                found.append(self.category_rows[self.category_indptr[category]:self.category_indptr[category + 1]])
+        found.append(self.popular[:limit])
+        return unique_in_order(np.concatenate(found))[:limit]
+
+
+class HybridReranker:
+    """
+    Chấm điểm đầy đủ (như HybridRecommender) chỉ trên các ứng viên.
+    """
+
+    name = 'rerank'
+
+    def __init__(self, hybrid, weight_collaborative=0.5, weight_content=0.3, weight_rating=0.2):
+        self.hybrid = hybrid
+        self.weights = dict(weight_collaborative=weight_collaborative, weight_content=weight_content,
+                            weight_rating=weight_rating)
+
+    def __call__(self, query, rows, top_n, **weights):
+        """
+        Trả về (dòng, điểm trộn, điểm ước lượng, độ tương tự) của top-N ứng viên;
+        `weights` ghi đè trọng số mặc định của bộ xếp hạng.
+        """
+        weights = {**self.weights, **weights}
+        scores, estimates, similarities = self.hybrid.scores_for_queries(query.parts, rows=rows, **weights)
+        scores, estimates, similarities = scores[0], estimates[0], similarities[0]
+        top = top_k_indices(scores, top_n)
+        top = top[np.isfinite(scores[top])]
+        return rows[top], scores[top], estimates[top], similarities[top]
+
+
+def default_generators(hybrid):
+    return [ContentNeighborCandidates(hybrid.index), CoRatedCandidates(hybrid), PopularCategoryCandidates(hybrid)]
+
+
+class RecommendationPipeline:
+    """
+    Sinh ứng viên (mỗi bộ sinh tối đa `candidates_per_generator` sản phẩm) rồi xếp hạng lại.
+    Thời gian từng bước được trả về cùng kết quả và cộng dồn trong `stats`.
+    """
+
+    def __init__(self, hybrid, generators=None, reranker=None, candidates_per_generator=200):
+        self.hybrid = hybrid
+        self.generators = list(generators) if generators is not None else default_generators(hybrid)
+        self.reranker = reranker if reranker is not None else HybridReranker(hybrid)
+        self.candidates_per_generator = candidates_per_generator
+        # Thống kê theo bước: số lần gọi, tổng thời gian (giây), tổng số ứng viên
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _record(self, stage, seconds, n_candidates=0):
+        with self._lock:
+            calls, total, candidates = self.stats.get(stage, (0, 0.0, 0))
+            self.stats[stage] = (calls + 1, total + seconds, candidates + n_candidates)
+        # Đồng thời ghi vào metrics.py để xuất qua /metrics
+        observe(f"pipeline.{stage}", seconds)
+        if n_candidates:
+            increment('recommendation_pipeline_candidates_total', n_candidates, stage=stage)
+
+    def candidates(self, query, timings=None):
+        """
+        Hợp các ứng viên của mọi bộ sinh (giữ thứ tự xuất hiện đầu tiên).
+        """
+        found = []
+        for generator in self.generators:
+            start = time.perf_counter()
+            rows = generator(query, self.candidates_per_generator)
+            elapsed = time.perf_counter() - start
+            self._record(generator.name, elapsed, len(rows))
+            if timings is not None:
+                timings[generator.name] = elapsed
+            found.append(rows)
+        return unique_in_order(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+    def run(self, customer_id, product_id=None, top_n=6, **weights):
+        """
+        Trả về (DataFrame gợi ý, thời gian từng bước tính bằng giây).
+        `weights` (weight_collaborative, weight_content, weight_rating) được chuyển cho bộ xếp hạng lại.
+        """
+        timings = {}
+        started = time.perf_counter()
+        query = Query(self.hybrid, customer_id, product_id)
+        rows = self.candidates(query, timings)
+
+        start = time.perf_counter()
+        n_candidates = len(rows)
+        rows, scores, estimates, similarities = self.reranker(query, rows, top_n, **weights)
+        timings[self.reranker.name] = time.perf_counter() - start
+        self._record(self.reranker.name, timings[self.reranker.name], n_candidates)
+
+        recommendations = build_recommendations(self.hybrid.df, rows, similarities, scores)
+        recommendations.insert(3, 'EstimateScore', estimates)
+        timings['total'] = time.perf_counter() - started
+        self._record('total', timings['total'])
+        return recommendations, timings
+
+    def recommend(self, customer_id, product_id=None, top_n=6, **weights):
+        return self.run(customer_id, product_id, top_n, **weights)[0]
+
+
+# Pipeline dùng chung, dựng lại khi recommender kết hợp được dựng lại
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline(df, data_files, model_file):
+    """
+    Pipeline dùng chung; FileNotFoundError nếu chưa chạy job offline tạo bảng láng giềng / chỉ mục ANN.
+    """
+    global _pipeline
+    hybrid = get_hybrid_recommender(df, data_files, model_file)
+    with _pipeline_lock:
+        if _pipeline is None or _pipeline.hybrid is not hybrid:
+            _pipeline = RecommendationPipeline(hybrid)
+        return _pipeline
+
+
+def recommend_products(df, data_files, model_file, customer_id, product_id=None, top_n=6, **weights):
+    """
+    Gợi ý kết hợp qua pipeline hai bước (cùng cột kết quả với hybrid_recommendation.recommend_products).
+    """
+    with span('pipeline.recommend'):
+        return get_pipeline(df, data_files, model_file).recommend(customer_id, product_id, top_n, **weights)
+
+
+if __name__ == "__main__":
+    # python recommendation_pipeline.py 443 [--product 318900012] [--top-n 6]
+    import argparse
+    from data_store import load_table
+
+    parser = argparse.ArgumentParser(description="Gợi ý hai bước: sinh ứng viên rồi xếp hạng lại")
+    parser.add_argument("customer_id")
+    parser.add_argument("--product", default=None, help="Sản phẩm đang xem (tùy chọn)")
+    parser.add_argument("--top-n", type=int, default=6)
+    parser.add_argument("--candidates", type=int, default=200, help="Số ứng viên tối đa mỗi bộ sinh")
+    parser.add_argument("--content-data", default="data/content_based_preprocessed.csv")
+    parser.add_argument("--data-files", nargs="+", default=["data/collaborative_full_data_part1.csv",
+                                                            "data/collaborative_full_data_part2.csv"])
+    parser.add_argument("--model-file", default="model/collaborative_model.pkl.gz")
+    args = parser.parse_args()
+
+    pipeline = get_pipeline(load_table(args.content_data), args.data_files, args.model_file)
+    pipeline.candidates_per_generator = args.candidates
+    recommendations, timings = pipeline.run(args.customer_id, args.product, args.top_n)
+    print(recommendations[['ma_san_pham', 'ten_san_pham', 'EstimateScore', 'similarity_score', 'final_score']])
+    for stage, seconds in timings.items():
+        print(f"{stage:20s} {seconds * 1000:8.2f} ms")
@@ -0,0 +1,181 @@
+import bisect
+import re
+import threading
+import unicodedata
+import numpy as np
+
+# Tìm kiếm phía máy chủ cho ô chọn sản phẩm/khách hàng: thay vì gửi toàn bộ ~15k tên sản phẩm
+# (hoặc mọi mã khách hàng) xuống trình duyệt mỗi lần chạy lại, mỗi lần gõ chỉ trả về vài chục kết quả.
+# - Khớp tiền tố không dấu: "sua rua m" khớp "Sữa Rửa Mặt ..." (mỗi từ của truy vấn là tiền tố của một từ trong tên).
+# - Khớp gần đúng theo trigram khi gõ sai chính tả hoặc không khớp tiền tố.
+
+DEFAULT_LIMIT = 20
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text):
+    """
+    Chữ thường, bỏ dấu tiếng Việt (kể cả đ -> d) và thay ký tự không phải chữ/số bằng khoảng trắng.
+    """
+    text = unicodedata.normalize('NFD', str(text).lower().replace('đ', 'd'))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def trigrams(text):
+    """
+    Tập trigram của từng từ (thêm khoảng trắng hai đầu từ để khớp cả đầu/cuối từ).
+    """
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """
+    Chỉ mục tìm kiếm trên danh sách nhãn (tên sản phẩm hoặc mã khách hàng); kết quả là vị trí trong danh sách.
+    Thứ tự kết quả: nhãn bắt đầu bằng truy vấn, rồi nhãn khớp tiền tố theo từng từ (nhãn ngắn trước),
+    rồi (nếu `fuzzy`) nhãn gần giống nhất theo trigram.
+    """
+
+    def __init__(self, labels, fuzzy=True):
+        self.labels = np.asarray([str(label) for label in labels], dtype=object)
+        normalized = [normalize(label) for label in self.labels]
+        self.lengths = np.fromiter((len(text) for text in normalized), dtype=np.int64, count=len(normalized))
+
+        # Toàn bộ nhãn đã chuẩn hóa, sắp xếp: tiền tố của cả nhãn là một khoảng liên tiếp
+        order = sorted(range(len(normalized)), key=normalized.__getitem__)
+        self.sorted_labels = [normalized[i] for i in order]
+        self.sorted_positions = np.asarray(order, dtype=np.int64)
+
+        # Cặp (từ, vị trí) sắp xếp theo từ: tiền tố của một từ cũng là một khoảng liên tiếp
+        pairs = sorted((token, position) for position, text in enumerate(normalized) for token in set(text.split()))
+        self.pair_tokens = [token for token, _ in pairs]
+        self.pair_positions = np.asarray([position for _, position in pairs], dtype=np.int64)
+
+        self.fuzzy = fuzzy
+        if fuzzy:
+            # Chỉ mục ngược trigram -> vị trí dạng CSR
+            grams = [trigrams(text) for text in normalized]
+            gram_pairs = sorted((gram, position) for position, g in enumerate(grams) for gram in g)
+            self.gram_positions = np.asarray([position for _, position in gram_pairs], dtype=np.int64)
+            self.gram_ranges = {}
+            for i, (gram, _) in enumerate(gram_pairs):
+                start, _ = self.gram_ranges.get(gram, (i, i))
+                self.gram_ranges[gram] = (start, i + 1)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _prefix_range(self, keys, prefix):
+        return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + '\uffff')
+
+    def label_prefix(self, query, limit=DEFAULT_LIMIT):
+        """
+        Vị trí các nhãn bắt đầu bằng `query` (đã chuẩn hóa), tối đa `limit`.
+        """
+        start, end = self._prefix_range(self.sorted_labels, query)
+        return self.sorted_positions[start:min(end, start + limit)]
+
+    def token_prefix(self, query):
+        """
+        Vị trí các nhãn mà mỗi từ của `query` là tiền tố của một từ trong nhãn, nhãn ngắn trước.
+        """
+        matches = None
+        for token in query.split():
+            start, end = self._prefix_range(self.pair_tokens, token)
+            positions = np.unique(self.pair_positions[start:end])
+            matches = positions if matches is None else np.intersect1d(matches, positions, assume_unique=True)
+            if not len(matches):
+                break
+        if matches is None:
+            return np.empty(0, dtype=np.int64)
+        return matches[np.argsort(self.lengths[matches], kind='stable')]
+
+    def similar(self, query, limit=DEFAULT_LIMIT, min_score=0.4):
+        """
+        Vị trí các nhãn gần giống `query` nhất: tỷ lệ trigram của truy vấn có trong nhãn
+        (tên sản phẩm dài hơn truy vấn nhiều nên không dùng hệ số Dice), cùng điểm thì nhãn ngắn trước.
+        """
+        query_grams = trigrams(query)
+        grams = [self.gram_ranges[g] for g in query_grams if g in self.gram_ranges]
+        if not grams:
+            return np.empty(0, dtype=np.int64)
+        hits = np.concatenate([self.gram_positions[start:end] for start, end in grams])
+        common = np.bincount(hits, minlength=len(self.labels))
+        candidates = np.flatnonzero(common >= min_score * len(query_grams))
+        return candidates[np.lexsort((self.lengths[candidates], -common[candidates]))[:limit]]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Tối đa `limit` vị trí khớp với `query`; truy vấn rỗng trả về `limit` nhãn đầu tiên theo thứ tự chữ cái.
+        """
+        query = normalize(query)
+        if not query:
+            return self.sorted_positions[:limit]
+        results = list(self.label_prefix(query, limit))
+        if len(results) < limit:
+            results.extend(self.token_prefix(query)[:limit * 2])
+        if len(results) < limit and self.fuzzy:
+            results.extend(self.similar(query, limit))
+        # Bỏ trùng, giữ thứ tự ưu tiên
+        seen = set()
+        unique = [p for p in results if not (p in seen or seen.add(p))]
+        return np.asarray(unique[:limit], dtype=np.int64)
+
+    def search_labels(self, query, limit=DEFAULT_LIMIT):
+        return list(self.labels[self.search(query, limit)])
+
+
+# Chỉ mục dùng chung trong tiến trình, xây dựng lại khi bảng sản phẩm / danh sách khách hàng đổi đối tượng
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(name, source, labels, fuzzy):
+    entry = _indexes.get(name)
+    if entry is None or entry[0] is not source:
+        with _indexes_lock:
+            entry = _indexes.get(name)
+            if entry is None or entry[0] is not source:
+                entry = (source, SearchIndex(labels(), fuzzy=fuzzy))
+                _indexes[name] = entry
+    return entry[1]
+
+
+def get_product_search(df):
+    """
+    Chỉ mục tên sản phẩm (không trùng tên) của bảng sản phẩm `df`.
+    """
+    return _get_index('products', df, lambda: df['ten_san_pham'].astype(str).unique(), fuzzy=True)
+
+
+def get_customer_search(customer_ids):
+    """
+    Chỉ mục mã khách hàng (chỉ khớp tiền tố).
+    """
+    return _get_index('customers', customer_ids, lambda: customer_ids, fuzzy=False)
+
+
+if __name__ == "__main__":
+    # python search_index.py "sua rua mat" [--limit 10]
+    import argparse
+    import time
+    from warmup import get_products
+
+    parser = argparse.ArgumentParser(description="Tìm tên sản phẩm (không dấu, tiền tố + gần đúng)")
+    parser.add_argument("query")
+    parser.add_argument("--data", default="data/content_based_preprocessed.csv")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = get_product_search(get_products(args.data))
+    print(f"Xây dựng chỉ mục {len(index)} tên trong {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    labels = index.search_labels(args.query, args.limit)
+    print(f"Tìm trong {(time.perf_counter() - start) * 1e6:.0f} µs")
+    for label in labels:
+        print(f"  {label}")
@@ -0,0 +1,158 @@
+import os
+import gc
+import time
+import signal
+import socket
+
+# Chế độ phục vụ nhiều worker trên một máy: tiến trình cha nạp sẵn bảng sản phẩm, chỉ mục
+# nội dung và mô hình collaborative (mảng memory-map, xem model_store.py) rồi fork các worker
+# dùng chung socket. Worker thừa hưởng bộ nhớ của cha theo cơ chế copy-on-write nên các mảng
+# lớn chỉ có một bản vật lý, bộ nhớ tăng chậm hơn nhiều so với số worker.
+
+
+def bind_socket(host, port, backlog=2048):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def process_memory(pid):
+    """
+    Bộ nhớ của một tiến trình (kB) từ /proc: rss (kể cả trang dùng chung), pss (trang dùng
+    chung chia đều cho các tiến trình) và shared. Trả về None nếu không đọc được (ngoài Linux).
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+    }
+
+
+def memory_report(pids):
+    """
+    Bảng bộ nhớ của tiến trình cha và các worker; tổng PSS là bộ nhớ thực tế cả nhóm chiếm.
+    """
+    lines = []
+    total_rss = total_pss = 0
+    for role, pid in pids:
+        usage = process_memory(pid)
+        if usage is None:
+            continue
+        total_rss += usage['rss']
+        total_pss += usage['pss']
+        lines.append(f"{role:8s} {pid:>7d}  rss {usage['rss'] / 1024:8.1f} MB  pss {usage['pss'] / 1024:8.1f} MB"
+                     f"  shared {usage['shared'] / 1024:8.1f} MB")
+    lines.append(f"{'tổng':8s} {'':>7s}  rss {total_rss / 1024:8.1f} MB  pss {total_pss / 1024:8.1f} MB")
+    return "\n".join(lines)
+
+
+def preload():
+    """
+    Nạp toàn bộ dữ liệu/mô hình trong tiến trình cha trước khi fork.
+    """
+    import api
+
+    start = time.perf_counter()
+    api.warm_up()
+    # Đưa các đối tượng đã nạp ra khỏi vùng quét của GC: GC trong worker sẽ không ghi vào
+    # header của chúng, tránh sao chép các trang dùng chung (copy-on-write)
+    gc.collect()
+    gc.freeze()
+    print(f"Đã nạp dữ liệu và mô hình trong {time.perf_counter() - start:.1f}s (pid {os.getpid()})", flush=True)
+    return api.app
+
+
+def run_worker(app, sock, log_level="info"):
+    import uvicorn
+
+    # Bỏ xử lý tín hiệu của tiến trình cha; uvicorn tự cài xử lý SIGINT/SIGTERM để dừng êm
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    # API_WARM_UP trong worker chỉ kiểm tra lại chữ ký file, dữ liệu đã có sẵn từ tiến trình cha
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host="0.0.0.0", port=8000, workers=None, log_level="info"):
+    """
+    Nạp dữ liệu một lần, mở socket rồi fork `workers` worker uvicorn dùng chung socket đó.
+    Worker chết bất thường được fork lại (vẫn dùng chung bộ nhớ đã nạp). Gửi SIGUSR1 tới
+    tiến trình cha để in bảng bộ nhớ; SIGINT/SIGTERM dừng toàn bộ.
+    """
+    workers = workers or os.cpu_count() or 1
+    sock = bind_socket(host, port)
+    app = preload()
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, sock, log_level)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(signum, frame):
+        pids = [('cha', os.getpid())] + [('worker', pid) for pid in sorted(children)]
+        print(memory_report(pids), flush=True)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGUSR1, report)
+
+    for _ in range(workers):
+        spawn()
+    print(f"{workers} worker đang phục vụ tại http://{host}:{port}", flush=True)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} dừng bất thường (status {status}), khởi động lại", flush=True)
+            time.sleep(1)
+            spawn()
+    sock.close()
+
+
+if __name__ == "__main__":
+    # python serving.py --port 8000 --workers 4 (đường dẫn dữ liệu/mô hình lấy từ biến môi trường như api.py)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Phục vụ API với nhiều worker dùng chung dữ liệu đã nạp")
+    parser.add_argument("--host", default=os.environ.get("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", 0)) or None,
+                        help="Mặc định: số nhân CPU")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.workers, args.log_level)
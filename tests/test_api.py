@@ -0,0 +1,149 @@
+import gzip
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from surprise import Dataset, KNNBaseline, Reader
+
+WORDS = ['sua', 'rua', 'mat', 'kem', 'chong', 'nang', 'toner', 'serum', 'duong', 'am', 'da', 'dau', 'tay', 'trang']
+N_PRODUCTS = 40
+N_CUSTOMERS = 60
+
+
+def write_fixtures(root):
+    """
+    Catalog, log đánh giá và mô hình KNNBaseline nhỏ trong thư mục tạm (cùng bố cục data/, model/ của repo).
+    """
+    rng = np.random.default_rng(0)
+    os.makedirs(root / "data")
+    os.makedirs(root / "model")
+
+    product_ids = [str(318900000 + i) for i in range(N_PRODUCTS)]
+    tokens = [list(rng.choice(WORDS, size=5)) for _ in product_ids]
+    products = pd.DataFrame({
+        'ma_san_pham': product_ids,
+        'ten_san_pham': [' '.join(t) for t in tokens],
+        'gia_ban': rng.integers(50, 500, N_PRODUCTS) * 1000,
+        'gia_goc': rng.integers(500, 900, N_PRODUCTS) * 1000,
+        'phan_loai': rng.choice(['Toner', 'Serum', 'Kem'], N_PRODUCTS),
+        'mo_ta': 'mô tả',
+        'diem_trung_binh': rng.uniform(3, 5, N_PRODUCTS).round(1),
+        'hinh_anh': 'https://example.com/a.jpg',
+        'tokens': [str(t) for t in tokens],
+    })
+    products.to_csv(root / "data" / "products.csv", index=False)
+
+    pairs = sorted({(int(c), int(p)) for c, p in zip(rng.integers(0, N_CUSTOMERS, 600),
+                                                     rng.integers(0, N_PRODUCTS, 600))})
+    ratings = pd.DataFrame(pairs, columns=['customer', 'product'])
+    ratings = pd.DataFrame({
+        'id': np.arange(len(ratings)),
+        'ma_khach_hang': (ratings['customer'] + 100).astype(str),
+        'so_sao': rng.integers(1, 6, len(ratings)),
+        'ma_san_pham': [product_ids[p] for p in ratings['product']],
+    }).merge(products.drop(columns='tokens'), on='ma_san_pham')
+    ratings.to_csv(root / "data" / "ratings.csv", index=False)
+
+    data = Dataset.load_from_df(ratings[['ma_khach_hang', 'ma_san_pham', 'so_sao']], Reader(rating_scale=(1, 5)))
+    model = KNNBaseline(k=10, sim_options={'name': 'pearson_baseline', 'user_based': False}, verbose=False)
+    model.fit(data.build_full_trainset())
+    with gzip.open(root / "model" / "collaborative_model.pkl.gz", 'wb') as f:
+        pickle.dump(model, f)
+    return products, ratings
+
+
+@pytest.fixture(scope="module")
+def fixtures(tmp_path_factory):
+    root = tmp_path_factory.mktemp("api")
+    products, ratings = write_fixtures(root)
+    with pytest.MonkeyPatch.context() as mp:
+        # Các đường dẫn mặc định (model/content_index, ...) là tương đối với thư mục làm việc
+        mp.chdir(root)
+        mp.setenv("API_WARM_UP", "1")
+        import api
+
+        mp.setattr(api, "CONTENT_BASED_DATA_FILE", "data/products.csv")
+        mp.setattr(api, "COLLABORATIVE_DATA_FILES", ["data/ratings.csv"])
+        mp.setattr(api, "COLLABORATIVE_MODEL_FILE", "model/collaborative_model.pkl.gz")
+        with TestClient(api.app) as client:
+            yield client, products, ratings
+
+
+@pytest.fixture
+def client(fixtures):
+    return fixtures[0]
+
+
+def test_health(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_recommend_content(fixtures):
+    client, products, _ = fixtures
+    product_id = products['ma_san_pham'].iloc[0]
+    response = client.get(f"/recommend/content/{product_id}", params={"top_n": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ma_san_pham"] == product_id
+    recommended = [r["ma_san_pham"] for r in body["recommendations"]]
+    assert len(recommended) == 5
+    assert product_id not in recommended
+    assert set(recommended) <= set(products['ma_san_pham'])
+    scores = [r["final_score"] for r in body["recommendations"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_recommend_content_unknown_product(client):
+    response = client.get("/recommend/content/khong_ton_tai")
+    assert response.status_code == 404
+    assert "detail" in response.json()
+
+
+def test_recommend_user(fixtures):
+    client, _, ratings = fixtures
+    customer_id = ratings['ma_khach_hang'].iloc[0]
+    response = client.get(f"/recommend/user/{customer_id}", params={"top_n": 4})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ma_khach_hang"] == customer_id
+    recommended = [r["ma_san_pham"] for r in body["recommendations"]]
+    assert len(recommended) == 4
+    # Không gợi ý lại sản phẩm khách đã đánh giá cao
+    liked = ratings[(ratings['ma_khach_hang'] == customer_id) & (ratings['so_sao'] >= 3)]['ma_san_pham']
+    assert not set(recommended) & set(liked)
+    assert all(1 <= r["EstimateScore"] <= 5 for r in body["recommendations"])
+
+
+def test_recommend_user_unknown_customer(client):
+    # Khách hàng mới: chỉ dùng baseline, vẫn trả về gợi ý
+    response = client.get("/recommend/user/khach_hang_moi", params={"top_n": 3})
+    assert response.status_code == 200
+    assert len(response.json()["recommendations"]) == 3
+
+
+def test_recommend_hybrid(fixtures):
+    client, products, ratings = fixtures
+    customer_id = ratings['ma_khach_hang'].iloc[0]
+    product_id = products['ma_san_pham'].iloc[1]
+    response = client.get(f"/recommend/hybrid/{customer_id}", params={"product": product_id, "top_n": 3})
+    assert response.status_code == 200
+    assert len(response.json()["recommendations"]) == 3
+
+
+def test_metrics(client):
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'api_requests_total{path="/health",status="200"}' in response.text
+
+    snapshot = client.get("/metrics", params={"format": "json"})
+    assert snapshot.status_code == 200
+    assert isinstance(snapshot.json(), dict)
+
+    assert client.get("/metrics", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+from surprise import Dataset, KNNBaseline, Reader
+
+from collaborative_scoring import export_knn_baseline, max_abs_error
+
+
+def train_model(user_based, sim_name, k=5, min_k=2):
+    # Dữ liệu nhỏ ngẫu nhiên: 30 khách hàng, 20 sản phẩm, điểm 1-5
+    rng = np.random.default_rng(0)
+    pairs = {(int(u), int(i)) for u, i in zip(rng.integers(0, 30, 300), rng.integers(0, 20, 300))}
+    df = pd.DataFrame(sorted(pairs), columns=['ma_khach_hang', 'ma_san_pham']).astype(str)
+    df['so_sao'] = rng.integers(1, 6, len(df))
+    data = Dataset.load_from_df(df, Reader(rating_scale=(1, 5)))
+    model = KNNBaseline(k=k, min_k=min_k, sim_options={'name': sim_name, 'user_based': user_based}, verbose=False)
+    model.fit(data.build_full_trainset())
+    return model
+
+
+@pytest.mark.parametrize('user_based', [True, False])
+@pytest.mark.parametrize('sim_name', ['msd', 'cosine', 'pearson_baseline'])
+def test_estimate_matches_predict(user_based, sim_name):
+    model = train_model(user_based, sim_name)
+    state = export_knn_baseline(model)
+    # Gồm cả khách hàng và sản phẩm không có trong trainset (chỉ dùng baseline)
+    users = list(state.user_ids) + ['khach_hang_moi']
+    items = list(state.item_ids) + ['san_pham_moi']
+    assert max_abs_error(model, state, users, items) < 1e-9
+
+
+def test_estimate_clips_to_rating_scale():
+    state = export_knn_baseline(train_model(True, 'msd'))
+    est = state.estimate(list(state.user_ids) + ['khach_hang_moi'], list(state.item_ids) + ['san_pham_moi'])
+    assert est.shape == (state.n_users + 1, state.n_items + 1)
+    assert est.min() >= 1 and est.max() <= 5
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from data_store import convert_to_feather, load_table, normalize_types
+
+CSV = "id,ma_khach_hang,ma_san_pham,phan_loai,so_sao\n1,443,123,Toner,5\n2,,456,,4\n3,abc,789,Serum,3\n"
+
+
+def test_ids_keep_their_text_after_feather(tmp_path):
+    path = tmp_path / "reviews.csv"
+    path.write_text(CSV)
+    from_csv = normalize_types(pd.read_csv(path))
+    convert_to_feather(str(path))
+    from_feather = load_table(str(path))
+
+    for df in (from_csv, from_feather):
+        # Mã thiếu không làm cột thành số thực (443.0) hay chuỗi 'nan'
+        assert df['ma_san_pham'].astype(str).tolist() == ['123', '456', '789']
+        assert df['ma_khach_hang'].iloc[0] == '443' and pd.isna(df['ma_khach_hang'].iloc[1])
+        assert df['phan_loai'].dtype == object and pd.isna(df['phan_loai'].iloc[1])
+    assert from_feather['ma_san_pham'].dtype == 'Int64'
+
+
+def test_numeric_ids_with_missing_values_stay_integers():
+    df = normalize_types(pd.DataFrame({'ma_khach_hang': [443.0, None, 12.0]}))
+    assert df['ma_khach_hang'].dtype == 'Int64'
+    assert df['ma_khach_hang'].astype(str).tolist() == ['443', '<NA>', '12']
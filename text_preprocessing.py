@@ -0,0 +1,179 @@
+import os
+import re
+import hashlib
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from metrics import increment, span
+
+# Tiền xử lý văn bản sản phẩm (tạo cột 'processed_content', 'tokens', 'token_count' của
+# content_based_preprocessed.csv): chuẩn hóa Unicode, bỏ đoạn cam kết chung của Hasaki, URL và
+# ký tự đặc biệt, tách từ, bỏ stopwords. Kết quả được cache theo hash nội dung nên chạy lại sau
+# mỗi lần crawl chỉ xử lý sản phẩm mới hoặc đổi mô tả; phần còn lại chạy song song trên nhiều tiến trình.
+
+# Cache tokens theo hash nội dung (Feather: hash, tokens)
+TEXT_CACHE_FILE = "model/text_tokens_cache.feather"
+# Tăng khi đổi cách làm sạch/stopwords để cache cũ không còn được dùng
+PREPROCESS_VERSION = 1
+TEXT_COLUMNS = ['ten_san_pham', 'mo_ta', 'phan_loai']
+
+STOPWORDS = frozenset("""
+bị bởi cả các cái cần càng chỉ chiếc cho chứ chưa có có_thể cùng cũng đã đang đây để đến đều điều do đó
+được gì hay hoặc khi khác không là lại lên lúc mà mỗi một nào này nên nếu nhiều như những nơi ở phải
+qua ra rất rằng rồi sau sẽ so sự tại theo thì trên trong từ tuy vào vẫn về vì với vậy và
+bạn chúng tôi ta họ nó ai
+""".split())
+
+# Đoạn cam kết hàng chính hãng / hóa đơn đỏ lặp lại ở cuối hầu hết mô tả, không mang thông tin sản phẩm
+BOILERPLATE_PATTERNS = [
+    re.compile(r"làm sao để phân biệt hàng có trộn hay không.*", re.IGNORECASE | re.DOTALL),
+    re.compile(r"\*?lưu ý: tác dụng có thể khác nhau tuỳ cơ địa của người dùng", re.IGNORECASE),
+]
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+
+def _segmenter():
+    """
+    Hàm tách từ: underthesea (ghép từ ghép bằng '_', ví dụ 'sữa_rửa_mặt') nếu đã cài,
+    nếu không thì tách theo khoảng trắng (từng âm tiết).
+    """
+    try:
+        from underthesea import word_tokenize
+    except ImportError:
+        return 'whitespace', str.split
+    return 'underthesea', lambda text: word_tokenize(text, format="text").split()
+
+
+SEGMENTER_NAME, segment = _segmenter()
+
+
+def clean_text(text):
+    if not isinstance(text, str):
+        return ''
+    text = unicodedata.normalize('NFC', text).lower()
+    for pattern in BOILERPLATE_PATTERNS:
+        text = pattern.sub(' ', text)
+    text = URL_PATTERN.sub(' ', text)
+    return NON_WORD_PATTERN.sub(' ', text).strip()
+
+
+def tokenize(text):
+    """
+    Tokens của một văn bản thô: làm sạch, tách từ, bỏ stopwords và token một ký tự.
+    """
+    return [token for token in segment(clean_text(text)) if len(token) > 1 and token not in STOPWORDS]
+
+
+def product_texts(df, text_columns=TEXT_COLUMNS):
+    """
+    Nội dung của mỗi sản phẩm: ghép tên, mô tả và phân loại (cột nào có trong df).
+    """
+    columns = [col for col in text_columns if col in df]
+    texts = df[columns].astype(object).fillna('').astype(str)
+    return texts.agg('\n'.join, axis=1).tolist() if columns else [''] * len(df)
+
+
+def content_hash(text):
+    key = f"{PREPROCESS_VERSION}\x1f{SEGMENTER_NAME}\x1f{text}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def load_cache(path=TEXT_CACHE_FILE):
+    """
+    Cache {hash nội dung: tokens}; rỗng nếu chưa có file.
+    """
+    if not os.path.exists(path):
+        return {}
+    from pyarrow import feather
+
+    table = feather.read_table(path)
+    return dict(zip(table.column('hash').to_pylist(), table.column('tokens').to_pylist()))
+
+
+def save_cache(cache, path=TEXT_CACHE_FILE):
+    import pyarrow as pa
+    from pyarrow import feather
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = pa.table({'hash': pa.array(list(cache.keys()), pa.string()),
+                      'tokens': pa.array(list(cache.values()), pa.list_(pa.string()))})
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def tokenize_many(texts, workers=None, chunksize=32, min_parallel=64):
+    """
+    Tokens cho nhiều văn bản; chạy trên `workers` tiến trình (mặc định số nhân CPU)
+    khi có ít nhất `min_parallel` văn bản, nếu không thì chạy tuần tự.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(texts) < min_parallel:
+        return [tokenize(text) for text in texts]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(tokenize, texts, chunksize=chunksize))
+
+
+def preprocess_products(df, cache_file=TEXT_CACHE_FILE, workers=None, text_columns=TEXT_COLUMNS):
+    """
+    Thêm cột 'processed_content', 'tokens' và 'token_count' cho bảng sản phẩm.
+    Chỉ văn bản chưa có trong cache (theo hash nội dung) được tách từ lại; cache được ghi lại nếu thay đổi.
+    Trả về (DataFrame mới, số sản phẩm phải xử lý lại).
+    """
+    texts = product_texts(df, text_columns)
+    hashes = [content_hash(text) for text in texts]
+    cache = load_cache(cache_file) if cache_file else {}
+
+    # Mỗi nội dung khác nhau chỉ xử lý một lần (nhiều sản phẩm có thể trùng mô tả)
+    missing = {h: text for h, text in zip(hashes, texts) if h not in cache}
+    increment('text_preprocessing_cache_hits_total', len(hashes) - sum(h in missing for h in hashes))
+    increment('text_preprocessing_cache_misses_total', len(missing))
+    if missing:
+        with span('text_preprocessing.tokenize'):
+            cache.update(zip(missing.keys(), tokenize_many(list(missing.values()), workers)))
+        if cache_file:
+            # Chỉ giữ các nội dung còn dùng để cache không phình theo số lần crawl
+            save_cache({h: cache[h] for h in dict.fromkeys(hashes)}, cache_file)
+
+    tokens = [list(cache[h]) for h in hashes]
+    result = df.copy()
+    result['processed_content'] = [' '.join(t) for t in tokens]
+    result['tokens'] = tokens
+    result['token_count'] = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    return result, len(missing)
+
+
+if __name__ == "__main__":
+    # Sau mỗi lần crawl: python text_preprocessing.py [--input ...] [--output ...] [--workers 4]
+    # Ghi CSV + Feather rồi cập nhật tăng dần chỉ mục nội dung (chỉ sản phẩm có tokens thay đổi).
+    import argparse
+    import time
+    from data_store import convert_to_feather, load_table
+    from content_based_recommendation import CONTENT_INDEX_DIR, ContentIndex
+
+    parser = argparse.ArgumentParser(description="Tiền xử lý văn bản sản phẩm và cập nhật chỉ mục nội dung")
+    parser.add_argument("--input", default="data/san_pham_updated.csv")
+    parser.add_argument("--output", default="data/content_based_preprocessed.csv")
+    parser.add_argument("--workers", type=int, default=None, help="Mặc định: số nhân CPU")
+    parser.add_argument("--cache", default=TEXT_CACHE_FILE)
+    parser.add_argument("--no-index", action="store_true", help="Không cập nhật chỉ mục nội dung")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    products, n_processed = preprocess_products(load_table(args.input), args.cache, args.workers)
+    products.to_csv(args.output, index=False)
+    convert_to_feather(args.output)
+    print(f"Đã tiền xử lý {len(products)} sản phẩm ({n_processed} nội dung mới/thay đổi, tách từ: "
+          f"{SEGMENTER_NAME}) vào {args.output} trong {time.perf_counter() - start:.1f}s")
+
+    if not args.no_index:
+        # Chỉ sản phẩm thêm/xóa hoặc có tokens thay đổi được cập nhật trong chỉ mục (xem ContentIndex.sync)
+        products = load_table(args.output)
+        if ContentIndex.exists(CONTENT_INDEX_DIR):
+            content_index = ContentIndex.load(CONTENT_INDEX_DIR).sync(products)
+        else:
+            content_index = ContentIndex.build(products)
+        content_index.save(CONTENT_INDEX_DIR)
+        print(f"Đã cập nhật chỉ mục nội dung (revision {content_index.revision}) tại {CONTENT_INDEX_DIR}")
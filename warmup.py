@@ -0,0 +1,120 @@
+import threading
+import time
+from metrics import span
+
+# Nạp nền khi khởi động: bảng sản phẩm, chỉ mục nội dung và mô hình collaborative được nạp trong
+# một luồng riêng ngay khi tiến trình bắt đầu, trang đầu tiên hiển thị mà không phải chờ.
+# Các bước nạp vào cache dùng chung của từng module (get_content_index, get_recommender, ...),
+# nên khi luồng nền xong, các lần gọi sau chỉ lấy lại đối tượng đã nạp.
+
+# Bảng sản phẩm đã chuẩn hóa theo đường dẫn, dùng chung cho app.py, api.py và luồng nạp nền
+_products = {}
+_products_lock = threading.Lock()
+
+
+def get_products(path):
+    """
+    Bảng sản phẩm của content-based (mã, tên, hình ảnh dạng chuỗi), chỉ đọc một lần cho mỗi tiến trình.
+    """
+    df_products = _products.get(path)
+    if df_products is None:
+        with _products_lock:
+            df_products = _products.get(path)
+            if df_products is None:
+                from data_store import load_table
+
+                df_products = load_table(path)
+                df_products['ten_san_pham'] = df_products['ten_san_pham'].astype(str).fillna('')
+                df_products['ma_san_pham'] = df_products['ma_san_pham'].astype(str).fillna('')
+                df_products['hinh_anh'] = df_products['hinh_anh'].astype(str).fillna("https://via.placeholder.com/150")
+                _products[path] = df_products
+    return df_products
+
+
+class WarmUp:
+    """
+    Chạy lần lượt các bước nạp `[(tên, hàm), ...]` trong một luồng nền.
+    Bước lỗi không chặn các bước sau (mỗi bước tự nạp phần nó cần qua cache của module);
+    lỗi được giữ trong `errors` và lỗi đầu tiên được ném lại ở `wait`.
+    `ready` được đặt khi chạy xong tất cả các bước.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.ready = threading.Event()
+        self.errors = {}
+        self.current = None
+        self.durations = {}
+        self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for name, function in self.steps:
+                self.current = name
+                start = time.perf_counter()
+                try:
+                    with span(f"warm_up.{name}"):
+                        function()
+                except Exception as e:
+                    self.errors[name] = e
+                self.durations[name] = time.perf_counter() - start
+        finally:
+            self.current = None
+            self.ready.set()
+
+    @property
+    def error(self):
+        return next(iter(self.errors.values()), None)
+
+    @property
+    def is_ready(self):
+        return self.ready.is_set() and not self.errors
+
+    def wait(self, timeout=None):
+        """
+        Chờ nạp xong; trả về True nếu đã sẵn sàng, False nếu hết `timeout`.
+        Nếu có bước lỗi thì ném lại lỗi đầu tiên (người gọi nên bắt đầu lại bằng `start_warm_up`).
+        """
+        if not self.ready.wait(timeout):
+            return False
+        if self.errors:
+            raise self.error
+        return True
+
+
+def start_warm_up(content_data_file, collaborative_data_files, collaborative_model_file, hybrid=True):
+    """
+    Bắt đầu nạp nền dữ liệu và mô hình cho các trang gợi ý; trả về đối tượng WarmUp.
+    Các module nặng (gensim, pickle của Surprise) chỉ được import trong luồng nền.
+    """
+    def load_content_index():
+        from content_based_recommendation import get_content_index
+
+        get_content_index(get_products(content_data_file))
+
+    def load_collaborative():
+        from collaborative_recommend import get_recommender
+
+        get_recommender(collaborative_data_files, collaborative_model_file)
+
+    def load_hybrid():
+        from hybrid_recommendation import get_hybrid_recommender
+
+        get_hybrid_recommender(get_products(content_data_file), collaborative_data_files, collaborative_model_file)
+
+    def load_search():
+        from collaborative_recommend import get_recommender
+        from search_index import get_customer_search, get_product_search
+
+        get_product_search(get_products(content_data_file))
+        get_customer_search(get_recommender(collaborative_data_files, collaborative_model_file).customer_ids)
+
+    steps = [('products', lambda: get_products(content_data_file)), ('content_index', load_content_index),
+             ('collaborative', load_collaborative), ('search', load_search)]
+    if hybrid:
+        steps.append(('hybrid', load_hybrid))
+    return WarmUp(steps).start()